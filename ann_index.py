@@ -0,0 +1,139 @@
+import os
+import numpy as np
+from typing import Optional, Tuple
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over unit vectors
+
+    Vectors are partitioned by spherical k-means into n_lists lists; a query
+    scores only the vectors in its n_probe closest lists. The lists are
+    stored as one array of row numbers sorted by list plus list offsets, so
+    the saved index is small and the vectors themselves stay in their
+    (typically memory-mapped) matrix. The fingerprint of the vectors it was
+    built for is saved with it, so a stale index is not loaded after the
+    vectors are re-embedded.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray,
+                 vectors: Optional[np.ndarray] = None, fingerprint: str = ''):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.vectors = vectors
+        self.fingerprint = fingerprint
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def size(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, n_lists: Optional[int] = None, iterations: int = 10,
+              train_size: Optional[int] = None, seed: int = 0,
+              chunk_size: int = 65536, fingerprint: str = '') -> 'IVFIndex':
+        """Cluster the vectors and bucket every row into its closest list
+
+        n_lists defaults to about sqrt(n); k-means trains on a sample of up
+        to 256 vectors per list. fingerprint identifies the vectors, e.g.
+        QuestionEmbeddings.fingerprint.
+        """
+        count = len(vectors)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(count)))
+        n_lists = max(1, min(n_lists, count))
+        rng = np.random.default_rng(seed)
+
+        train_size = min(count, train_size or 256 * n_lists)
+        sample = np.asarray(vectors[np.sort(rng.choice(count, train_size, replace=False))],
+                            dtype=np.float32)
+        centroids = sample[rng.choice(train_size, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=n_lists)
+            # Re-seed empty lists from random training vectors
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(train_size, len(empty))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms > 0, norms, 1.0)
+
+        assign = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + chunk_size], dtype=np.float32) @ centroids.T, axis=1)
+            for start in range(0, count, chunk_size)
+        ]) if count else np.empty(0, dtype=np.int64)
+        rows = np.argsort(assign, kind='stable').astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=n_lists))
+        return cls(centroids.astype(np.float32), offsets, rows, vectors, fingerprint)
+
+    def save(self, path: str):
+        """Write centroids and lists to an .npz file, replacing it atomically"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, offsets=self.offsets, rows=self.rows,
+                 fingerprint=np.array(self.fingerprint))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, vectors: np.ndarray,
+             fingerprint: Optional[str] = None) -> Optional['IVFIndex']:
+        """Load an index for vectors, or None if missing or built for other vectors
+
+        With a fingerprint the index must also have been built for vectors
+        with that fingerprint.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                saved = str(data['fingerprint']) if 'fingerprint' in data.files else ''
+                index = cls(data['centroids'], data['offsets'], data['rows'], vectors, saved)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Warning: could not load ANN index from {path}: {e}")
+            return None
+        if index.size != len(vectors) or index.centroids.shape[1] != np.shape(vectors)[1] \
+                or (fingerprint is not None and index.fingerprint != fingerprint):
+            print(f"Warning: ANN index {path} does not match the vectors; rebuild it")
+            return None
+        return index
+
+    def search(self, queries: np.ndarray, k: int = 10, n_probe: int = 8,
+               exclude_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k rows by dot product for each query
+
+        Returns (rows, scores) of shape (queries, k), most similar first;
+        rows are -1 where the probed lists hold fewer than k candidates.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        rows = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        if not self.size or k <= 0:
+            return rows, scores
+
+        n_probe = min(n_probe, self.n_lists)
+        centroid_scores = queries @ self.centroids.T
+        if n_probe < self.n_lists:
+            probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(self.n_lists), (len(queries), self.n_lists))
+
+        for i, lists in enumerate(probes):
+            candidates = np.concatenate([self.rows[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+            if exclude_rows is not None and len(exclude_rows):
+                candidates = candidates[~np.isin(candidates, exclude_rows)]
+            if not len(candidates):
+                continue
+            candidates.sort()  # sequential reads from a memory-mapped matrix
+            found = np.asarray(self.vectors[candidates], dtype=np.float32) @ queries[i]
+            k_eff = min(k, len(candidates))
+            top = np.argpartition(-found, k_eff - 1)[:k_eff] if k_eff < len(candidates) \
+                else np.arange(k_eff)
+            top = top[np.argsort(-found[top], kind='stable')]
+            rows[i, :k_eff] = candidates[top]
+            scores[i, :k_eff] = found[top]
+        return rows, scores
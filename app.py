@@ -2,12 +2,15 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import atexit
+import shutil
+import tempfile
 from datetime import datetime
 import time
 import plotly.express as px
 import plotly.graph_objects as go
 
-from models import LearnerProfile, ContentRecommender
+from models import LearnerProfile, ContentRecommender, warm_up_embedder
 from logger import QuizLogger
 from utils import generate_feedback, simulate_response_time
 
@@ -51,16 +54,22 @@ def load_data():
 def initialize_components():
     """Initialize ML components"""
     logger = QuizLogger()
-    profile_manager = LearnerProfile()
+    # Profile updates are written straight through to SQLite: a write-behind
+    # journal is only visible to the process that wrote it until a checkpoint.
+    # Active students stay cached and are re-read after 5 minutes, so updates
+    # made by other server processes show up within that time
+    profile_manager = LearnerProfile(cache_size=50000, cache_ttl=300)
+    # Topic mastery is saved in batches; merge what is left on shutdown
+    atexit.register(profile_manager.save_mastery)
     recommender = ContentRecommender()
+    if os.environ.get('WARM_UP_EMBEDDER'):
+        # Opt-in: load the embedding model in the background at startup
+        warm_up_embedder(background=True)
     return logger, profile_manager, recommender
 
-def load_quiz_logs():
-    """Load existing quiz logs"""
-    try:
-        return pd.read_csv('data/logs.csv')
-    except FileNotFoundError:
-        return pd.DataFrame()
+def load_quiz_sessions(logger):
+    """Load one summary row per completed quiz"""
+    return logger.get_all_sessions()
 
 def main():
     # Load data and components
@@ -81,11 +90,11 @@ def main():
     if page == "Home":
         show_home_page(students_df, profile_manager)
     elif page == "Quiz":
-        show_quiz_page(questions_df, logger)
+        show_quiz_page(questions_df, logger, profile_manager, recommender)
     elif page == "Results":
         show_results_page(students_df, questions_df, profile_manager, recommender)
     elif page == "Teacher Dashboard":
-        show_teacher_dashboard()
+        show_teacher_dashboard(logger)
 
 def show_home_page(students_df, profile_manager):
     """Display the home page"""
@@ -148,7 +157,7 @@ def show_home_page(students_df, profile_manager):
                 else:
                     st.info("Complete a quiz to see your learning metrics!")
 
-def show_quiz_page(questions_df, logger):
+def show_quiz_page(questions_df, logger, profile_manager, recommender):
     """Display the quiz page"""
     if not st.session_state.current_student:
         st.warning("Please select a student profile from the Home page first.")
@@ -161,9 +170,14 @@ def show_quiz_page(questions_df, logger):
     st.title("📝 Learning Quiz")
     st.markdown("---")
     
-    # Select 5 random questions for the quiz
+    # Select 5 questions suited to the student, avoiding ones they just saw
     if 'selected_questions' not in st.session_state:
-        st.session_state.selected_questions = questions_df.sample(n=min(5, len(questions_df)))
+        student_id = st.session_state.current_student['student_id']
+        profile = profile_manager.get_profile(student_id)
+        sampler = recommender.get_sampler(questions_df)
+        picked = sampler.draw(student_id, n=5, accuracy=profile.get('accuracy') if profile else None)
+        st.session_state.selected_questions = questions_df.iloc[
+            [sampler.bank.row_of(rec['question_id']) for rec in picked]]
     
     selected_questions = st.session_state.selected_questions
     current_q = st.session_state.current_question
@@ -310,7 +324,7 @@ def show_results_page(students_df, questions_df, profile_manager, recommender):
         st.caption(f"{int(progress_to_next * 100)}% to next level")
     
     # Update profile
-    profile_manager.update_profile(student_id, answers)
+    profile_manager.update_profile(student_id, answers, questions_df)
     profile = profile_manager.get_profile(student_id)
     
     # Display updated profile
@@ -340,6 +354,15 @@ def show_results_page(students_df, questions_df, profile_manager, recommender):
                 if 'explanation' in rec:
                     st.info(f"**Why this recommendation?** {rec['explanation']}")
     
+    # Practice questions close to the ones answered incorrectly, when the
+    # question embedding index has been built
+    missed = [question_id for question_id, a in answers.items() if not a['correct']]
+    similar = recommender.get_similar_questions(missed, questions_df, exclude=answers.keys())
+    if similar:
+        st.subheader("🔁 Practice Similar Questions")
+        for rec in similar:
+            st.write(f"**{rec['topic']}** ({'⭐' * rec['difficulty']}): {rec['text']}")
+    
     # Generate feedback
     st.subheader("💬 Personalized Feedback")
     feedback = generate_feedback(accuracy, profile, st.session_state.current_student)
@@ -356,54 +379,58 @@ def show_results_page(students_df, questions_df, profile_manager, recommender):
             del st.session_state.selected_questions
         st.rerun()
 
-def show_teacher_dashboard():
+def show_teacher_dashboard(logger):
     """Display the teacher dashboard"""
     st.title("👩‍🏫 Teacher Dashboard")
     st.markdown("---")
     
-    # Load quiz logs
-    logs_df = load_quiz_logs()
+    # Session summaries are one row per quiz, so the dashboard never parses
+    # the per-question log
+    sessions_df = load_quiz_sessions(logger)
     
-    if logs_df.empty:
+    if sessions_df.empty:
         st.info("No quiz data available yet. Students need to complete quizzes first.")
         return
     
     # Load student data for names
     students_df, _ = load_data()
     
+    # Every student's summary in one vectorized pass
+    student_summary = logger.get_performance_summaries()
+    
     # Merge with student names
     if not students_df.empty:
-        logs_with_names = logs_df.merge(
+        student_summary = student_summary.merge(
             students_df[['student_id', 'name']], 
             on='student_id', 
             how='left'
         )
+        student_summary['name'] = student_summary['name'].fillna(student_summary['student_id'])
     else:
-        logs_with_names = logs_df
-        logs_with_names['name'] = logs_with_names['student_id']
+        student_summary['name'] = student_summary['student_id']
     
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("Total Students", logs_with_names['student_id'].nunique())
+        st.metric("Total Students", len(student_summary))
     
     with col2:
-        st.metric("Total Quiz Attempts", len(logs_with_names))
+        st.metric("Total Quiz Attempts", len(sessions_df))
     
     with col3:
-        avg_accuracy = logs_with_names['accuracy'].mean()
+        avg_accuracy = sessions_df['accuracy'].mean()
         st.metric("Class Average Accuracy", f"{avg_accuracy:.1%}")
     
     with col4:
-        struggling_students = logs_with_names[logs_with_names['accuracy'] < 0.5]['student_id'].nunique()
+        struggling_students = sessions_df[sessions_df['accuracy'] < 0.5]['student_id'].nunique()
         st.metric("Struggling Students", struggling_students)
     
     # Accuracy distribution chart
     st.subheader("📊 Class Accuracy Distribution")
     
     fig = px.histogram(
-        logs_with_names, 
+        sessions_df, 
         x='accuracy', 
         nbins=10,
         title="Distribution of Quiz Accuracies",
@@ -415,15 +442,14 @@ def show_teacher_dashboard():
     # Student performance table
     st.subheader("👥 Student Performance Summary")
     
-    # Calculate student summaries
-    student_summary = logs_with_names.groupby(['student_id', 'name']).agg({
-        'accuracy': ['mean', 'count'],
-        'engagement': 'mean',
-        'avg_response_time': 'mean'
-    }).round(3)
-    
-    student_summary.columns = ['Avg Accuracy', 'Quiz Count', 'Avg Engagement', 'Avg Response Time']
-    student_summary = student_summary.reset_index()
+    student_summary = student_summary.rename(columns={
+        'overall_accuracy': 'Avg Accuracy',
+        'total_sessions': 'Quiz Count',
+        'average_engagement': 'Avg Engagement',
+        'average_response_time': 'Avg Response Time',
+        'improvement_trend': 'Trend'
+    })[['student_id', 'name', 'Avg Accuracy', 'Quiz Count', 'Avg Engagement',
+        'Avg Response Time', 'Trend']]
     
     # Highlight struggling students
     def highlight_struggling(row):
@@ -470,13 +496,29 @@ def show_teacher_dashboard():
     
     with col1:
         if st.button("📊 Download Full Logs CSV"):
-            csv = logs_with_names.to_csv(index=False)
-            st.download_button(
-                label="Download CSV",
-                data=csv,
-                file_name=f"quiz_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+            # Stream the export to a compressed file instead of one big string;
+            # the file lives in a scratch directory removed once it is read
+            student_names = dict(zip(students_df['student_id'], students_df['name'])) \
+                if not students_df.empty else None
+            export_dir = tempfile.mkdtemp(prefix='quiz_logs_export_')
+            try:
+                export_path = logger.export_logs(
+                    filename=os.path.join(
+                        export_dir, f"quiz_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv.gz"),
+                    compression='gzip',
+                    student_names=student_names
+                )
+                if export_path:
+                    with open(export_path, 'rb') as f:
+                        data = f.read()
+                    st.download_button(
+                        label="Download CSV",
+                        data=data,
+                        file_name=os.path.basename(export_path),
+                        mime="application/gzip"
+                    )
+            finally:
+                shutil.rmtree(export_dir, ignore_errors=True)
     
     with col2:
         if st.button("📈 Download Summary CSV"):
@@ -0,0 +1,1722 @@
+import pandas as pd
+import io
+import os
+import gzip
+import sqlite3
+import json
+import uuid
+import zlib
+import shutil
+import time
+import threading
+import queue
+import atexit
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Any, Optional, Iterator, Iterable, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: fall back to exclusive byte-range locks
+    fcntl = None
+    import msvcrt
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+LOG_COLUMNS = [
+    'student_id', 'timestamp', 'question_id', 'answer', 'correct', 'skipped',
+    'response_time', 'accuracy', 'engagement', 'avg_response_time',
+    'session_id'
+]
+
+SESSION_COLUMNS = [
+    'session_id', 'student_id', 'timestamp', 'total_questions',
+    'correct_answers', 'questions_skipped', 'accuracy', 'engagement',
+    'avg_response_time'
+]
+
+
+def parse_session_id(session_id: str) -> Optional[Dict[str, str]]:
+    """Split a '<student_id>_<YYYYmmdd>_<HHMMSS>' session id into its parts"""
+    parts = str(session_id).rsplit('_', 2)
+    if len(parts) != 3 or not (parts[1].isdigit() and len(parts[1]) == 8):
+        return None
+    day = parts[1]
+    return {
+        'student_id': parts[0],
+        'date': f"{day[:4]}-{day[4:6]}-{day[6:]}"
+    }
+
+
+class LogCache:
+    """Process-wide in-memory copy of a CSV log with hash indexes
+
+    The cache remembers how many bytes of the file it has parsed. When the
+    file grows it parses only the new tail; when it shrinks or is replaced it
+    reloads from scratch. Indexes map each value of the indexed columns to the
+    row positions holding it.
+    """
+
+    _instances: Dict[str, 'LogCache'] = {}
+    _instances_lock = threading.Lock()
+
+    # Parse identifier-like columns as strings so tail chunks and full
+    # reloads agree on dtypes
+    STRING_COLUMNS = ['student_id', 'timestamp', 'question_id', 'answer',
+                      'session_id']
+
+    def __init__(self, path: str,
+                 index_columns: tuple = ('student_id', 'session_id')):
+        self.path = path
+        self.index_columns = index_columns
+        self.hits = 0
+        self.misses = 0
+        self.incremental_refreshes = 0
+        self.full_reloads = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    @classmethod
+    def for_file(cls, path: str,
+                 index_columns: tuple = ('student_id', 'session_id')
+                 ) -> 'LogCache':
+        """Return the shared cache for a file, creating it on first use"""
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            cache = cls._instances.get(key)
+            if cache is None:
+                cache = cls(path, index_columns)
+                cls._instances[key] = cache
+            return cache
+
+    def _reset(self):
+        self.frame = pd.DataFrame()
+        self.columns = []
+        self._indexes = {column: {} for column in self.index_columns}
+        self._offset = 0
+        self._signature = None
+
+    @classmethod
+    def discard(cls, path: str):
+        """Forget the shared cache of a file that has been deleted"""
+        with cls._instances_lock:
+            cls._instances.pop(os.path.abspath(path), None)
+
+    def invalidate(self):
+        """Drop cached rows so the next read reloads the whole file"""
+        with self._lock:
+            self._reset()
+
+    def _parse(self, data: bytes, header: bool) -> pd.DataFrame:
+        kwargs = {}
+        if not header:
+            kwargs = {'header': None, 'names': self.columns}
+        dtypes = {c: str for c in self.STRING_COLUMNS}
+        return pd.read_csv(io.BytesIO(data), dtype=dtypes, **kwargs)
+
+    def _index_rows(self, rows: pd.DataFrame, base: int):
+        for column in self.index_columns:
+            if column not in rows.columns:
+                continue
+            index = self._indexes[column]
+            for value, positions in rows.groupby(column).indices.items():
+                index.setdefault(value, []).extend((positions + base).tolist())
+
+    def _consume(self, data: bytes, header: bool):
+        """Parse complete lines of data and add them to the cache"""
+        # A concurrent writer may have left a partial last line; keep it for later
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return
+        self._offset += end
+
+        if header and data.count(b'\n', 0, end) == 1:
+            self.columns = data[:end].decode('utf-8').strip().split(',')
+            self.frame = pd.DataFrame(columns=self.columns)
+            return
+
+        rows = self._parse(data[:end], header)
+        if header:
+            self.columns = list(rows.columns)
+
+        base = len(self.frame)
+        if self.frame.empty:
+            self.frame = rows.reset_index(drop=True)
+        else:
+            self.frame = pd.concat([self.frame, rows], ignore_index=True)
+        self._index_rows(rows, base)
+
+    def refresh(self):
+        """Bring the cache up to date with the file on disk"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset()
+                return
+
+            signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if signature == self._signature:
+                self.hits += 1
+                return
+            self.misses += 1
+
+            replaced = (self._signature is None
+                        or stat.st_ino != self._signature[0]
+                        or stat.st_size < self._offset)
+            if replaced:
+                self._reset()
+                self.full_reloads += 1
+            else:
+                self.incremental_refreshes += 1
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read(stat.st_size - self._offset)
+
+            self._consume(data, header=replaced)
+            self._signature = signature
+
+    def all_rows(self) -> pd.DataFrame:
+        """Return a copy of every cached row"""
+        with self._lock:
+            self.refresh()
+            return self.frame.copy()
+
+    def lookup(self, column: str, value: Any) -> pd.DataFrame:
+        """Return the rows where column == value using the hash index"""
+        with self._lock:
+            self.refresh()
+            positions = self._indexes[column].get(value, [])
+            if self.frame.empty:
+                return self.frame.copy()
+            return self.frame.iloc[positions]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters describing how well the cache is working"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'incremental_refreshes': self.incremental_refreshes,
+                'full_reloads': self.full_reloads,
+                'cached_rows': len(self.frame),
+                'cached_bytes': self._offset
+            }
+
+
+class FileLock:
+    """Cross-process advisory lock on '<path>.lock'
+
+    One instance is shared per path within a process, and holding it is
+    reentrant for the owning thread, so a rotation triggered while appending
+    does not deadlock. Shared holds let readers in other processes proceed
+    together while excluding writers (on Windows every hold is exclusive).
+    """
+
+    _instances: Dict[str, 'FileLock'] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.lock_path = path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    @classmethod
+    def for_path(cls, path: str) -> 'FileLock':
+        """Return the shared lock for a file, creating it on first use"""
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            lock = cls._instances.get(key)
+            if lock is None:
+                lock = cls(path)
+                cls._instances[key] = lock
+            return lock
+
+    def _acquire(self, shared: bool):
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)),
+                    exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _release(self):
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    @contextmanager
+    def hold(self, shared: bool = False):
+        """Hold the lock for the duration of a with-block"""
+        with self._thread_lock:
+            if self._depth == 0:
+                self._acquire(shared)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._release()
+
+
+class CSVTable:
+    """One append-only CSV file with a fixed column set
+
+    Appends from any number of processes are serialized by a FileLock, and
+    each append reaches the file as one O_APPEND write, so rows are never
+    lost or interleaved.
+    """
+
+    def __init__(self, path: str, columns: List[str], fsync: bool = False,
+                 cache: bool = True):
+        self.path = path
+        self.columns = columns
+        # fsync after every append so a completed quiz survives power loss
+        self.fsync = fsync
+        self.lock = FileLock.for_path(path)
+        self._file_columns = None
+        self._ensure_file_exists()
+        self.cache = LogCache.for_file(path) if cache else None
+
+    def _ensure_file_exists(self):
+        """Ensure the file and directory exist"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self.lock.hold():
+            if not os.path.exists(self.path):
+                # Create empty file with headers
+                empty_df = pd.DataFrame(columns=self.columns)
+                empty_df.to_csv(self.path, index=False)
+
+    def _read_header(self) -> List[str]:
+        """Return the column order of the existing file, if any"""
+        if self._file_columns is None:
+            try:
+                with open(self.path, 'r', newline='') as f:
+                    header = f.readline().strip()
+            except FileNotFoundError:
+                header = ''
+            self._file_columns = header.split(',') if header else []
+        return self._file_columns
+
+    def append(self, rows: pd.DataFrame):
+        """Append rows to the file without rewriting existing data"""
+        with self.lock.hold():
+            # Another process may have created, truncated or rotated the file
+            try:
+                if os.path.getsize(self.path) == 0:
+                    self._file_columns = []
+            except FileNotFoundError:
+                self._file_columns = []
+
+            columns = self._read_header()
+            write_header = not columns
+            if write_header:
+                columns = list(self.columns)
+
+            # Serialize first so the rows reach the file in a single write
+            payload = rows.reindex(columns=columns).to_csv(
+                index=False, header=write_header).encode('utf-8')
+
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                         0o644)
+            try:
+                view = memoryview(payload)
+                while view:
+                    written = os.write(fd, view)
+                    view = view[written:]
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+
+            self._file_columns = columns
+
+    def read(self, student_id: Optional[str] = None,
+             session_id: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read rows, optionally filtered by student or session"""
+        if self.cache is not None:
+            if student_id is not None:
+                df = self.cache.lookup('student_id', student_id)
+            elif session_id is not None:
+                df = self.cache.lookup('session_id', session_id)
+            else:
+                df = self.cache.all_rows()
+            if df.empty and not len(df.columns):
+                return pd.DataFrame()
+        else:
+            try:
+                df = pd.read_csv(self.path)
+            except (FileNotFoundError, pd.errors.EmptyDataError):
+                return pd.DataFrame()
+
+        if student_id is not None:
+            df = df[df['student_id'] == student_id]
+        if session_id is not None:
+            df = df[df['session_id'] == session_id]
+        if columns is not None:
+            df = df[columns]
+        return df
+
+    def read_since(self, cursor: Optional[Dict[str, Any]] = None
+                   ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Rows appended after cursor, and the cursor to continue from
+
+        The cursor is the byte offset read up to plus a checksum of the line
+        ending there. If that line is no longer in place, because the file
+        was rewritten or cleared, every row is returned again.
+        """
+        with self.lock.hold(shared=True):
+            try:
+                with open(self.path, 'rb') as f:
+                    header = f.readline()
+                    start = len(header)
+                    if cursor is not None and cursor.get('offset', 0) > start:
+                        f.seek(cursor['line_start'])
+                        line = f.read(cursor['offset'] - cursor['line_start'])
+                        if zlib.crc32(line) == cursor['crc']:
+                            start = cursor['offset']
+                    f.seek(start)
+                    data = f.read()
+            except FileNotFoundError:
+                return pd.DataFrame(columns=self.columns), {'offset': 0}
+
+        if not data:
+            return pd.DataFrame(columns=self.columns), cursor or {'offset': start}
+
+        # Appends hold the lock exclusively, so data ends on a line boundary
+        line_start = start + data.rfind(b'\n', 0, len(data) - 1) + 1
+        end = start + len(data)
+        columns = header.decode('utf-8').strip().split(',')
+        rows = pd.read_csv(io.BytesIO(data), header=None, names=columns,
+                           dtype={c: str for c in LogCache.STRING_COLUMNS
+                                  if c in columns})
+        return rows, {'offset': end, 'line_start': line_start,
+                      'crc': zlib.crc32(data[line_start - start:])}
+
+    def is_empty(self) -> bool:
+        """True if the file holds no data rows"""
+        try:
+            with open(self.path, 'rb') as f:
+                f.readline()
+                return not f.readline()
+        except FileNotFoundError:
+            return True
+
+    def clear(self):
+        """Remove all rows, keeping the header"""
+        with self.lock.hold():
+            empty_df = pd.DataFrame(columns=self.columns)
+            empty_df.to_csv(self.path, index=False)
+            self._file_columns = list(self.columns)
+        if self.cache is not None:
+            self.cache.invalidate()
+
+
+class LogSegments:
+    """Rotated and archived segments of a CSV log, tracked in a manifest
+
+    Segments live in '<log>_segments/' next to the active log file. The
+    manifest records each segment's file, format, row count and timestamp
+    range so readers can skip segments outside a query's time range.
+    Formats are 'csv' for freshly rotated segments and 'parquet' or
+    'csv.gz' for compacted archives.
+    """
+
+    # Rotated CSV segments read most recently keep their parsed cache; older
+    # ones are dropped so reading history does not hold every segment
+    CACHED_SEGMENTS = 4
+    _segment_caches: 'OrderedDict[str, LogCache]' = OrderedDict()
+    _segment_caches_lock = threading.Lock()
+
+    def __init__(self, log_file: str):
+        self.directory = os.path.splitext(log_file)[0] + '_segments'
+        self.manifest_path = os.path.join(self.directory, 'manifest.json')
+        self._manifest = None
+        self._signature = None
+        self._lock = threading.RLock()
+
+    def load(self) -> Dict[str, Any]:
+        """Return the manifest, re-reading it only when the file changed"""
+        with self._lock:
+            try:
+                stat = os.stat(self.manifest_path)
+            except FileNotFoundError:
+                return {'segments': [], 'active_since': None}
+
+            signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+            if signature != self._signature:
+                with open(self.manifest_path, 'r') as f:
+                    self._manifest = json.load(f)
+                self._signature = signature
+            return self._manifest
+
+    def save(self, manifest: Dict[str, Any]):
+        """Replace the manifest atomically"""
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.manifest_path)
+            self._manifest = manifest
+            stat = os.stat(self.manifest_path)
+            self._signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def segments(self, start: Optional[str] = None,
+                 end: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Segments whose timestamp range overlaps [start, end)"""
+        return [
+            entry for entry in self.load()['segments']
+            if (end is None or entry['min_ts'] < end)
+            and (start is None or entry['max_ts'] >= start)
+        ]
+
+    def path_of(self, entry: Dict[str, Any]) -> str:
+        return os.path.join(self.directory, entry['file'])
+
+    def _scan(self, path: str, compression: Optional[str] = None) -> Dict[str, Any]:
+        """Row count and timestamp range of a CSV segment"""
+        rows, min_ts, max_ts = 0, None, None
+        for chunk in pd.read_csv(path, usecols=['timestamp'], dtype=str,
+                                 compression=compression, chunksize=100000):
+            if chunk.empty:
+                continue
+            rows += len(chunk)
+            low, high = chunk['timestamp'].min(), chunk['timestamp'].max()
+            min_ts = low if min_ts is None else min(min_ts, low)
+            max_ts = high if max_ts is None else max(max_ts, high)
+        return {'rows': rows, 'min_ts': min_ts, 'max_ts': max_ts}
+
+    def rotate(self, active_path: str) -> Optional[Dict[str, Any]]:
+        """Move the active log into a new segment; returns its manifest entry"""
+        with self._lock:
+            manifest = dict(self.load())
+            stats = self._scan(active_path)
+            now = datetime.now()
+            if stats['rows'] == 0:
+                manifest['active_since'] = now.isoformat()
+                self.save(manifest)
+                return None
+
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"logs-{now.strftime('%Y%m%dT%H%M%S%f')}.csv"
+            os.replace(active_path, os.path.join(self.directory, name))
+
+            entry = {'file': name, 'format': 'csv', **stats}
+            manifest['segments'] = manifest['segments'] + [entry]
+            manifest['active_since'] = now.isoformat()
+            self.save(manifest)
+            return entry
+
+    def compact(self, cutoff: str) -> Optional[Dict[str, Any]]:
+        """Merge CSV segments that end before cutoff into one compressed archive"""
+        with self._lock:
+            manifest = dict(self.load())
+            old = [e for e in manifest['segments']
+                   if e['format'] == 'csv' and e['max_ts'] < cutoff]
+            if not old:
+                return None
+
+            stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+            if PYARROW_AVAILABLE:
+                name, file_format, compression = (f"archive-{stamp}.parquet",
+                                                  'parquet', 'zstd')
+            else:
+                name, file_format, compression = (f"archive-{stamp}.csv.gz",
+                                                  'csv', 'gzip')
+
+            chunks = (chunk for entry in old
+                      for chunk in self.iter_segment(entry))
+            rows = write_export(chunks, os.path.join(self.directory, name),
+                                file_format=file_format,
+                                compression=compression)
+
+            archive = {
+                'file': name,
+                'format': 'parquet' if file_format == 'parquet' else 'csv.gz',
+                'rows': rows,
+                'min_ts': min(e['min_ts'] for e in old),
+                'max_ts': max(e['max_ts'] for e in old)
+            }
+            old_files = {e['file'] for e in old}
+            kept = [e for e in manifest['segments'] if e['file'] not in old_files]
+            manifest['segments'] = sorted(kept + [archive],
+                                          key=lambda e: e['min_ts'])
+            self.save(manifest)
+
+            for entry in old:
+                self._remove_file(entry)
+            return archive
+
+    def apply_retention(self, cutoff: str) -> int:
+        """Delete segments whose newest row is older than cutoff"""
+        with self._lock:
+            manifest = dict(self.load())
+            expired = [e for e in manifest['segments'] if e['max_ts'] < cutoff]
+            if not expired:
+                return 0
+
+            manifest['segments'] = [e for e in manifest['segments']
+                                    if e['max_ts'] >= cutoff]
+            self.save(manifest)
+            for entry in expired:
+                self._remove_file(entry)
+            return sum(e['rows'] for e in expired)
+
+    @classmethod
+    def segment_cache(cls, path: str) -> LogCache:
+        """Cache of a rotated segment, evicting the least recently read ones"""
+        key = os.path.abspath(path)
+        with cls._segment_caches_lock:
+            cache = cls._segment_caches.get(key)
+            if cache is None:
+                cache = cls._segment_caches[key] = LogCache(path)
+                while len(cls._segment_caches) > cls.CACHED_SEGMENTS:
+                    cls._segment_caches.popitem(last=False)
+            else:
+                cls._segment_caches.move_to_end(key)
+            return cache
+
+    @classmethod
+    def discard_cache(cls, path: str):
+        with cls._segment_caches_lock:
+            cls._segment_caches.pop(os.path.abspath(path), None)
+
+    def _remove_file(self, entry: Dict[str, Any]):
+        path = self.path_of(entry)
+        self.discard_cache(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def read_segment(self, entry: Dict[str, Any],
+                     student_id: Optional[str] = None,
+                     session_id: Optional[str] = None,
+                     start: Optional[str] = None,
+                     end: Optional[str] = None) -> pd.DataFrame:
+        """Read matching rows of one segment"""
+        path = self.path_of(entry)
+        if entry['format'] == 'csv':
+            # Rotated segments never change, so their cache never reloads
+            cache = self.segment_cache(path)
+            if student_id is not None:
+                rows = cache.lookup('student_id', student_id)
+            elif session_id is not None:
+                rows = cache.lookup('session_id', session_id)
+            else:
+                rows = cache.all_rows()
+        elif entry['format'] == 'parquet':
+            predicate = None
+            for column, value in [('student_id', student_id),
+                                  ('session_id', session_id)]:
+                if value is not None:
+                    term = ds.field(column) == value
+                    predicate = term if predicate is None else predicate & term
+            rows = ds.dataset(path, format='parquet').to_table(
+                filter=predicate).to_pandas()
+        else:
+            rows = pd.read_csv(path, compression='gzip',
+                               dtype={c: str for c in LogCache.STRING_COLUMNS})
+
+        if rows.empty:
+            return rows
+        if student_id is not None:
+            rows = rows[rows['student_id'] == student_id]
+        if session_id is not None:
+            rows = rows[rows['session_id'] == session_id]
+        return filter_rows(rows, start, end)
+
+    def iter_segment(self, entry: Dict[str, Any], chunksize: int = 50000,
+                     start: Optional[str] = None, end: Optional[str] = None,
+                     student_ids: Optional[set] = None
+                     ) -> Iterator[pd.DataFrame]:
+        """Stream one segment in bounded chunks"""
+        path = self.path_of(entry)
+        if entry['format'] == 'parquet':
+            dataset = ds.dataset(path, format='parquet')
+            batches = (b.to_pandas()
+                       for b in dataset.to_batches(batch_size=chunksize))
+        else:
+            batches = pd.read_csv(
+                path, chunksize=chunksize,
+                compression='gzip' if entry['format'] == 'csv.gz' else None,
+                dtype={c: str for c in LogCache.STRING_COLUMNS})
+        for chunk in batches:
+            chunk = filter_rows(chunk, start, end, student_ids)
+            if not chunk.empty:
+                yield chunk
+
+
+class CSVLogStore:
+    """Stores quiz log rows and session summaries in append-only CSV files
+
+    The active log can be rotated into segments by size (rotate_bytes) or
+    age (rotate_interval, in seconds). After each rotation, segments whose
+    newest row is older than compact_after_days are merged into a compressed
+    archive and segments older than retention_days are deleted. Reads merge
+    the segments that overlap the query's time range with the active file.
+
+    Several processes may share one log: appends, rotation and maintenance
+    take the log's FileLock, and reads hold it shared so they never see a
+    segment both in the manifest and in the active file.
+    """
+
+    def __init__(self, log_file: str, fsync: bool = False, cache: bool = True,
+                 rotate_bytes: Optional[int] = None,
+                 rotate_interval: Optional[float] = None,
+                 compact_after_days: Optional[float] = None,
+                 retention_days: Optional[float] = None):
+        self.log_file = log_file
+        self.sessions_file = os.path.splitext(log_file)[0] + '_sessions.csv'
+
+        self.rows = CSVTable(log_file, LOG_COLUMNS, fsync=fsync, cache=cache)
+        with FileLock.for_path(self.sessions_file).hold():
+            # Decided under the lock so only one process backfills
+            backfill = not os.path.exists(self.sessions_file)
+            self.sessions = CSVTable(self.sessions_file, SESSION_COLUMNS,
+                                     fsync=fsync, cache=cache)
+            if backfill and not self.rows.is_empty():
+                # Logs written before summaries existed: materialize them once
+                self.sessions.append(summarize_sessions(self.rows.read()))
+        self.cache = self.rows.cache
+        self.segments = LogSegments(log_file)
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.compact_after_days = compact_after_days
+        self.retention_days = retention_days
+
+    def append(self, rows: pd.DataFrame):
+        """Append per-question log rows"""
+        self.rows.append(rows)
+        if self._rotation_due():
+            with self.rows.lock.hold():
+                # Another process may have rotated while we waited
+                if self._rotation_due():
+                    self.rotate()
+                    self.maintain()
+
+    def append_sessions(self, sessions: pd.DataFrame):
+        """Append one summary row per completed session"""
+        self.sessions.append(sessions)
+
+    def _rotation_due(self) -> bool:
+        if self.rotate_bytes is not None:
+            try:
+                if os.path.getsize(self.log_file) >= self.rotate_bytes:
+                    return True
+            except FileNotFoundError:
+                return False
+
+        if self.rotate_interval is not None:
+            manifest = self.segments.load()
+            if manifest['active_since'] is None:
+                # First write under a rotation policy starts the clock
+                with self.rows.lock.hold():
+                    manifest = self.segments.load()
+                    if manifest['active_since'] is None:
+                        self.segments.save({
+                            **manifest,
+                            'active_since': datetime.now().isoformat()})
+                return False
+            age = datetime.now() - datetime.fromisoformat(manifest['active_since'])
+            return age.total_seconds() >= self.rotate_interval
+        return False
+
+    def rotate(self) -> Optional[Dict[str, Any]]:
+        """Move the active log into a segment and start a new active file"""
+        with self.rows.lock.hold():
+            entry = self.segments.rotate(self.log_file)
+            self.rows._file_columns = None
+            self.rows._ensure_file_exists()
+        return entry
+
+    def maintain(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Apply the compaction and retention policies to rotated segments"""
+        now = now or datetime.now()
+        result = {'archive': None, 'expired_rows': 0}
+
+        with self.rows.lock.hold():
+            if self.retention_days is not None:
+                cutoff = (now - timedelta(days=self.retention_days)).isoformat()
+                result['expired_rows'] = self.segments.apply_retention(cutoff)
+                self._expire_sessions(cutoff)
+
+            if self.compact_after_days is not None:
+                cutoff = (now - timedelta(days=self.compact_after_days)).isoformat()
+                result['archive'] = self.segments.compact(cutoff)
+        return result
+
+    def _expire_sessions(self, cutoff: str):
+        """Drop session summaries older than cutoff"""
+        with self.sessions.lock.hold():
+            sessions = self.sessions.read()
+            if sessions.empty:
+                return
+            keep = sessions[sessions['timestamp'].astype(str) >= cutoff]
+            if len(keep) == len(sessions):
+                return
+
+            tmp_path = self.sessions_file + '.tmp'
+            keep.to_csv(tmp_path, index=False)
+            os.replace(tmp_path, self.sessions_file)
+            self.sessions._file_columns = None
+        if self.sessions.cache is not None:
+            self.sessions.cache.invalidate()
+
+    def read(self, student_id: Optional[str] = None,
+             session_id: Optional[str] = None,
+             columns: Optional[List[str]] = None,
+             start=None, end=None) -> pd.DataFrame:
+        """Read log rows, optionally filtered by student, session or time
+
+        Rotated segments outside [start, end) are not opened. A session
+        lookup is limited to the day encoded in its session id.
+        """
+        start, end = _as_iso(start), _as_iso(end)
+        prune_start, prune_end = start, end
+        if session_id is not None and start is None and end is None:
+            parsed = parse_session_id(session_id)
+            if parsed is not None:
+                day = datetime.fromisoformat(parsed['date'])
+                prune_start = day.date().isoformat()
+                prune_end = (day + timedelta(days=1)).date().isoformat()
+
+        with self.rows.lock.hold(shared=True):
+            parts = [
+                self.segments.read_segment(entry, student_id, session_id,
+                                           start, end)
+                for entry in self.segments.segments(prune_start, prune_end)
+            ]
+            active = self.rows.read(student_id, session_id)
+
+        if (start is not None or end is not None) and not active.empty:
+            active = filter_rows(active, start, end)
+
+        parts = [part for part in parts if not part.empty]
+        if parts:
+            df = pd.concat(parts + [active], ignore_index=True)
+        else:
+            df = active
+
+        if columns is not None and not df.empty:
+            df = df[columns]
+        return df
+
+    def read_sessions(self, student_id: Optional[str] = None,
+                      session_id: Optional[str] = None) -> pd.DataFrame:
+        """Read session summaries, optionally filtered by student or session"""
+        return self.sessions.read(student_id, session_id)
+
+    def read_sessions_since(self, cursor: Optional[Dict[str, Any]] = None
+                            ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Session summaries appended after cursor, and the next cursor"""
+        if cursor is not None and cursor.get('store') != 'csv':
+            cursor = None
+        sessions, cursor = self.sessions.read_since(cursor)
+        return sessions, {**cursor, 'store': 'csv'}
+
+    def clear(self):
+        """Remove all rows, summaries and segments, keeping the headers"""
+        with self.rows.lock.hold():
+            self.rows.clear()
+            self.sessions.clear()
+            for entry in self.segments.load()['segments']:
+                self.segments._remove_file(entry)
+            self.segments.save({'segments': [], 'active_since': None})
+
+    def import_csv(self, csv_path: str, chunksize: int = 100000) -> int:
+        """Append rows from another logs.csv file"""
+        return import_csv_into(self, csv_path, chunksize)
+
+    def export_csv(self, csv_path: str) -> int:
+        """Write every segment and the active log to csv_path"""
+        return write_export(self.iter_chunks(), csv_path)
+
+    def iter_chunks(self, chunksize: int = 50000, start=None, end=None,
+                    student_ids: Optional[Iterable[str]] = None
+                    ) -> Iterator[pd.DataFrame]:
+        """Stream log rows from disk in bounded-size, filtered chunks"""
+        start, end = _as_iso(start), _as_iso(end)
+        student_ids = set(student_ids) if student_ids is not None else None
+        for entry in self.segments.segments(start, end):
+            yield from self.segments.iter_segment(entry, chunksize, start, end,
+                                                  student_ids)
+        try:
+            reader = pd.read_csv(self.log_file, chunksize=chunksize,
+                                 dtype={c: str for c in LogCache.STRING_COLUMNS})
+            for chunk in reader:
+                chunk = filter_rows(chunk, start, end, student_ids)
+                if not chunk.empty:
+                    yield chunk
+        except (FileNotFoundError, pd.errors.EmptyDataError):
+            return
+
+
+class ParquetTable:
+    """Parquet files partitioned by date and student bucket
+
+    Layout: <root>/date=YYYY-MM-DD/bucket=NN/part-<id>.parquet. Lookups for a
+    student only open that student's bucket directories, and session lookups
+    additionally narrow to the session's date, before the remaining row
+    filter is pushed down into the Parquet reader. Every append writes a
+    small file, so once a partition holds compact_files of them they are
+    merged into one.
+
+    Appends take the table's lock and stamp their files with a sequence
+    number that only grows, so files become visible in stamp order. A
+    merged file records the stamp and row count of every file it replaced,
+    which lets read_since() resume after any stamp.
+    """
+
+    def __init__(self, root: str, schema: 'pa.Schema', num_buckets: int = 16,
+                 fsync: bool = False, compact_files: Optional[int] = 32):
+        self.root = root
+        self.schema = schema
+        self.columns = schema.names
+        self.fsync = fsync
+        self.compact_files = compact_files
+        os.makedirs(self.root, exist_ok=True)
+        self.num_buckets = self._load_layout(num_buckets)
+        # Appends and compaction hold this lock; readers hold it shared
+        self.lock = FileLock.for_path(os.path.join(self.root, '_files'))
+        self.sequence_file = os.path.join(self.root, '_sequence')
+
+    def _load_layout(self, num_buckets: int) -> int:
+        """Read the bucket count of an existing dataset or record a new one"""
+        layout_file = os.path.join(self.root, '_layout.json')
+        if os.path.exists(layout_file):
+            with open(layout_file, 'r') as f:
+                return int(json.load(f)['num_buckets'])
+
+        with open(layout_file, 'w') as f:
+            json.dump({'num_buckets': num_buckets}, f)
+        return num_buckets
+
+    def bucket_for(self, student_id: str) -> int:
+        """Stable hash bucket for a student id"""
+        return zlib.crc32(str(student_id).encode('utf-8')) % self.num_buckets
+
+    def _partition_dir(self, date: str, bucket: int) -> str:
+        return os.path.join(self.root, f"date={date}", f"bucket={bucket:02d}")
+
+    def _partition_dirs(self, date: Optional[str] = None,
+                        bucket: Optional[int] = None,
+                        min_date: Optional[str] = None,
+                        max_date: Optional[str] = None,
+                        buckets: Optional[set] = None) -> List[str]:
+        """List partition directories, pruning those that cannot match"""
+        if date is not None:
+            date_dirs = [f"date={date}"]
+        else:
+            date_dirs = sorted(
+                d for d in os.listdir(self.root) if d.startswith('date=')
+                and (min_date is None or d[5:] >= min_date)
+                and (max_date is None or d[5:] <= max_date))
+
+        part_dirs = []
+        for date_dir in date_dirs:
+            date_path = os.path.join(self.root, date_dir)
+            if not os.path.isdir(date_path):
+                continue
+            if bucket is not None:
+                bucket_dirs = [f"bucket={bucket:02d}"]
+            elif buckets is not None:
+                bucket_dirs = [f"bucket={b:02d}" for b in sorted(buckets)]
+            else:
+                bucket_dirs = sorted(os.listdir(date_path))
+            part_dirs.extend(
+                os.path.join(date_path, bucket_dir) for bucket_dir in bucket_dirs
+                if os.path.isdir(os.path.join(date_path, bucket_dir)))
+        return part_dirs
+
+    def _partition_files(self, **partitions) -> List[str]:
+        """List data files, pruning partitions that cannot match"""
+        return [os.path.join(part_dir, name)
+                for part_dir in self._partition_dirs(**partitions)
+                for name in self._part_names(part_dir)]
+
+    def append(self, rows: pd.DataFrame):
+        """Write rows as new files in their date/bucket partitions"""
+        if rows.empty:
+            return
+
+        rows = rows.reindex(columns=self.columns)
+        dates = rows['timestamp'].astype(str).str[:10]
+        buckets = rows['student_id'].map(self.bucket_for)
+
+        with self.lock.hold():
+            stamp = self._next_stamp()
+            for (date, bucket), part in rows.groupby([dates, buckets], sort=False):
+                part_dir = self._partition_dir(date, bucket)
+                os.makedirs(part_dir, exist_ok=True)
+
+                table = pa.Table.from_pandas(part, schema=self.schema,
+                                             preserve_index=False)
+                self._write_file(part_dir, table, stamp)
+
+                if (self.compact_files is not None
+                        and len(self._part_names(part_dir)) >= self.compact_files):
+                    self.compact_partition(part_dir)
+
+    def _next_stamp(self) -> int:
+        """Next file stamp: the clock in nanoseconds, but always increasing
+
+        Called with the lock held, so no two appends share a stamp.
+        """
+        try:
+            with open(self.sequence_file, 'r') as f:
+                last = int(f.read() or 0)
+        except (FileNotFoundError, ValueError):
+            last = 0
+        stamp = max(time.time_ns(), last + 1)
+        tmp_path = f"{self.sequence_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(str(stamp))
+        os.replace(tmp_path, self.sequence_file)
+        return stamp
+
+    def _read_file(self, path: str) -> Tuple['pa.Table', List[List[int]]]:
+        """A part file's rows and the [stamp, rows] of each append it holds"""
+        table = pq.read_table(path)
+        metadata = table.schema.metadata or {}
+        if b'part_stamps' in metadata:
+            stamps = json.loads(metadata[b'part_stamps'])
+        else:
+            stamps = [[int(os.path.basename(path).split('-')[1]), table.num_rows]]
+        return table.replace_schema_metadata(None).cast(self.schema), stamps
+
+    def _write_file(self, part_dir: str, table: 'pa.Table', stamp: int) -> str:
+        """Write one part file, named after stamp so it sorts in write order"""
+        name = f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = os.path.join(part_dir, f".{name}.tmp")
+
+        # Write under a hidden name so readers never see a partial file
+        with open(tmp_path, 'wb') as f:
+            pq.write_table(table, f)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        path = os.path.join(part_dir, name)
+        os.replace(tmp_path, path)
+        return path
+
+    @staticmethod
+    def _part_names(part_dir: str) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(part_dir)
+                          if name.endswith('.parquet'))
+        except FileNotFoundError:
+            return []
+
+    def compact_partition(self, part_dir: str) -> int:
+        """Merge the files of one partition into one, returning how many were merged
+
+        The merged file takes the stamp of the newest file it replaces.
+        """
+        with self.lock.hold():
+            names = self._part_names(part_dir)
+            if len(names) < 2:
+                return 0
+            paths = [os.path.join(part_dir, name) for name in names]
+            tables, stamps = [], []
+            for path in paths:
+                table, file_stamps = self._read_file(path)
+                tables.append(table)
+                stamps.extend(file_stamps)
+            table = pa.concat_tables(tables).replace_schema_metadata(
+                {'part_stamps': json.dumps(stamps)})
+            self._write_file(part_dir, table, stamps[-1][0])
+            for path in paths:
+                os.remove(path)
+        return len(paths)
+
+    def compact(self, min_files: int = 2) -> int:
+        """Merge the files of every partition holding at least min_files"""
+        merged = 0
+        for date_dir in sorted(os.listdir(self.root)):
+            date_path = os.path.join(self.root, date_dir)
+            if not date_dir.startswith('date=') or not os.path.isdir(date_path):
+                continue
+            for bucket_dir in sorted(os.listdir(date_path)):
+                part_dir = os.path.join(date_path, bucket_dir)
+                if (os.path.isdir(part_dir)
+                        and len(self._part_names(part_dir)) >= max(min_files, 2)):
+                    merged += self.compact_partition(part_dir)
+        return merged
+
+    def read(self, student_id: Optional[str] = None,
+             session_id: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read rows, touching only the partitions that can match"""
+        date = None
+        if session_id is not None:
+            parsed = parse_session_id(session_id)
+            if parsed is not None:
+                date = parsed['date']
+                if student_id is None:
+                    student_id = parsed['student_id']
+
+        bucket = self.bucket_for(student_id) if student_id is not None else None
+        columns = list(columns) if columns is not None else list(self.columns)
+
+        predicate = None
+        if student_id is not None:
+            predicate = ds.field('student_id') == student_id
+        if session_id is not None:
+            session_predicate = ds.field('session_id') == session_id
+            predicate = (session_predicate if predicate is None
+                         else predicate & session_predicate)
+
+        # Compaction cannot remove the listed files while the lock is held
+        with self.lock.hold(shared=True):
+            files = self._partition_files(date=date, bucket=bucket)
+            if not files:
+                return pd.DataFrame(columns=columns)
+            dataset = ds.dataset(files, schema=self.schema, format='parquet')
+            table = dataset.to_table(columns=columns, filter=predicate)
+        return table.to_pandas()
+
+    def iter_batches(self, chunksize: int = 50000, start=None, end=None,
+                     student_ids: Optional[Iterable[str]] = None
+                     ) -> Iterator[pd.DataFrame]:
+        """Stream rows in record batches, skipping partitions outside the filter"""
+        start, end = _as_iso(start), _as_iso(end)
+        student_ids = set(student_ids) if student_ids is not None else None
+        buckets = ({self.bucket_for(s) for s in student_ids}
+                   if student_ids is not None else None)
+
+        predicate = None
+        if start is not None:
+            predicate = ds.field('timestamp') >= start
+        if end is not None:
+            end_predicate = ds.field('timestamp') < end
+            predicate = (end_predicate if predicate is None
+                         else predicate & end_predicate)
+        if student_ids is not None:
+            ids_predicate = ds.field('student_id').isin(sorted(student_ids))
+            predicate = (ids_predicate if predicate is None
+                         else predicate & ids_predicate)
+
+        part_dirs = self._partition_dirs(min_date=start[:10] if start else None,
+                                         max_date=end[:10] if end else None,
+                                         buckets=buckets)
+        # One partition at a time, each read whole under the shared lock, so
+        # compaction never removes a file mid-read and the lock is not held
+        # while the caller consumes the batches
+        for part_dir in part_dirs:
+            with self.lock.hold(shared=True):
+                files = [os.path.join(part_dir, name)
+                         for name in self._part_names(part_dir)]
+                if not files:
+                    continue
+                dataset = ds.dataset(files, schema=self.schema, format='parquet')
+                table = dataset.to_table(filter=predicate)
+            for batch in table.to_batches(max_chunksize=chunksize):
+                if batch.num_rows:
+                    yield batch.to_pandas()
+
+    def read_since(self, stamp: int = 0) -> Tuple[pd.DataFrame, int]:
+        """Rows appended after the given stamp, and the stamp to continue from
+
+        Only files stamped later are opened; rows of a merged file that
+        came from earlier appends are skipped.
+        """
+        with self.lock.hold(shared=True):
+            files = self._partition_files()
+            last = max((int(os.path.basename(path).split('-')[1]) for path in files),
+                       default=stamp)
+            parts = []
+            for path in files:
+                if int(os.path.basename(path).split('-')[1]) <= stamp:
+                    continue
+                table, file_stamps = self._read_file(path)
+                offset = 0
+                for part_stamp, count in file_stamps:
+                    if part_stamp > stamp:
+                        parts.append(table.slice(offset, count))
+                    offset += count
+
+        if not parts:
+            return pd.DataFrame(columns=self.columns), max(last, stamp)
+        return pa.concat_tables(parts).to_pandas(), max(last, stamp)
+
+    def clear(self):
+        """Remove every partition, keeping the dataset layout"""
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith('date=') and os.path.isdir(path):
+                shutil.rmtree(path)
+
+
+class ParquetLogStore:
+    """Stores quiz log rows and session summaries as partitioned Parquet datasets"""
+
+    def __init__(self, root: str, num_buckets: int = 16, fsync: bool = False,
+                 compact_files: Optional[int] = 32):
+        if not PYARROW_AVAILABLE:
+            raise ImportError(
+                "pyarrow is required for the parquet log backend "
+                "(pip install pyarrow)")
+
+        self.root = root
+        self.rows = ParquetTable(root, pa.schema([
+            ('student_id', pa.string()),
+            ('timestamp', pa.string()),
+            ('question_id', pa.string()),
+            ('answer', pa.string()),
+            ('correct', pa.bool_()),
+            ('skipped', pa.bool_()),
+            ('response_time', pa.float64()),
+            ('accuracy', pa.float64()),
+            ('engagement', pa.float64()),
+            ('avg_response_time', pa.float64()),
+            ('session_id', pa.string())
+        ]), num_buckets=num_buckets, fsync=fsync, compact_files=compact_files)
+        self.sessions = ParquetTable(os.path.join(root, 'sessions'), pa.schema([
+            ('session_id', pa.string()),
+            ('student_id', pa.string()),
+            ('timestamp', pa.string()),
+            ('total_questions', pa.int64()),
+            ('correct_answers', pa.int64()),
+            ('questions_skipped', pa.int64()),
+            ('accuracy', pa.float64()),
+            ('engagement', pa.float64()),
+            ('avg_response_time', pa.float64())
+        ]), num_buckets=self.rows.num_buckets, fsync=fsync,
+            compact_files=compact_files)
+
+    def append(self, rows: pd.DataFrame):
+        """Append per-question log rows"""
+        self.rows.append(rows)
+
+    def append_sessions(self, sessions: pd.DataFrame):
+        """Append one summary row per completed session"""
+        self.sessions.append(sessions)
+
+    def read(self, student_id: Optional[str] = None,
+             session_id: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read log rows, touching only the partitions that can match"""
+        return self.rows.read(student_id, session_id, columns)
+
+    def read_sessions(self, student_id: Optional[str] = None,
+                      session_id: Optional[str] = None) -> pd.DataFrame:
+        """Read session summaries, touching only the partitions that can match"""
+        return self.sessions.read(student_id, session_id)
+
+    def read_sessions_since(self, cursor: Optional[Dict[str, Any]] = None
+                            ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Session summaries appended after cursor, and the next cursor"""
+        stamp = cursor.get('stamp', 0) if cursor and cursor.get('store') == 'parquet' else 0
+        sessions, stamp = self.sessions.read_since(stamp)
+        return sessions, {'store': 'parquet', 'stamp': stamp}
+
+    def clear(self):
+        """Remove all rows and summaries"""
+        self.rows.clear()
+        self.sessions.clear()
+
+    def compact(self, min_files: int = 2) -> int:
+        """Merge the small files of every partition, e.g. from a nightly job"""
+        return self.rows.compact(min_files) + self.sessions.compact(min_files)
+
+    def import_csv(self, csv_path: str, chunksize: int = 100000) -> int:
+        """Load rows from a logs.csv file into the dataset"""
+        return import_csv_into(self, csv_path, chunksize)
+
+    def export_csv(self, csv_path: str) -> int:
+        """Write the whole dataset out in the logs.csv format"""
+        return write_export(self.iter_chunks(), csv_path)
+
+    def iter_chunks(self, chunksize: int = 50000, start=None, end=None,
+                    student_ids: Optional[Iterable[str]] = None
+                    ) -> Iterator[pd.DataFrame]:
+        """Stream log rows in bounded-size, filtered chunks"""
+        return self.rows.iter_batches(chunksize, start, end, student_ids)
+
+
+class SQLiteLogStore:
+    """Stores quiz log rows and session summaries in a SQLite database
+
+    The database runs in WAL mode so readers are not blocked while a write
+    is in progress, and has secondary indexes for the columns the dashboard
+    and per-student history filter on. Each thread gets its own connection.
+    """
+
+    SQL_TYPES = {
+        'correct': 'INTEGER', 'skipped': 'INTEGER', 'total_questions': 'INTEGER',
+        'correct_answers': 'INTEGER', 'questions_skipped': 'INTEGER',
+        'response_time': 'REAL', 'accuracy': 'REAL', 'engagement': 'REAL',
+        'avg_response_time': 'REAL'
+    }
+    BOOL_COLUMNS = ['correct', 'skipped']
+
+    def __init__(self, db_path: str, fsync: bool = False):
+        self.db_path = db_path
+        self.fsync = fsync
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._create_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            # NORMAL is durable across application crashes in WAL mode;
+            # FULL also survives power loss
+            conn.execute(f"PRAGMA synchronous={'FULL' if self.fsync else 'NORMAL'}")
+            self._local.conn = conn
+        return conn
+
+    def _column_defs(self, columns: List[str]) -> str:
+        return ', '.join(f"{c} {self.SQL_TYPES.get(c, 'TEXT')}" for c in columns)
+
+    def _create_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS logs ({self._column_defs(LOG_COLUMNS)})")
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS sessions ({self._column_defs(SESSION_COLUMNS)})")
+            for column in ['student_id', 'session_id', 'question_id', 'timestamp']:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_logs_{column} ON logs({column})")
+            for column in ['student_id', 'session_id', 'timestamp']:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_sessions_{column} "
+                    f"ON sessions({column})")
+
+    def _insert(self, table: str, columns: List[str], rows: pd.DataFrame):
+        if rows.empty:
+            return
+        rows = rows.reindex(columns=columns)
+        rows = rows.astype(object).where(rows.notna(), None)
+        placeholders = ', '.join('?' for _ in columns)
+        conn = self._connect()
+        # One transaction and one prepared statement for the whole batch
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                rows.itertuples(index=False, name=None))
+
+    def _select(self, table: str, columns: List[str],
+                student_id: Optional[str] = None,
+                session_id: Optional[str] = None) -> pd.DataFrame:
+        clauses, params = [], []
+        if student_id is not None:
+            clauses.append('student_id = ?')
+            params.append(student_id)
+        if session_id is not None:
+            clauses.append('session_id = ?')
+            params.append(session_id)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(columns)} FROM {table}{where} ORDER BY rowid",
+            self._connect(), params=params)
+        for column in self.BOOL_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype(bool)
+        return df
+
+    def append(self, rows: pd.DataFrame):
+        """Insert per-question log rows in a single transaction"""
+        self._insert('logs', LOG_COLUMNS, rows)
+
+    def append_sessions(self, sessions: pd.DataFrame):
+        """Insert one summary row per completed session"""
+        self._insert('sessions', SESSION_COLUMNS, sessions)
+
+    def read(self, student_id: Optional[str] = None,
+             session_id: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Read log rows using the student/session indexes"""
+        return self._select('logs', list(columns or LOG_COLUMNS),
+                            student_id, session_id)
+
+    def read_sessions(self, student_id: Optional[str] = None,
+                      session_id: Optional[str] = None) -> pd.DataFrame:
+        """Read session summaries using the student/session indexes"""
+        return self._select('sessions', SESSION_COLUMNS, student_id, session_id)
+
+    def read_sessions_since(self, cursor: Optional[Dict[str, Any]] = None
+                            ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Session summaries inserted after cursor, and the next cursor
+
+        The cursor is the last rowid read. SQLite commits one writer at a
+        time, so rowids become visible in order. clear() bumps the
+        database's user_version, which makes older cursors read from the
+        start.
+        """
+        conn = self._connect()
+        # One read transaction, so the generation matches the rows read
+        with conn:
+            conn.execute('BEGIN')
+            generation = conn.execute('PRAGMA user_version').fetchone()[0]
+            last = 0
+            if cursor is not None and cursor.get('store') == 'sqlite' \
+                    and cursor.get('generation') == generation:
+                last = cursor.get('rowid', 0)
+            df = pd.read_sql_query(
+                f"SELECT rowid AS _rowid, {', '.join(SESSION_COLUMNS)} FROM sessions "
+                f"WHERE rowid > ? ORDER BY rowid", conn, params=[last])
+        if not df.empty:
+            last = int(df['_rowid'].iloc[-1])
+        return (df.drop(columns='_rowid'),
+                {'store': 'sqlite', 'generation': generation, 'rowid': last})
+
+    def clear(self):
+        """Delete all rows and summaries"""
+        conn = self._connect()
+        with conn:
+            generation = conn.execute('PRAGMA user_version').fetchone()[0]
+            conn.execute('DELETE FROM logs')
+            conn.execute('DELETE FROM sessions')
+            conn.execute(f"PRAGMA user_version = {generation + 1}")
+
+    def import_csv(self, csv_path: str, chunksize: int = 100000) -> int:
+        """Load rows from a logs.csv file into the database"""
+        return import_csv_into(self, csv_path, chunksize)
+
+    def export_csv(self, csv_path: str) -> int:
+        """Write the logs table out in the logs.csv format"""
+        return write_export(self.iter_chunks(), csv_path)
+
+    def iter_chunks(self, chunksize: int = 50000, start=None, end=None,
+                    student_ids: Optional[Iterable[str]] = None
+                    ) -> Iterator[pd.DataFrame]:
+        """Stream log rows with a cursor, filtering inside SQLite"""
+        start, end = _as_iso(start), _as_iso(end)
+        student_ids = set(student_ids) if student_ids is not None else None
+
+        clauses, params = [], []
+        if start is not None:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end is not None:
+            clauses.append('timestamp < ?')
+            params.append(end)
+        # Very large id sets exceed SQLite's parameter limit; filter those in pandas
+        filter_ids = student_ids is not None and len(student_ids) > 900
+        if student_ids is not None and not filter_ids:
+            clauses.append(
+                f"student_id IN ({', '.join('?' for _ in student_ids)})")
+            params.extend(sorted(student_ids))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        query = f"SELECT {', '.join(LOG_COLUMNS)} FROM logs{where} ORDER BY rowid"
+        for chunk in pd.read_sql_query(query, self._connect(), params=params,
+                                       chunksize=chunksize):
+            for column in self.BOOL_COLUMNS:
+                chunk[column] = chunk[column].astype(bool)
+            if filter_ids:
+                chunk = filter_rows(chunk, student_ids=student_ids)
+            if not chunk.empty:
+                yield chunk
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class BackgroundLogWriter:
+    """Writes log batches to a store from a background thread
+
+    Attempts are queued and committed together. A batch is flushed when it
+    reaches max_batch attempts or when flush_interval seconds have passed
+    since its first attempt, so one append (and one fsync) covers many
+    sessions. Every submission gets a Future that resolves to True once its
+    rows are in the store, or False if the write failed.
+
+    A batch is written as two appends, rows then session summaries, which
+    the stores do not commit together. If the second fails the rows stay
+    in the store without their summaries; the futures still resolve to
+    False, and summarize_sessions() can rebuild the missing summaries from
+    the rows.
+    """
+
+    _STOP = object()
+
+    def __init__(self, store, max_batch: int = 64, flush_interval: float = 0.5,
+                 max_queue: int = 1024, enqueue_timeout: float = 1.0):
+        self.store = store
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run,
+                                        name='quiz-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, rows: pd.DataFrame, sessions: pd.DataFrame) -> Future:
+        """Queue one attempt; the Future resolves to the write's success"""
+        future = Future()
+        if self._closed:
+            print("Error logging quiz attempt: log writer is closed")
+            future.set_result(False)
+            return future
+
+        try:
+            self._queue.put((rows, sessions, future),
+                            timeout=self.enqueue_timeout)
+        except queue.Full:
+            print("Error logging quiz attempt: log write queue is full")
+            future.set_result(False)
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been written
+
+        Returns False if the queue or the writes did not drain within
+        timeout seconds, or if a write failed.
+        """
+        marker = Future()
+        if self._closed:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put((None, None, marker), timeout=timeout)
+        except queue.Full:
+            return False
+        try:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            return marker.result(timeout=remaining)
+        except Exception:
+            return False
+
+    def close(self, timeout: Optional[float] = None):
+        """Drain the queue and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+
+            # Keep collecting until the batch is full or its deadline passes
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or batch[-1][0] is None:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit(batch)
+
+        # Anything that raced with close() is still written, never dropped
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not self._STOP:
+                leftovers.append(item)
+        if leftovers:
+            self._commit(leftovers)
+
+    def _commit(self, batch: List[tuple]):
+        attempts = [(rows, sessions, future)
+                    for rows, sessions, future in batch if rows is not None]
+        ok = True
+        if attempts:
+            try:
+                self.store.append(pd.concat([a[0] for a in attempts],
+                                            ignore_index=True))
+            except Exception as e:
+                print(f"Error logging quiz attempt: {e}")
+                ok = False
+        if attempts and ok:
+            try:
+                self.store.append_sessions(pd.concat(
+                    [a[1] for a in attempts], ignore_index=True))
+            except Exception as e:
+                # The rows are already appended and cannot be taken back
+                print(f"Error logging quiz attempt: rows were written "
+                      f"but their session summaries were not: {e}")
+                ok = False
+
+        for _, _, future in batch:
+            future.set_result(ok)
+
+
+def _as_iso(value) -> Optional[str]:
+    """Normalize a date/datetime/string bound to an ISO timestamp string"""
+    if value is None:
+        return None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def filter_rows(rows: pd.DataFrame, start: Optional[str] = None,
+                end: Optional[str] = None,
+                student_ids: Optional[set] = None) -> pd.DataFrame:
+    """Keep rows with start <= timestamp < end and a student in student_ids"""
+    mask = pd.Series(True, index=rows.index)
+    if start is not None:
+        mask &= rows['timestamp'].astype(str) >= start
+    if end is not None:
+        mask &= rows['timestamp'].astype(str) < end
+    if student_ids is not None:
+        mask &= rows['student_id'].isin(student_ids)
+    return rows[mask]
+
+
+def write_export(chunks: Iterable[pd.DataFrame], path: str,
+                 file_format: str = 'csv', compression: Optional[str] = None,
+                 columns: Optional[List[str]] = None) -> int:
+    """Write chunks to path one at a time, returning the number of rows
+
+    CSV output may be compressed with 'gzip' or 'zstd'; Parquet output takes
+    the codec name directly and writes each chunk as a row group.
+    """
+    columns = columns or LOG_COLUMNS
+    total = 0
+
+    if file_format == 'parquet':
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for Parquet export")
+        writer = None
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema,
+                                              compression=compression or 'snappy')
+                writer.write_table(table.cast(writer.schema))
+                total += len(chunk)
+            if writer is None:
+                pq.write_table(pa.Table.from_pandas(
+                    pd.DataFrame(columns=columns), preserve_index=False), path)
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+
+    if file_format != 'csv':
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    if compression is None:
+        f = open(path, 'w', newline='')
+    elif compression == 'gzip':
+        f = gzip.open(path, 'wt', newline='')
+    elif compression == 'zstd':
+        if not ZSTD_AVAILABLE:
+            raise ImportError("zstandard is required for zstd export")
+        f = zstandard.open(path, 'wt', newline='')
+    else:
+        raise ValueError(f"Unknown compression: {compression}")
+
+    with f:
+        header = True
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=header)
+            header = False
+            total += len(chunk)
+        if header:
+            pd.DataFrame(columns=columns).to_csv(f, index=False)
+    return total
+
+
+def summarize_sessions(rows: pd.DataFrame) -> pd.DataFrame:
+    """Build one summary row per session from per-question log rows"""
+    if rows.empty:
+        return pd.DataFrame(columns=SESSION_COLUMNS)
+
+    grouped = rows.groupby('session_id', sort=False)
+    sessions = grouped.agg(
+        student_id=('student_id', 'first'),
+        timestamp=('timestamp', 'first'),
+        total_questions=('question_id', 'size'),
+        correct_answers=('correct', 'sum'),
+        questions_skipped=('skipped', 'sum'),
+        accuracy=('accuracy', 'first'),
+        engagement=('engagement', 'first'),
+        avg_response_time=('avg_response_time', 'first')
+    ).reset_index()
+    return sessions[SESSION_COLUMNS]
+
+
+def import_csv_into(store, csv_path: str, chunksize: int = 100000) -> int:
+    """Append rows from a logs.csv file to a store, with their summaries"""
+    total = 0
+    pending = pd.DataFrame(columns=LOG_COLUMNS)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        store.append(chunk)
+        total += len(chunk)
+
+        # A session may straddle chunks: hold back the last one until complete
+        chunk = pd.concat([pending, chunk], ignore_index=True) \
+            if not pending.empty else chunk
+        last_session = chunk['session_id'].iloc[-1]
+        done = chunk['session_id'] != last_session
+        store.append_sessions(summarize_sessions(chunk[done]))
+        pending = chunk[~done]
+
+    if not pending.empty:
+        store.append_sessions(summarize_sessions(pending))
+    return total
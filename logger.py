@@ -1,130 +1,229 @@
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from concurrent.futures import Future
 import json
 
+from log_store import (LOG_COLUMNS, SESSION_COLUMNS, CSVLogStore,
+                       ParquetLogStore, SQLiteLogStore, BackgroundLogWriter,
+                       write_export)
+
 
 class QuizLogger:
     """Handles logging of quiz attempts and performance data"""
 
-    def __init__(self, log_file: str = 'data/logs.csv'):
+    def __init__(self, log_file: str = 'data/logs.csv', fsync: bool = False,
+                 backend: str = 'csv', cache: bool = True,
+                 async_writes: bool = False, batch_size: int = 64,
+                 flush_interval: float = 0.5, max_queue: int = 1024,
+                 rotate_bytes: Optional[int] = None,
+                 rotate_interval: Optional[float] = None,
+                 compact_after_days: Optional[float] = None,
+                 retention_days: Optional[float] = None):
         self.log_file = log_file
+        self.backend = backend
         self.in_memory_logs = []
-        self._ensure_log_file_exists()
-
-    def _ensure_log_file_exists(self):
-        """Ensure the log file and directory exist"""
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
 
-        if not os.path.exists(self.log_file):
-            # Create empty log file with headers
-            empty_df = pd.DataFrame(columns=[
-                'student_id', 'timestamp', 'question_id', 'answer', 'correct',
-                'skipped', 'response_time', 'accuracy', 'engagement',
-                'avg_response_time', 'session_id'
-            ])
-            empty_df.to_csv(self.log_file, index=False)
+        if backend == 'csv':
+            # Rotation, compaction and retention apply to the CSV log only
+            self.store = CSVLogStore(log_file, fsync=fsync, cache=cache,
+                                     rotate_bytes=rotate_bytes,
+                                     rotate_interval=rotate_interval,
+                                     compact_after_days=compact_after_days,
+                                     retention_days=retention_days)
+        elif backend == 'parquet':
+            # Partitioned dataset directory next to the CSV, e.g. data/logs.parquet
+            self.store = ParquetLogStore(
+                os.path.splitext(log_file)[0] + '.parquet', fsync=fsync)
+        elif backend == 'sqlite':
+            # Indexed database next to the CSV, e.g. data/logs.db
+            self.store = SQLiteLogStore(
+                os.path.splitext(log_file)[0] + '.db', fsync=fsync)
+        else:
+            raise ValueError(f"Unknown log backend: {backend}")
+
+        # Optional group commit: attempts are written by a background thread
+        self.writer = None
+        if async_writes:
+            self.writer = BackgroundLogWriter(self.store,
+                                              max_batch=batch_size,
+                                              flush_interval=flush_interval,
+                                              max_queue=max_queue)
 
     def log_attempt(self, student_id: str, questions: pd.DataFrame,
                     answers: Dict[str, Dict]) -> bool:
-        """Log a complete quiz attempt"""
+        """Log a complete quiz attempt
+
+        With async_writes the attempt is queued and True means it was
+        accepted; use submit_attempt() to wait for it to reach disk.
+        """
+        future = self.submit_attempt(student_id, questions, answers)
+        if self.writer is None or future.done():
+            return future.result()
+        return True
+
+    def submit_attempt(self, student_id: str, questions: pd.DataFrame,
+                       answers: Dict[str, Dict]) -> Future:
+        """Log a quiz attempt, returning a Future that resolves to success"""
         try:
-            session_id = f"{student_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            timestamp = datetime.now().isoformat()
-
-            # Calculate session metrics
-            total_questions = len(answers)
-            correct_answers = sum(1 for answer in answers.values()
-                                  if answer.get('correct', False))
-            skipped_questions = sum(1 for answer in answers.values()
-                                    if answer.get('skipped', False))
-            response_times = [
-                answer.get('response_time', 0) for answer in answers.values()
-            ]
-
-            accuracy = correct_answers / total_questions if total_questions > 0 else 0
-            engagement = 1 - (skipped_questions /
-                              total_questions) if total_questions > 0 else 0
-            avg_response_time = sum(response_times) / len(
-                response_times) if response_times else 0
-
-            # Create log entries for each question
-            log_entries = []
-
-            for question_id, answer_data in answers.items():
-                log_entry = {
-                    'student_id': student_id,
-                    'timestamp': timestamp,
-                    'question_id': question_id,
-                    'answer': answer_data.get('answer', ''),
-                    'correct': answer_data.get('correct', False),
-                    'skipped': answer_data.get('skipped', False),
-                    'response_time': answer_data.get('response_time', 0),
-                    'accuracy': accuracy,
-                    'engagement': engagement,
-                    'avg_response_time': avg_response_time,
-                    'session_id': session_id
-                }
-                log_entries.append(log_entry)
-                self.in_memory_logs.append(log_entry)
+            rows, session = self._build_attempt(student_id, answers)
+            if self.writer is not None:
+                return self.writer.submit(rows, session)
 
-            # Append to CSV file
-            new_df = pd.DataFrame(log_entries)
+            # Append only this session's rows, then its materialized summary
+            self.store.append(rows)
+            self.store.append_sessions(session)
+            ok = True
 
-            # Read existing data and append
-            try:
-                existing_df = pd.read_csv(self.log_file)
-                combined_df = pd.concat([existing_df, new_df],
-                                        ignore_index=True)
-            except (pd.errors.EmptyDataError, FileNotFoundError):
-                combined_df = new_df
+        except Exception as e:
+            print(f"Error logging quiz attempt: {e}")
+            ok = False
 
-            # Save to file
-            combined_df.to_csv(self.log_file, index=False)
+        future = Future()
+        future.set_result(ok)
+        return future
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait for queued attempts to be written (no-op for sync writes)"""
+        if self.writer is None:
             return True
+        return self.writer.flush(timeout)
+
+    def close(self):
+        """Drain queued attempts and stop the background writer"""
+        if self.writer is not None:
+            self.writer.close()
+
+    def _build_attempt(self, student_id: str, answers: Dict[str, Dict]
+                       ) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """Build the per-question rows and session summary for an attempt"""
+        session_id = f"{student_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        timestamp = datetime.now().isoformat()
+
+        # Calculate session metrics
+        total_questions = len(answers)
+        correct_answers = sum(1 for answer in answers.values()
+                              if answer.get('correct', False))
+        skipped_questions = sum(1 for answer in answers.values()
+                                if answer.get('skipped', False))
+        response_times = [
+            answer.get('response_time', 0) for answer in answers.values()
+        ]
 
-        except Exception as e:
-            print(f"Error logging quiz attempt: {e}")
-            return False
+        accuracy = correct_answers / total_questions if total_questions > 0 else 0
+        engagement = 1 - (skipped_questions /
+                          total_questions) if total_questions > 0 else 0
+        avg_response_time = sum(response_times) / len(
+            response_times) if response_times else 0
+
+        # Create log entries for each question
+        log_entries = []
+
+        for question_id, answer_data in answers.items():
+            log_entry = {
+                'student_id': student_id,
+                'timestamp': timestamp,
+                'question_id': question_id,
+                'answer': answer_data.get('answer', ''),
+                'correct': answer_data.get('correct', False),
+                'skipped': answer_data.get('skipped', False),
+                'response_time': answer_data.get('response_time', 0),
+                'accuracy': accuracy,
+                'engagement': engagement,
+                'avg_response_time': avg_response_time,
+                'session_id': session_id
+            }
+            log_entries.append(log_entry)
+            self.in_memory_logs.append(log_entry)
+
+        session = pd.DataFrame([{
+            'session_id': session_id,
+            'student_id': student_id,
+            'timestamp': timestamp,
+            'total_questions': total_questions,
+            'correct_answers': correct_answers,
+            'questions_skipped': skipped_questions,
+            'accuracy': accuracy,
+            'engagement': engagement,
+            'avg_response_time': avg_response_time
+        }], columns=SESSION_COLUMNS)
+
+        return pd.DataFrame(log_entries, columns=LOG_COLUMNS), session
 
     def get_student_logs(self, student_id: str) -> pd.DataFrame:
         """Get all logs for a specific student"""
-        try:
-            df = pd.read_csv(self.log_file)
-            return df[df['student_id'] == student_id]
-        except (FileNotFoundError, pd.errors.EmptyDataError):
-            return pd.DataFrame()
+        return self.store.read(student_id=student_id)
+
+    def get_all_logs(self, start=None, end=None) -> pd.DataFrame:
+        """Get all logged data, optionally limited to start <= timestamp < end"""
+        if start is None and end is None:
+            return self.store.read()
 
-    def get_all_logs(self) -> pd.DataFrame:
-        """Get all logged data"""
+        chunks = list(self.store.iter_chunks(start=start, end=end))
+        if not chunks:
+            return pd.DataFrame(columns=LOG_COLUMNS)
+        return pd.concat(chunks, ignore_index=True)
+
+    def rotate_logs(self) -> bool:
+        """Start a new active log segment now (CSV backend only)"""
+        if not hasattr(self.store, 'rotate'):
+            return False
         try:
-            return pd.read_csv(self.log_file)
-        except (FileNotFoundError, pd.errors.EmptyDataError):
-            return pd.DataFrame()
+            self.store.rotate()
+            self.store.maintain()
+            return True
+        except Exception as e:
+            print(f"Error rotating logs: {e}")
+            return False
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the shared log cache, if one is in use"""
+        cache = getattr(self.store, 'cache', None)
+        return cache.stats() if cache is not None else {}
+
+    def get_student_sessions(self, student_id: str) -> pd.DataFrame:
+        """Get the materialized session summaries of a student"""
+        sessions = self.store.read_sessions(student_id=student_id)
+        if sessions.empty:
+            return sessions
+        return sessions.sort_values('session_id', kind='stable')
+
+    def get_all_sessions(self) -> pd.DataFrame:
+        """Get the materialized summaries of every session"""
+        return self.store.read_sessions()
+
+    def get_sessions_since(self, cursor: Optional[Dict[str, Any]] = None
+                           ) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Get the sessions logged after cursor, and the cursor to pass next time
+
+        Cursors are JSON-serializable positions in the backend's session
+        log, so sessions are returned in the order they were written even
+        if their timestamps are older. None returns every session.
+        """
+        return self.store.read_sessions_since(cursor)
 
     def get_session_summary(self, session_id: str) -> Dict[str, Any]:
         """Get summary for a specific session"""
         try:
-            df = pd.read_csv(self.log_file)
-            session_data = df[df['session_id'] == session_id]
+            session_rows = self.store.read_sessions(session_id=session_id)
 
-            if session_data.empty:
+            if session_rows.empty:
                 return {}
 
-            # Get the first row for session-level metrics
-            first_row = session_data.iloc[0]
+            # Session-level metrics were computed when the attempt was logged
+            first_row = session_rows.iloc[0]
 
             return {
                 'student_id': first_row['student_id'],
                 'timestamp': first_row['timestamp'],
-                'total_questions': len(session_data),
-                'correct_answers': session_data['correct'].sum(),
+                'total_questions': session_rows['total_questions'].sum(),
+                'correct_answers': session_rows['correct_answers'].sum(),
                 'accuracy': first_row['accuracy'],
                 'engagement': first_row['engagement'],
                 'avg_response_time': first_row['avg_response_time'],
-                'questions_skipped': session_data['skipped'].sum()
+                'questions_skipped': session_rows['questions_skipped'].sum()
             }
 
         except Exception as e:
@@ -135,9 +234,9 @@ class QuizLogger:
                                         student_id: str) -> Dict[str, Any]:
         """Get performance summary for a student across all sessions"""
         try:
-            student_logs = self.get_student_logs(student_id)
+            sessions_df = self.get_student_sessions(student_id)
 
-            if student_logs.empty:
+            if sessions_df.empty:
                 return {
                     'total_sessions': 0,
                     'total_questions': 0,
@@ -147,30 +246,14 @@ class QuizLogger:
                     'improvement_trend': 'No data'
                 }
 
-            # Group by session to get session-level metrics
-            session_groups = student_logs.groupby('session_id')
-            session_summaries = []
-
-            for session_id, session_data in session_groups:
-                first_row = session_data.iloc[0]
-                session_summaries.append({
-                    'session_id':
-                    session_id,
-                    'timestamp':
-                    first_row['timestamp'],
-                    'accuracy':
-                    first_row['accuracy'],
-                    'engagement':
-                    first_row['engagement'],
-                    'avg_response_time':
-                    first_row['avg_response_time']
-                })
-
-            sessions_df = pd.DataFrame(session_summaries)
+            session_summaries = sessions_df[[
+                'session_id', 'timestamp', 'accuracy', 'engagement',
+                'avg_response_time'
+            ]].to_dict('records')
 
             # Calculate overall metrics
             total_sessions = len(sessions_df)
-            total_questions = len(student_logs)
+            total_questions = int(sessions_df['total_questions'].sum())
             overall_accuracy = sessions_df['accuracy'].mean()
             average_engagement = sessions_df['engagement'].mean()
             average_response_time = sessions_df['avg_response_time'].mean()
@@ -205,33 +288,122 @@ class QuizLogger:
             print(f"Error calculating student performance summary: {e}")
             return {}
 
-    def export_logs(self, filename: str = None) -> str:
-        """Export logs to a CSV file"""
+    def get_performance_summaries(
+            self, student_ids: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Get the performance summary of every student in one pass
+
+        Returns one row per student with the same metrics as
+        get_student_performance_summary (without the per-session list),
+        computed with group-by operations over the session summaries.
+        """
+        columns = ['student_id', 'total_sessions', 'total_questions',
+                   'overall_accuracy', 'average_engagement',
+                   'average_response_time', 'improvement_trend']
+        try:
+            sessions = self.store.read_sessions()
+            if student_ids is not None and not sessions.empty:
+                sessions = sessions[sessions['student_id'].isin(set(student_ids))]
+            if sessions.empty:
+                return pd.DataFrame(columns=columns)
+
+            sessions = sessions.sort_values(['student_id', 'session_id'],
+                                            kind='stable')
+            groups = sessions.groupby('student_id', sort=False)
+            summary = groups.agg(
+                total_sessions=('session_id', 'size'),
+                total_questions=('total_questions', 'sum'),
+                overall_accuracy=('accuracy', 'mean'),
+                average_engagement=('engagement', 'mean'),
+                average_response_time=('avg_response_time', 'mean'))
+
+            # Compare the first and last half of each student's sessions
+            position = groups.cumcount().to_numpy()
+            count = groups['session_id'].transform('size').to_numpy()
+            half = count // 2
+            accuracy = sessions['accuracy'].astype(float)
+            first_half = accuracy.where(position < half).groupby(
+                sessions['student_id'], sort=False).mean()
+            second_half = accuracy.where(position >= count - half).groupby(
+                sessions['student_id'], sort=False).mean()
+
+            sessions_per_student = summary['total_sessions'].to_numpy()
+            summary['improvement_trend'] = pd.Categorical(
+                np.select(
+                    [sessions_per_student < 2,
+                     second_half > first_half + 0.05,
+                     second_half < first_half - 0.05],
+                    ['Insufficient data', 'Improving', 'Declining'],
+                    default='Stable'),
+                categories=['Improving', 'Stable', 'Declining',
+                            'Insufficient data'])
+
+            summary = summary.reset_index()
+            summary['total_sessions'] = summary['total_sessions'].astype('int32')
+            summary['total_questions'] = summary['total_questions'].astype('int32')
+            summary['overall_accuracy'] = summary['overall_accuracy'].round(3)
+            summary['average_engagement'] = summary['average_engagement'].round(3)
+            summary['average_response_time'] = \
+                summary['average_response_time'].round(2)
+            return summary[columns].sort_values('student_id', ignore_index=True)
+
+        except Exception as e:
+            print(f"Error calculating performance summaries: {e}")
+            return pd.DataFrame(columns=columns)
+
+    def export_logs(self, filename: str = None, file_format: str = 'csv',
+                    compression: Optional[str] = None, start=None, end=None,
+                    student_ids: Optional[Iterable[str]] = None,
+                    student_names: Optional[Dict[str, str]] = None,
+                    chunksize: int = 50000) -> str:
+        """Export logs to a CSV or Parquet file
+
+        Rows are streamed from the store in chunks of at most chunksize, so
+        memory use does not grow with the size of the log. start/end bound
+        the timestamp (start inclusive, end exclusive) and student_ids
+        restricts the export to those students; both are applied while
+        streaming. student_names adds a 'name' column. A bare filename is
+        written under data/; an absolute path is used as given.
+        """
         if filename is None:
-            filename = f"quiz_logs_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            extension = '.parquet' if file_format == 'parquet' else '.csv'
+            if file_format == 'csv' and compression == 'gzip':
+                extension += '.gz'
+            elif file_format == 'csv' and compression == 'zstd':
+                extension += '.zst'
+            filename = f"quiz_logs_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}"
 
         try:
-            df = self.get_all_logs()
+            chunks = self.store.iter_chunks(chunksize, start=start, end=end,
+                                            student_ids=student_ids)
+            columns = list(LOG_COLUMNS)
+            if student_names is not None:
+                chunks = (chunk.assign(name=chunk['student_id'].map(student_names))
+                          for chunk in chunks)
+                columns.append('name')
+
             export_path = os.path.join('data', filename)
-            df.to_csv(export_path, index=False)
+            write_export(chunks, export_path, file_format=file_format,
+                         compression=compression, columns=columns)
             return export_path
         except Exception as e:
             print(f"Error exporting logs: {e}")
             return ""
 
+    def import_logs(self, csv_path: str) -> int:
+        """Import rows from a logs.csv file into the active backend"""
+        try:
+            return self.store.import_csv(csv_path)
+        except Exception as e:
+            print(f"Error importing logs: {e}")
+            return 0
+
     def clear_logs(self, confirm: bool = False) -> bool:
         """Clear all logs (use with caution)"""
         if not confirm:
             return False
 
         try:
-            # Create empty DataFrame with headers
-            empty_df = pd.DataFrame(columns=[
-                'student_id', 'timestamp', 'question_id', 'answer', 'correct',
-                'skipped', 'response_time', 'accuracy', 'engagement',
-                'avg_response_time', 'session_id'
-            ])
-            empty_df.to_csv(self.log_file, index=False)
+            self.store.clear()
             self.in_memory_logs = []
             return True
         except Exception as e:
@@ -2,62 +2,161 @@ import pandas as pd
 import numpy as np
 import json
 import os
+import threading
+import time
+import importlib.util
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from sklearn.cluster import KMeans
-from sklearn.tree import DecisionTreeClassifier
-from sklearn.preprocessing import StandardScaler
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Iterable
 import warnings
 warnings.filterwarnings('ignore')
 
-try:
+from profile_store import ProfileStore
+from topic_mastery import TopicMastery
+from question_bank import QuestionBank
+from recommender_models import RecommenderModels
+from question_embeddings import QuestionEmbeddings
+from ann_index import IVFIndex
+from question_sampler import QuestionSampler
+
+# Only check for the package here: importing sentence_transformers pulls in
+# torch, so the import itself is deferred until the embedder is first used
+EMBEDDINGS_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+_embedder = None
+_embedder_loaded = False
+_embedder_lock = threading.Lock()
+
+
+def _load_embedder():
+    """Import sentence-transformers and load the embedding model"""
     from sentence_transformers import SentenceTransformer
-    EMBEDDINGS_AVAILABLE = True
-except ImportError:
-    EMBEDDINGS_AVAILABLE = False
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def get_embedder():
+    """Get the process-wide sentence embedder, loading it on first use
+
+    Returns None when sentence-transformers is not installed or the model
+    cannot be loaded, in which case callers fall back to keyword matching.
+    """
+    global _embedder, _embedder_loaded
+    if _embedder_loaded:
+        return _embedder
+
+    with _embedder_lock:
+        if not _embedder_loaded:
+            if EMBEDDINGS_AVAILABLE:
+                try:
+                    _embedder = _load_embedder()
+                except Exception:
+                    print("Warning: Could not load sentence transformer, falling back to keyword matching")
+            _embedder_loaded = True
+    return _embedder
+
+
+def warm_up_embedder(background: bool = False):
+    """Load the shared embedder ahead of its first use
+
+    With background=True the model loads in a daemon thread, which is
+    returned, so startup is not delayed.
+    """
+    if background:
+        thread = threading.Thread(target=get_embedder, name='embedder-warmup',
+                                  daemon=True)
+        thread.start()
+        return thread
+    return get_embedder()
+
 
 class LearnerProfile:
     """Manages learner profiles and tracks performance metrics"""
     
-    def __init__(self):
-        self.profiles_file = 'data/learner_profiles.json'
+    def __init__(self, profiles_file: str = 'data/learner_profiles.json',
+                 write_behind: bool = False, mastery_save_every: int = 50,
+                 mastery_save_interval: float = 30.0,
+                 cache_size: Optional[int] = None, cache_ttl: Optional[float] = None):
+        self.profiles_file = profiles_file
+        self.write_behind = write_behind
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # Profiles live in a key-value store next to the JSON file, e.g.
+        # data/learner_profiles.db; records are loaded per student on access
+        self.db_file = os.path.splitext(profiles_file)[0] + '.db'
         self.profiles = self._load_profiles()
-        
-        # Initialize sentence transformer if available
-        if EMBEDDINGS_AVAILABLE:
-            try:
-                self.embedder = SentenceTransformer('all-MiniLM-L6-v2')
-            except Exception:
-                self.embedder = None
-                print("Warning: Could not load sentence transformer, falling back to keyword matching")
-        else:
-            self.embedder = None
+
+        # Per-topic mastery matrix, loaded on first use; updates are merged
+        # into the file every mastery_save_every quizzes or
+        # mastery_save_interval seconds, whichever comes first
+        self.mastery_file = os.path.splitext(profiles_file)[0] + '_mastery.npz'
+        self.mastery_save_every = mastery_save_every
+        self.mastery_save_interval = mastery_save_interval
+        self._mastery = None
+        self._unsaved_mastery_updates = 0
+        self._last_mastery_save = time.monotonic()
+        # Guards the lazy load and the save counters across request threads
+        self._mastery_lock = threading.RLock()
+    
+    @property
+    def mastery(self) -> TopicMastery:
+        """Per-student, per-topic mastery matrix"""
+        with self._mastery_lock:
+            if self._mastery is None:
+                self._mastery = TopicMastery.load(self.mastery_file)
+            return self._mastery
+    
+    def save_mastery(self):
+        """Merge unsaved topic mastery updates into the file on disk"""
+        with self._mastery_lock:
+            if self._mastery is not None and self._mastery.unsaved:
+                self._mastery.save()
+            self._unsaved_mastery_updates = 0
+            self._last_mastery_save = time.monotonic()
+    
+    @property
+    def embedder(self):
+        """Shared sentence embedder, loaded on first access (None if unavailable)"""
+        return get_embedder()
     
-    def _load_profiles(self) -> Dict:
-        """Load existing profiles from JSON file"""
+    def _load_profiles(self) -> ProfileStore:
+        """Open the profile store, importing the JSON profiles file if it changed"""
+        store = ProfileStore(self.db_file, write_behind=self.write_behind,
+                             cache_size=self.cache_size, cache_ttl=self.cache_ttl)
         if os.path.exists(self.profiles_file):
             try:
-                with open(self.profiles_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                return {}
-        return {}
+                store.import_json(self.profiles_file)
+            except (json.JSONDecodeError, IOError) as e:
+                # Stored profiles are kept; only the seed file is skipped
+                print(f"Warning: could not import {self.profiles_file}: {e}")
+        return store
     
-    def _save_profiles(self):
-        """Save profiles to JSON file"""
-        os.makedirs(os.path.dirname(self.profiles_file), exist_ok=True)
-        with open(self.profiles_file, 'w') as f:
-            json.dump(self.profiles, f, indent=2)
+    def cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the in-memory profile cache"""
+        return self.profiles.cache_stats()
     
     def get_profile(self, student_id: str) -> Optional[Dict[str, float]]:
         """Get profile for a specific student"""
         return self.profiles.get(student_id)
     
-    def update_profile(self, student_id: str, quiz_answers: Dict[str, Dict]) -> Dict[str, float]:
-        """Update learner profile based on quiz answers"""
+    def update_profile(self, student_id: str, quiz_answers: Dict[str, Dict],
+                       questions_df: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+        """Update learner profile based on quiz answers
+
+        When questions_df is given, the answers also update the student's
+        per-topic mastery.
+        """
         if not quiz_answers:
             return self.get_profile(student_id) or {'accuracy': 0.0, 'pace': 0.0, 'engagement': 0.0}
         
+        if questions_df is not None and not questions_df.empty:
+            self.mastery.update_from_answers(student_id, quiz_answers, questions_df)
+            with self._mastery_lock:
+                self._unsaved_mastery_updates += 1
+                if (self._unsaved_mastery_updates >= self.mastery_save_every or
+                        time.monotonic() - self._last_mastery_save >= self.mastery_save_interval):
+                    self.save_mastery()
+        
         # Calculate current session metrics
         total_questions = len(quiz_answers)
         correct_answers = sum(1 for answer in quiz_answers.values() if answer.get('correct', False))
@@ -99,8 +198,8 @@ class LearnerProfile:
             'last_updated': datetime.now().isoformat()
         }
         
+        # Writes only this student's record
         self.profiles[student_id] = updated_profile
-        self._save_profiles()
         
         return {
             'accuracy': updated_profile['accuracy'],
@@ -108,10 +207,155 @@ class LearnerProfile:
             'engagement': updated_profile['engagement']
         }
     
+    def update_profiles_bulk(self, sessions_df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+        """Update the profiles of many students from a batch of quiz sessions
+
+        sessions_df holds either per-question log rows (student_id, session_id,
+        correct, skipped, response_time) or one summary row per session
+        (accuracy, engagement, avg_response_time). Each student's sessions are
+        applied in order with the same weighted blend as update_profile, and
+        all updated profiles are saved in a single write.
+        """
+        updated = self._blend_sessions(sessions_df)
+
+        # Single persistence step for every affected student
+        self.profiles.put_many(updated)
+        return {
+            student_id: {metric: profile[metric]
+                         for metric in ['accuracy', 'pace', 'engagement']}
+            for student_id, profile in updated.items()
+        }
+
+    def _blend_sessions(self, sessions_df: pd.DataFrame,
+                        existing: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+        """Blend a batch of sessions into profiles, without saving them
+
+        existing maps student ids to the profiles to start from; by default
+        the stored profiles are used.
+        """
+        if sessions_df.empty:
+            return {}
+
+        # Current session metrics, one row per session
+        order = 'timestamp' if 'timestamp' in sessions_df.columns else 'session_id'
+        if 'correct' in sessions_df.columns:
+            sessions = sessions_df.groupby(['student_id', 'session_id'], sort=False).agg(
+                order_key=(order, 'min'),
+                accuracy=('correct', 'mean'),
+                pace=('response_time', 'mean'),
+                skipped=('skipped', 'mean')
+            ).reset_index()
+            sessions['engagement'] = 1 - sessions['skipped']
+        else:
+            sessions = sessions_df.rename(columns={'avg_response_time': 'pace'})
+            sessions = sessions.assign(order_key=sessions_df[order])
+        sessions = sessions.sort_values(['student_id', 'order_key', 'session_id'], kind='stable')
+
+        student_ids = sessions['student_id'].astype(str).to_numpy()
+        students, first_index, counts = np.unique(student_ids, return_index=True, return_counts=True)
+        group = np.repeat(np.arange(len(students)), counts)
+        position = np.arange(len(sessions)) - first_index[group]
+        remaining = counts[group] - 1 - position  # sessions applied after this one
+
+        if existing is None:
+            existing = self.profiles.get_many(students.tolist())
+        prior_count = np.array([existing.get(sid, {}).get('quiz_count', 0) for sid in students])
+
+        # Unrolling p = p * (1 - w) + x * w over n sessions, with w = 0.7 except
+        # for a student's very first session (w = 1), gives closed-form weights
+        keep = 0.3
+        weights = 0.7 * keep ** remaining
+        first_ever = (position == 0) & (prior_count[group] == 0)
+        weights[first_ever] = keep ** remaining[first_ever]
+        prior_weight = np.where(prior_count > 0, keep ** counts.astype(float), 0.0)
+
+        now = datetime.now().isoformat()
+        blended = {}
+        for metric in ['accuracy', 'pace', 'engagement']:
+            values = sessions[metric].astype(float).to_numpy()
+            prior = np.array([existing.get(sid, {}).get(metric, 0) or 0 for sid in students], dtype=float)
+            blended[metric] = prior * prior_weight + np.bincount(group, weights=values * weights,
+                                                                 minlength=len(students))
+
+        return {
+            student_id: {
+                'accuracy': round(float(blended['accuracy'][i]), 3),
+                'pace': round(float(blended['pace'][i]), 2),
+                'engagement': round(float(blended['engagement'][i]), 3),
+                'quiz_count': int(prior_count[i] + counts[i]),
+                'last_updated': now
+            }
+            for i, student_id in enumerate(students.tolist())
+        }
+
+    def rebuild_from_logs(self, logger, full: bool = False,
+                          questions_df: Optional[pd.DataFrame] = None) -> int:
+        """Replay QuizLogger session history into the learner profiles
+
+        The first run (or full=True) rebuilds the profile of every student
+        in the log from the log alone; students without logged sessions keep
+        their profiles. Later runs only read sessions logged after the
+        stored cursor, and skip sessions a profile already reflects (older
+        than its last_updated), so live update_profile calls are not counted
+        twice. With questions_df the replayed answers also update the topic
+        mastery. Returns the number of sessions applied.
+        """
+        cursor = None if full else self.profiles.get_meta('replay_cursor')
+        if cursor is not None:
+            cursor = json.loads(cursor)
+        sessions, new_cursor = logger.get_sessions_since(cursor)
+        meta = {'replay_cursor': json.dumps(new_cursor)}
+        if sessions.empty:
+            self.profiles.put_many({}, meta=meta)
+            return 0
+
+        sessions = sessions.astype({'timestamp': str, 'student_id': str})
+        if cursor is None:
+            existing = {}
+        else:
+            existing = self.profiles.get_many(sessions['student_id'].unique().tolist())
+            last_updated = sessions['student_id'].map(
+                {sid: profile.get('last_updated') or '' for sid, profile in existing.items()}
+            ).fillna('')
+            sessions = sessions[sessions['timestamp'] > last_updated]
+
+        updated = self._blend_sessions(sessions, existing)
+        # Stamp profiles with their newest replayed session rather than the
+        # time of the run, so sessions written late are not mistaken for
+        # ones the profile already reflects
+        newest = sessions.groupby('student_id')['timestamp'].max()
+        for student_id, profile in updated.items():
+            profile['last_updated'] = newest[student_id]
+
+        # Profiles and cursor are committed together, so an interrupted
+        # run is simply repeated
+        self.profiles.put_many(updated, meta=meta)
+
+        if questions_df is not None and not sessions.empty:
+            if cursor is None:
+                self.mastery.reset_students(updated)
+            logs = logger.get_all_logs(start=sessions['timestamp'].min())
+            logs = logs[logs['session_id'].isin(sessions['session_id'])]
+            self.mastery.update_from_logs(logs, questions_df)
+            self.save_mastery()
+        return len(sessions)
+
     def get_weak_topics(self, student_id: str) -> List[str]:
         """Identify topics where student needs improvement"""
-        # This is a simplified implementation
-        # In a real system, you would track performance by topic
+        if self.mastery.has_student(student_id):
+            return self.mastery.weak_topics([student_id])[student_id]
+        return self._default_weak_topics(student_id)
+    
+    def get_weak_topics_bulk(self, student_ids: List[str]) -> Dict[str, List[str]]:
+        """Identify weak topics for a whole class in one vectorized query"""
+        weak = self.mastery.weak_topics(student_ids)
+        for student_id in student_ids:
+            if not self.mastery.has_student(student_id):
+                weak[student_id] = self._default_weak_topics(student_id)
+        return weak
+    
+    def _default_weak_topics(self, student_id: str) -> List[str]:
+        """Guess weak topics from overall accuracy when none are tracked"""
         profile = self.get_profile(student_id)
         if not profile:
             return ['fractions', 'algebra']
@@ -123,23 +367,153 @@ class LearnerProfile:
         else:
             return ['advanced algebra', 'calculus']
 
+# Recommendation slots per accuracy band (< 0.6, 0.6-0.85, > 0.85):
+# (type, min_difficulty, max_difficulty, count, explanation template)
+RECOMMENDATION_BANDS = [
+    # Student needs remedial content - Scenario 1 from project doc
+    [
+        ('remedial', None, 2, 1,
+         "Based on your {accuracy:.1%} accuracy, the system has identified that you need additional support with foundational concepts. "
+         "This recommendation provides simplified content with visual aids and guided practice to help reinforce basic skills."),
+        ('practice', 1, 1, 2,
+         "This practice question reinforces basic concepts you've been working on. "
+         "Since your accuracy is {accuracy:.1%}, extra practice with fundamentals will help build confidence.")
+    ],
+    # Student needs practice and some challenge
+    [
+        ('practice', 2, 2, 2,
+         "This practice question reinforces your current skill level. "
+         "Balanced practice with questions at your level helps maintain and improve your {accuracy:.1%} accuracy."),
+        ('challenge', 3, None, 1,
+         "This challenge question is designed to stretch your abilities. "
+         "With {accuracy:.1%} accuracy, you're ready to tackle more complex problems.")
+    ],
+    # High-performing student needs challenging content - Scenario 2 from project doc
+    [
+        ('challenge', 3, None, 3,
+         "As an advanced learner with {accuracy:.1%} accuracy, this challenge question is designed to deepen your understanding. "
+         "It goes beyond basic concepts to encourage creative thinking and application.")
+    ]
+]
+ADDITIONAL_EXPLANATION = ("This additional question complements your learning path based on "
+                          "your {accuracy:.1%} accuracy and {engagement:.1%} engagement.")
+
+
+def accuracy_band(accuracy: float) -> int:
+    """Index into RECOMMENDATION_BANDS for one accuracy value"""
+    return 0 if accuracy < 0.6 else 1 if accuracy <= 0.85 else 2
+
+
+def accuracy_bands(accuracy) -> np.ndarray:
+    """Index into RECOMMENDATION_BANDS for each accuracy value"""
+    accuracy = np.asarray(accuracy, dtype=np.float64)
+    return np.select([accuracy < 0.6, accuracy <= 0.85], [0, 1], default=2)
+
+
+def engagement_bands(engagement) -> np.ndarray:
+    """0 for low engagement (< 0.7, as in the feedback tips), 1 otherwise"""
+    return (np.asarray(engagement, dtype=np.float64) >= 0.7).astype(np.int64)
+
+
 class ContentRecommender:
     """Provides content recommendations based on learner profile and ML algorithms"""
+
+    # Students sampled per block in get_recommendations_batch, bounding the
+    # (students, questions) exclusion mask and random keys
+    BATCH_BLOCK = 2048
     
-    def __init__(self):
-        self.scaler = StandardScaler()
-        self.clusterer = None
-        self.classifier = None
-        self._initialize_models()
+    def __init__(self, plan_cache_size: int = 256, model_dir: str = 'data/models',
+                 embeddings_file: str = 'data/question_embeddings.npy',
+                 ann_file: str = 'data/question_ann.npz', ann_min_questions: int = 50000):
+        self.rng = np.random.default_rng()
+        self._bank = None
+        self._bank_source = None
+        self._sampler: Optional[QuestionSampler] = None
+        # Recommendation plans keyed by (accuracy band, engagement band,
+        # bank version, num_recommendations), least recently used first
+        self.plan_cache_size = plan_cache_size
+        self._plans: OrderedDict = OrderedDict()
+        self.plan_hits = 0
+        self.plan_misses = 0
+        # Fitted ML models, trained offline by scripts/train_models.py and
+        # loaded once per bank version
+        self.model_dir = model_dir
+        self._models: Optional[RecommenderModels] = None
+        self._models_version = None
+        # Question vectors built offline by scripts/embed_questions.py;
+        # memory-mapped, so loading does not read the matrix
+        self.embeddings = QuestionEmbeddings.load(embeddings_file)
+        # Approximate index over the same vectors, used as the candidate
+        # generator once the bank is too large to scan exactly
+        self.ann: Optional[IVFIndex] = None
+        if len(self.embeddings) >= ann_min_questions:
+            self.ann = IVFIndex.load(ann_file, self.embeddings.vectors,
+                                     self.embeddings.fingerprint)
     
-    def _initialize_models(self):
-        """Initialize ML models for recommendations"""
-        try:
-            # Initialize with default parameters
-            self.clusterer = KMeans(n_clusters=3, random_state=42, n_init=10)
-            self.classifier = DecisionTreeClassifier(random_state=42, max_depth=5)
-        except Exception as e:
-            print(f"Warning: Could not initialize ML models: {e}")
+    def get_question_bank(self, questions_df: pd.DataFrame) -> QuestionBank:
+        """Get the index for a questions DataFrame, rebuilding it only for a new version"""
+        if questions_df is not self._bank_source:
+            version = QuestionBank.version_of(questions_df)
+            if self._bank is None or self._bank.version != version:
+                self._bank = QuestionBank(questions_df, version)
+                # Plans hold positions into the old bank
+                self._plans.clear()
+            self._bank_source = questions_df
+        return self._bank
+    
+    def get_sampler(self, questions_df: pd.DataFrame) -> QuestionSampler:
+        """Quiz question sampler for the current bank, keeping students' history across versions"""
+        bank = self.get_question_bank(questions_df)
+        if self._sampler is None or self._sampler.bank is not bank:
+            old = self._sampler
+            self._sampler = QuestionSampler(
+                bank, seen=old.seen if old is not None else None,
+                quiz_counts=old.quiz_counts if old is not None else None)
+        return self._sampler
+    
+    def get_plan(self, accuracy_band: int, engagement_band: int, bank: QuestionBank,
+                 num_recommendations: int) -> List[tuple]:
+        """Candidate pools and explanation templates for one kind of student
+
+        Returns (type, positions, count, template) slots with counts already
+        cut to num_recommendations, so a request only draws from the pools
+        and formats the templates.
+        """
+        key = (accuracy_band, engagement_band, bank.version, num_recommendations)
+        plan = self._plans.get(key)
+        if plan is not None:
+            self._plans.move_to_end(key)
+            self.plan_hits += 1
+            return plan
+        
+        self.plan_misses += 1
+        plan = []
+        budget = num_recommendations
+        for rec_type, min_difficulty, max_difficulty, count, template in RECOMMENDATION_BANDS[accuracy_band]:
+            count = min(count, budget)
+            if count <= 0:
+                break
+            plan.append((rec_type, bank.positions(min_difficulty, max_difficulty), count, template))
+            budget -= count
+        
+        self._plans[key] = plan
+        while len(self._plans) > self.plan_cache_size:
+            self._plans.popitem(last=False)
+        return plan
+    
+    def clear_plan_cache(self):
+        """Drop cached recommendation plans"""
+        self._plans.clear()
+    
+    def plan_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the recommendation plan cache"""
+        lookups = self.plan_hits + self.plan_misses
+        return {
+            'hits': self.plan_hits,
+            'misses': self.plan_misses,
+            'hit_rate': self.plan_hits / lookups if lookups else 0.0,
+            'cached_plans': len(self._plans)
+        }
     
     def get_recommendations(self, student_id: str, profile: Dict[str, float], 
                           questions_df: pd.DataFrame, num_recommendations: int = 3) -> List[Dict]:
@@ -148,129 +522,36 @@ class ContentRecommender:
             return []
         
         try:
+            bank = self.get_question_bank(questions_df)
+            
             # Rule-based recommendations based on accuracy
             accuracy = profile.get('accuracy', 0.0)
             engagement = profile.get('engagement', 0.0)
             pace = profile.get('pace', 0.0)
+            values = {'accuracy': accuracy, 'engagement': engagement}
             
+            plan = self.get_plan(accuracy_band(accuracy), int(engagement_bands(engagement)),
+                                 bank, num_recommendations)
             recommendations = []
+            used = []
             
-            if accuracy < 0.6:
-                # Student needs remedial content - Scenario 1 from project doc
-                explanation = f"Based on your {accuracy:.1%} accuracy, the system has identified that you need additional support with foundational concepts. "
-                explanation += "This recommendation provides simplified content with visual aids and guided practice to help reinforce basic skills."
-                
-                remedial_questions = questions_df[questions_df['difficulty'] <= 2].copy()
-                if not remedial_questions.empty:
-                    # Add one remedial question
-                    rec = remedial_questions.sample(n=1).iloc[0]
-                    recommendations.append({
-                        'type': 'remedial',
-                        'question_id': rec['question_id'],
-                        'topic': rec['topic'],
-                        'difficulty': rec['difficulty'],
-                        'text': rec['text'],
-                        'hint': rec['hint'],
-                        'explanation': explanation
-                    })
-                
-                # Add practice questions
-                practice_questions = questions_df[questions_df['difficulty'] == 1].copy()
-                if not practice_questions.empty:
-                    n_practice = min(2, len(practice_questions))
-                    for _, rec in practice_questions.sample(n=n_practice).iterrows():
-                        explanation = f"This practice question reinforces basic concepts you've been working on. "
-                        explanation += "Since your accuracy is {accuracy:.1%}, extra practice with fundamentals will help build confidence."
-                        recommendations.append({
-                            'type': 'practice',
-                            'question_id': rec['question_id'],
-                            'topic': rec['topic'],
-                            'difficulty': rec['difficulty'],
-                            'text': rec['text'],
-                            'hint': rec['hint'],
-                            'explanation': explanation
-                        })
+            def add(positions, rec_type, template):
+                explanation = template.format(**values)
+                for position in positions:
+                    recommendations.append({'type': rec_type, **bank.records[position],
+                                            'explanation': explanation})
+                used.extend(positions.tolist())
             
-            elif 0.6 <= accuracy <= 0.85:
-                # Student needs practice and some challenge
-                explanation = f"With {accuracy:.1%} accuracy, you're showing solid understanding but can still improve. "
-                explanation += "This content balances practice with challenges to help you advance."
-                
-                practice_questions = questions_df[questions_df['difficulty'] == 2].copy()
-                challenge_questions = questions_df[questions_df['difficulty'] >= 3].copy()
-                
-                # Add practice questions
-                if not practice_questions.empty:
-                    n_practice = min(2, len(practice_questions))
-                    for _, rec in practice_questions.sample(n=n_practice).iterrows():
-                        explanation = f"This practice question reinforces your current skill level. "
-                        explanation += "Balanced practice with questions at your level helps maintain and improve your {accuracy:.1%} accuracy."
-                        recommendations.append({
-                            'type': 'practice',
-                            'question_id': rec['question_id'],
-                            'topic': rec['topic'],
-                            'difficulty': rec['difficulty'],
-                            'text': rec['text'],
-                            'hint': rec['hint'],
-                            'explanation': explanation
-                        })
-                
-                # Add one challenge question
-                if not challenge_questions.empty:
-                    rec = challenge_questions.sample(n=1).iloc[0]
-                    explanation = f"This challenge question is designed to stretch your abilities. "
-                    explanation += "With {accuracy:.1%} accuracy, you're ready to tackle more complex problems."
-                    recommendations.append({
-                        'type': 'challenge',
-                        'question_id': rec['question_id'],
-                        'topic': rec['topic'],
-                        'difficulty': rec['difficulty'],
-                        'text': rec['text'],
-                        'hint': rec['hint'],
-                        'explanation': explanation
-                    })
-            
-            else:
-                # High-performing student needs challenging content - Scenario 2 from project doc
-                explanation = f"Excellent work! With {accuracy:.1%} accuracy, you're identified as an advanced learner. "
-                explanation += "This recommendation skips remedial content and offers challenging, case study-based activities to keep you engaged."
-                
-                challenge_questions = questions_df[questions_df['difficulty'] >= 3].copy()
-                
-                if not challenge_questions.empty:
-                    n_challenge = min(3, len(challenge_questions))
-                    for _, rec in challenge_questions.sample(n=n_challenge).iterrows():
-                        explanation = f"As an advanced learner with {accuracy:.1%} accuracy, this challenge question is designed to deepen your understanding. "
-                        explanation += "It goes beyond basic concepts to encourage creative thinking and application."
-                        recommendations.append({
-                            'type': 'challenge',
-                            'question_id': rec['question_id'],
-                            'topic': rec['topic'],
-                            'difficulty': rec['difficulty'],
-                            'text': rec['text'],
-                            'hint': rec['hint'],
-                            'explanation': explanation
-                        })
+            for rec_type, positions, count, template in plan:
+                add(bank.sample(positions, count, self.rng, exclude=np.array(used, dtype=np.int64)),
+                    rec_type, template)
             
             # Ensure we have exactly the requested number of recommendations
             if len(recommendations) < num_recommendations:
                 # Fill with random questions
                 remaining = num_recommendations - len(recommendations)
-                used_ids = {rec['question_id'] for rec in recommendations}
-                available_questions = questions_df[~questions_df['question_id'].isin(used_ids)]
-                
-                if not available_questions.empty:
-                    for _, rec in available_questions.sample(n=min(remaining, len(available_questions))).iterrows():
-                        explanation = f"This additional question complements your learning path based on your {accuracy:.1%} accuracy and {engagement:.1%} engagement."
-                        recommendations.append({
-                            'type': 'additional',
-                            'question_id': rec['question_id'],
-                            'topic': rec['topic'],
-                            'difficulty': rec['difficulty'],
-                            'text': rec['text'],
-                            'hint': rec['hint'],
-                            'explanation': explanation
-                        })
+                add(bank.sample(bank.positions(), remaining, self.rng, exclude=np.array(used, dtype=np.int64)),
+                    'additional', ADDITIONAL_EXPLANATION)
             
             return recommendations[:num_recommendations]
             
@@ -291,35 +572,127 @@ class ContentRecommender:
                     for _, rec in questions_df.sample(n=min(num_recommendations, len(questions_df))).iterrows()
                 ]
             return []
+
+    def get_recommendations_batch(self, profiles: Dict[str, Dict[str, float]],
+                                  questions_df: pd.DataFrame, num_recommendations: int = 3,
+                                  exclude: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, List[Dict]]:
+        """Get recommendations for many students in one call
+
+        Students are bucketed by accuracy and engagement band and every slot
+        of a band's plan is sampled for all of its students in one draw from
+        the shared RNG.
+        exclude maps a student to question IDs they should not be offered,
+        e.g. questions already answered. A student never gets the same
+        question twice in one list.
+        """
+        student_ids = list(profiles.keys())
+        results: Dict[str, List[Dict]] = {student_id: [] for student_id in student_ids}
+        if questions_df.empty or not student_ids:
+            return results
+        exclude = exclude or {}
+
+        try:
+            bank = self.get_question_bank(questions_df)
+            accuracy = np.array([profiles[s].get('accuracy', 0.0) for s in student_ids], dtype=np.float64)
+            engagement = np.array([profiles[s].get('engagement', 0.0) for s in student_ids], dtype=np.float64)
+            groups = accuracy_bands(accuracy) * 2 + engagement_bands(engagement)
+
+            for group in np.unique(groups):
+                plan = self.get_plan(int(group) // 2, int(group) % 2, bank, num_recommendations)
+                members = np.flatnonzero(groups == group)
+                for start in range(0, len(members), self.BATCH_BLOCK):
+                    block = members[start:start + self.BATCH_BLOCK]
+                    self._recommend_block([student_ids[i] for i in block], accuracy[block],
+                                          engagement[block], plan, bank, num_recommendations,
+                                          exclude, results)
+            return results
+
+        except Exception as e:
+            print(f"Error generating batch recommendations: {e}")
+            return {student_id: self.get_recommendations(student_id, profiles[student_id],
+                                                         questions_df, num_recommendations)
+                    for student_id in student_ids}
+
+    def _recommend_block(self, student_ids: List[str], accuracy: np.ndarray, engagement: np.ndarray,
+                         plan: List[tuple], bank: QuestionBank, num_recommendations: int,
+                         exclude: Dict[str, Iterable[str]], results: Dict[str, List[Dict]]):
+        """Fill results for students sharing one recommendation plan"""
+        excluded = np.zeros((len(student_ids), bank.size), dtype=bool)
+        for i, student_id in enumerate(student_ids):
+            rows = [bank.id_to_row[q] for q in exclude.get(student_id, ()) if q in bank.id_to_row]
+            excluded[i, rows] = True
+
+        picks = []
+        for rec_type, positions, count, template in plan:
+            picked = bank.sample_batch(positions, count, self.rng, excluded)
+            self._mark_picked(excluded, picked)
+            picks.append((picked, rec_type, template))
+
+        # Top up students whose band pools ran short, like get_recommendations
+        found = sum((p >= 0).sum(axis=1) for p, _, _ in picks) if picks else np.zeros(len(student_ids), dtype=np.int64)
+        remaining = num_recommendations - found
+        if remaining.max() > 0:
+            picked = bank.sample_batch(bank.positions(), int(remaining.max()), self.rng, excluded)
+            picked[np.arange(picked.shape[1]) >= remaining[:, None]] = -1
+            picks.append((picked, 'additional', ADDITIONAL_EXPLANATION))
+
+        for i, student_id in enumerate(student_ids):
+            values = {'accuracy': accuracy[i], 'engagement': engagement[i]}
+            recommendations = results[student_id]
+            for picked, rec_type, template in picks:
+                explanation = None
+                for position in picked[i][picked[i] >= 0]:
+                    if explanation is None:
+                        explanation = template.format(**values)
+                    recommendations.append({'type': rec_type, **bank.records[position],
+                                            'explanation': explanation})
+
+    @staticmethod
+    def _mark_picked(excluded: np.ndarray, picked: np.ndarray):
+        rows, cols = np.nonzero(picked >= 0)
+        excluded[rows, picked[rows, cols]] = True
+
+    def get_models(self, bank: QuestionBank) -> Optional[RecommenderModels]:
+        """Fitted models for a bank version, loaded from model_dir on first use"""
+        if self._models_version != bank.version:
+            self._models = RecommenderModels.load(self.model_dir, bank.version)
+            self._models_version = bank.version
+        return self._models
+    
+    def get_similar_questions(self, question_ids: Iterable[str], questions_df: pd.DataFrame,
+                              k: int = 3, exclude: Optional[Iterable[str]] = None) -> List[Dict]:
+        """Questions most similar to question_ids by embedding, e.g. ones a student missed
+
+        Returns an empty list when no embedding index has been built.
+        """
+        if not len(self.embeddings) or questions_df.empty:
+            return []
+        try:
+            bank = self.get_question_bank(questions_df)
+            similar = []
+            # Ask for extra neighbours in case some are no longer in the bank
+            for question_id, score in self.embeddings.similar_to(question_ids, k * 2, exclude,
+                                                                 ann=self.ann):
+                position = bank.row_of(question_id)
+                if position is not None:
+                    similar.append({**bank.records[position], 'similarity': round(score, 3)})
+            return similar[:k]
+        except Exception as e:
+            print(f"Error finding similar questions: {e}")
+            return []
     
     def _get_ml_recommendations(self, profile: Dict[str, float], 
                                questions_df: pd.DataFrame) -> List[Dict]:
         """Use ML models for more sophisticated recommendations"""
         try:
-            # Create feature vector for student
-            features = np.array([[
-                profile.get('accuracy', 0),
-                profile.get('pace', 0),
-                profile.get('engagement', 0)
-            ]])
-            
-            # Normalize features
-            features_scaled = self.scaler.fit_transform(features)
+            bank = self.get_question_bank(questions_df)
+            models = self.get_models(bank)
             
-            # Use clustering to find similar student patterns
-            if self.clusterer and len(questions_df) > 3:
-                # Fit clusterer on question difficulties
-                question_features = questions_df[['difficulty']].values
-                self.clusterer.fit(question_features)
-                
-                # Get cluster for current student profile
-                student_cluster = self.clusterer.predict(features_scaled[:, :1])[0]
-                
-                # Recommend questions from the same cluster
-                question_clusters = self.clusterer.predict(question_features)
-                recommended_questions = questions_df[question_clusters == student_cluster]
-                
-                return recommended_questions.to_dict('records')
+            # Recommend questions from the difficulty cluster matching the student
+            if models is not None and len(models.question_clusters) == bank.size:
+                student_cluster = models.student_cluster(profile)
+                return [dict(bank.records[position])
+                        for position in models.questions_in_cluster(student_cluster)]
             
         except Exception as e:
             print(f"ML recommendation error: {e}")
@@ -0,0 +1,135 @@
+import sys
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple
+
+RECORD_COLUMNS = ['question_id', 'topic', 'difficulty', 'text', 'hint']
+
+
+class QuestionBank:
+    """Read-only index over a questions DataFrame, built once per bank version
+
+    Holds row positions per difficulty, topics interned as integer codes,
+    a question_id -> row map, and the record dict of every question, so
+    recommendations can sample integer positions instead of filtering and
+    copying the DataFrame on each request.
+    """
+
+    def __init__(self, questions_df: pd.DataFrame, version: Optional[str] = None):
+        self.version = version or self.version_of(questions_df)
+        self.size = len(questions_df)
+
+        self.question_ids = [str(q) for q in questions_df['question_id']]
+        self.id_to_row: Dict[str, int] = {q: i for i, q in enumerate(self.question_ids)}
+        self.difficulty = questions_df['difficulty'].to_numpy(dtype=np.int64)
+
+        topic_codes, topics = pd.factorize(questions_df['topic'])
+        self.topics: List[str] = [sys.intern(str(t)) for t in topics]
+        self.topic_codes = topic_codes.astype(np.int32)
+
+        self.by_difficulty: Dict[int, np.ndarray] = {
+            int(level): np.flatnonzero(self.difficulty == level)
+            for level in np.unique(self.difficulty)
+        }
+        self._ranges: Dict[Tuple[Optional[int], Optional[int]], np.ndarray] = {}
+
+        texts = questions_df['text'].tolist() if 'text' in questions_df else [''] * self.size
+        hints = questions_df['hint'].tolist() if 'hint' in questions_df else [''] * self.size
+        self.records: List[Dict[str, Any]] = [
+            {
+                'question_id': self.question_ids[i],
+                'topic': self.topics[self.topic_codes[i]] if self.topic_codes[i] >= 0 else None,
+                'difficulty': int(self.difficulty[i]),
+                'text': texts[i],
+                'hint': hints[i]
+            }
+            for i in range(self.size)
+        ]
+
+    @staticmethod
+    def version_of(questions_df: pd.DataFrame) -> str:
+        """Content hash identifying a version of the question bank"""
+        columns = [c for c in RECORD_COLUMNS if c in questions_df.columns]
+        hashed = pd.util.hash_pandas_object(questions_df[columns], index=False)
+        # Row order matters: recommendations and samplers address questions by position
+        digest = hashlib.sha1(hashed.to_numpy().tobytes()).hexdigest()[:16]
+        return f"{len(questions_df)}-{digest}"
+
+    def positions(self, min_difficulty: Optional[int] = None,
+                  max_difficulty: Optional[int] = None) -> np.ndarray:
+        """Row positions with min_difficulty <= difficulty <= max_difficulty"""
+        key = (min_difficulty, max_difficulty)
+        cached = self._ranges.get(key)
+        if cached is None:
+            parts = [rows for level, rows in self.by_difficulty.items()
+                     if (min_difficulty is None or level >= min_difficulty)
+                     and (max_difficulty is None or level <= max_difficulty)]
+            cached = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+            self._ranges[key] = cached
+        return cached
+
+    def sample(self, positions: np.ndarray, n: int, rng: np.random.Generator,
+               exclude: Optional[np.ndarray] = None) -> np.ndarray:
+        """Up to n distinct positions drawn uniformly from positions"""
+        if exclude is not None and len(exclude) > n:
+            positions = positions[~np.isin(positions, exclude)]
+        elif exclude is not None and len(exclude):
+            # Few exclusions: draw enough extra to drop them afterwards
+            skip = set(np.asarray(exclude).tolist())
+            drawn = rng.choice(positions, size=min(n + len(skip), len(positions)), replace=False)
+            return np.array([p for p in drawn.tolist() if p not in skip][:n], dtype=np.int64)
+        n = min(n, len(positions))
+        if n <= 0:
+            return np.empty(0, dtype=np.int64)
+        return rng.choice(positions, size=n, replace=False)
+
+    def sample_batch(self, positions: np.ndarray, n: int, rng: np.random.Generator,
+                     excluded: np.ndarray) -> np.ndarray:
+        """Up to n distinct positions per row of a (students, size) exclusion mask
+
+        Every student draws a few candidates with replacement at once and
+        keeps the first n that are neither excluded nor repeated. Students
+        left short (small pools, heavy exclusions) instead rank their whole
+        pool by random keys with excluded candidates keyed at infinity.
+        Slots left without a candidate hold -1.
+        """
+        students = len(excluded)
+        picked = np.full((students, n), -1, dtype=np.int64)
+        k = min(n, len(positions))
+        if k <= 0 or students == 0:
+            return picked
+
+        draws = 2 * k + 4
+        if draws < len(positions):
+            candidates = positions[rng.integers(0, len(positions), (students, draws))]
+            usable = ~np.take_along_axis(excluded, candidates, axis=1)
+            order = np.argsort(candidates, axis=1, kind='stable')
+            ranked = np.take_along_axis(candidates, order, axis=1)
+            repeat = np.zeros_like(usable)
+            np.put_along_axis(repeat, order[:, 1:], ranked[:, 1:] == ranked[:, :-1], axis=1)
+            usable &= ~repeat
+            slot = np.cumsum(usable, axis=1) - 1
+            keep = usable & (slot < k)
+            rows, cols = np.nonzero(keep)
+            picked[rows, slot[rows, cols]] = candidates[rows, cols]
+            short = np.flatnonzero(keep.sum(axis=1) < k)
+        else:
+            short = np.arange(students)
+
+        if len(short):
+            keys = rng.random((len(short), len(positions)))
+            keys[excluded[short][:, positions]] = np.inf
+            if k < len(positions):
+                columns = np.argpartition(keys, k - 1, axis=1)[:, :k]
+            else:
+                columns = np.broadcast_to(np.arange(k), (len(short), k))
+            chosen = np.take_along_axis(keys, columns, axis=1)
+            order = np.argsort(chosen, axis=1)
+            columns = np.take_along_axis(columns, order, axis=1)
+            chosen = np.take_along_axis(chosen, order, axis=1)
+            picked[short, :k] = np.where(np.isfinite(chosen), positions[columns], -1)
+        return picked
+
+    def row_of(self, question_id: str) -> Optional[int]:
+        return self.id_to_row.get(question_id)
@@ -0,0 +1,203 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Iterable, Tuple
+
+from ann_index import IVFIndex
+
+
+def question_text(row: Dict) -> str:
+    """Text embedded for a question: its topic followed by its text"""
+    return f"{row.get('topic', '')}: {row.get('text', '')}"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class QuestionEmbeddings:
+    """Question vectors kept in a float32 .npy matrix, memory-mapped on load
+
+    Rows are L2-normalized, so similarity is a dot product. A JSON file next
+    to the matrix (e.g. data/question_embeddings.json) lists the question_id
+    and text hash of every row; update() re-embeds only questions whose text
+    changed or that are new.
+    """
+
+    def __init__(self, path: str = 'data/question_embeddings.npy'):
+        self.path = path
+        self.meta_path = os.path.splitext(path)[0] + '.json'
+        self.model: Optional[str] = None
+        self.question_ids: List[str] = []
+        self.hashes: List[str] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.vectors = np.zeros((0, 0), dtype=np.float32)
+
+    @classmethod
+    def load(cls, path: str = 'data/question_embeddings.npy') -> 'QuestionEmbeddings':
+        """Memory-map a saved matrix, or start an empty index if none exists"""
+        index = cls(path)
+        if os.path.exists(path) and os.path.exists(index.meta_path):
+            try:
+                with open(index.meta_path, 'r') as f:
+                    meta = json.load(f)
+                vectors = np.load(path, mmap_mode='r')
+                if len(vectors) != len(meta['question_ids']):
+                    raise ValueError(f"{len(vectors)} vectors for {len(meta['question_ids'])} questions")
+                index._restore(meta, vectors)
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Warning: could not load question embeddings from {path}: {e}")
+        return index
+
+    def _restore(self, meta: Dict, vectors: np.ndarray):
+        self.model = meta.get('model')
+        self.question_ids = [str(q) for q in meta['question_ids']]
+        self.hashes = list(meta['hashes'])
+        self.id_to_row = {q: i for i, q in enumerate(self.question_ids)}
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the model, question ids and text hashes behind the rows"""
+        digest = hashlib.sha1(str(self.model).encode('utf-8'))
+        for question_id, text_digest in zip(self.question_ids, self.hashes):
+            digest.update(f"\n{question_id}\t{text_digest}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def update(self, questions_df: pd.DataFrame, encode: Callable[[List[str]], np.ndarray],
+               model: Optional[str] = None, batch_size: int = 256) -> int:
+        """Embed new or changed questions, reuse the rest, and save the matrix
+
+        encode maps a list of texts to a 2-D array, e.g. a sentence
+        transformer's encode. Rows follow the order of questions_df; removed
+        questions are dropped. A different model name re-embeds everything.
+        Returns the number of questions embedded.
+        """
+        question_ids = [str(q) for q in questions_df['question_id']]
+        texts = [question_text(row) for row in questions_df.to_dict('records')]
+        hashes = [text_hash(text) for text in texts]
+
+        same_model = model is None or model == self.model
+        reuse = np.full(len(question_ids), -1, dtype=np.int64)
+        if same_model:
+            for i, (question_id, digest) in enumerate(zip(question_ids, hashes)):
+                row = self.id_to_row.get(question_id)
+                if row is not None and self.hashes[row] == digest:
+                    reuse[i] = row
+        stale = np.flatnonzero(reuse < 0)
+
+        fresh = None
+        if len(stale):
+            parts = [np.asarray(encode([texts[i] for i in stale[start:start + batch_size]]),
+                                dtype=np.float32)
+                     for start in range(0, len(stale), batch_size)]
+            fresh = np.concatenate(parts)
+            norms = np.linalg.norm(fresh, axis=1, keepdims=True)
+            fresh /= np.where(norms > 0, norms, 1.0)
+
+        dim = fresh.shape[1] if fresh is not None else self.dim
+        vectors = np.zeros((len(question_ids), dim), dtype=np.float32)
+        kept = np.flatnonzero(reuse >= 0)
+        if len(kept):
+            vectors[kept] = self.vectors[reuse[kept]]
+        if fresh is not None:
+            vectors[stale] = fresh
+
+        self._save(vectors, {'model': model if model is not None else self.model,
+                             'question_ids': question_ids, 'hashes': hashes})
+        return len(stale)
+
+    def _save(self, vectors: np.ndarray, meta: Dict):
+        """Write the matrix and its metadata, replacing both atomically"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, vectors)
+        tmp_meta = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.path)
+        os.replace(tmp_meta, self.meta_path)
+        self._restore(meta, np.load(self.path, mmap_mode='r'))
+
+    def rows_of(self, question_ids: Iterable[str]) -> np.ndarray:
+        """Rows of the question_ids that are in the index"""
+        return np.array([self.id_to_row[q] for q in question_ids if q in self.id_to_row],
+                        dtype=np.int64)
+
+    def top_k(self, queries: np.ndarray, k: int = 5,
+              exclude_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Most similar rows for each query vector, in one matrix product
+
+        Returns (rows, scores), both of shape (queries, k) and ordered from
+        most similar; rows are -1 where fewer than k candidates remain.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        scores = queries @ np.asarray(self.vectors).T
+        if exclude_rows is not None and len(exclude_rows):
+            scores[:, exclude_rows] = -np.inf
+        return self._select(scores, k)
+
+    @staticmethod
+    def _select(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        count = scores.shape[1]
+        rows = np.full((len(scores), k), -1, dtype=np.int64)
+        best = np.full((len(scores), k), -np.inf, dtype=np.float32)
+        k_eff = min(k, count)
+        if k_eff <= 0:
+            return rows, best
+        top = np.argpartition(-scores, k_eff - 1, axis=1)[:, :k_eff] if k_eff < count \
+            else np.broadcast_to(np.arange(count), (len(scores), count))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        found = np.isfinite(top_scores)
+        rows[:, :k_eff] = np.where(found, top, -1)
+        best[:, :k_eff] = top_scores
+        return rows, best
+
+    def similar_to(self, question_ids: Iterable[str], k: int = 5,
+                   exclude: Optional[Iterable[str]] = None,
+                   ann: Optional[IVFIndex] = None) -> List[Tuple[str, float]]:
+        """Questions closest to any of question_ids, e.g. the ones a student missed
+
+        Each candidate scores its best similarity to the given questions;
+        the given questions and exclude are never returned. With an ANN
+        index only its probed lists are scanned instead of every row.
+        """
+        rows = self.rows_of(question_ids)
+        if not len(rows) or not len(self):
+            return []
+        skip = np.union1d(rows, self.rows_of(exclude or []))
+        queries = np.asarray(self.vectors[rows])
+
+        if ann is not None:
+            found, found_scores = ann.search(queries, k, exclude_rows=skip)
+            found, found_scores = found.ravel(), found_scores.ravel()
+            keep = found >= 0
+            found, found_scores = found[keep], found_scores[keep]
+            # Best score per row, then the k best rows
+            order = np.lexsort((-found_scores, found))
+            found, found_scores = found[order], found_scores[order]
+            first = np.ones(len(found), dtype=bool)
+            first[1:] = found[1:] != found[:-1]
+            found, found_scores = found[first], found_scores[first]
+            top = np.argsort(-found_scores, kind='stable')[:k]
+            return [(self.question_ids[row], float(score))
+                    for row, score in zip(found[top], found_scores[top])]
+
+        scores = queries @ np.asarray(self.vectors).T
+        best = scores.max(axis=0, keepdims=True)
+        best[:, skip] = -np.inf
+        top, top_scores = self._select(best, k)
+        return [(self.question_ids[row], float(score))
+                for row, score in zip(top[0], top_scores[0]) if row >= 0]
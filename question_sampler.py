@@ -0,0 +1,168 @@
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Any
+
+from question_bank import QuestionBank
+
+
+class FenwickTree:
+    """Binary indexed tree over non-negative weights
+
+    Supports changing one weight and drawing an index with probability
+    proportional to its weight, both in O(log n).
+    """
+
+    def __init__(self, weights: np.ndarray):
+        self.size = len(weights)
+        self.weights = np.asarray(weights, dtype=np.float64).copy()
+        # Node i holds the sum of the (i & -i) weights ending at i
+        nodes = np.arange(1, self.size + 1)
+        prefix = np.concatenate([[0.0], np.cumsum(self.weights)])
+        self.tree = np.zeros(self.size + 1, dtype=np.float64)
+        self.tree[1:] = prefix[nodes] - prefix[nodes - (nodes & -nodes)]
+        self.step = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    @property
+    def total(self) -> float:
+        total = 0.0
+        i = self.size
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def set(self, index: int, weight: float):
+        delta = weight - self.weights[index]
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, value: float) -> int:
+        """Smallest index whose prefix sum of weights exceeds value"""
+        position = 0
+        step = self.step
+        while step:
+            nxt = position + step
+            if nxt <= self.size and self.tree[nxt] <= value:
+                position = nxt
+                value -= self.tree[nxt]
+            step >>= 1
+        return min(position, self.size - 1)
+
+
+class QuestionSampler:
+    """Weighted sampling of quiz questions without replacement
+
+    A question's weight is how well its difficulty fits the student (a
+    Gaussian around a target difficulty set by their accuracy) times a
+    recency factor: a question seen in the student's last quiz has weight
+    0 and recovers linearly over the next recency_quizzes quizzes, after
+    which it leaves the student's seen-set. One Fenwick tree of fit weights
+    is kept per target difficulty; a draw lowers the weights of the seen
+    and already picked questions, samples in O(log n) per question, and
+    restores them afterwards.
+    """
+
+    def __init__(self, bank: QuestionBank, seed: Optional[int] = None,
+                 recency_quizzes: int = 3, fit_width: float = 1.0,
+                 seen: Optional[Dict[str, Dict[str, int]]] = None,
+                 quiz_counts: Optional[Dict[str, int]] = None):
+        self.bank = bank
+        self.rng = np.random.default_rng(seed)
+        self.recency_quizzes = recency_quizzes
+        self.fit_width = fit_width
+        # student_id -> {question_id: quiz number it was last served in}
+        self.seen: Dict[str, Dict[str, int]] = seen if seen is not None else {}
+        # seen is only meaningful together with the quiz numbers it refers to
+        self.quiz_counts: Dict[str, int] = quiz_counts if quiz_counts is not None else {}
+        self._trees: Dict[Optional[float], FenwickTree] = {}
+        self._lock = threading.Lock()
+
+    def target_difficulty(self, accuracy: Optional[float]) -> Optional[float]:
+        """Difficulty a student should practise, in half steps (None: any)"""
+        if accuracy is None or not len(self.bank.difficulty):
+            return None
+        low, high = self.bank.difficulty.min(), self.bank.difficulty.max()
+        return round((low + accuracy * (high - low)) * 2) / 2
+
+    def _tree(self, target: Optional[float]) -> FenwickTree:
+        tree = self._trees.get(target)
+        if tree is None:
+            if target is None:
+                weights = np.ones(self.bank.size)
+            else:
+                weights = np.exp(-0.5 * ((self.bank.difficulty - target) / self.fit_width) ** 2)
+            tree = self._trees[target] = FenwickTree(weights)
+        return tree
+
+    def _recency(self, student_id: str) -> Dict[int, float]:
+        """Recency factor of each recently seen question, pruning recovered ones"""
+        seen = self.seen.get(student_id, {})
+        quiz = self.quiz_counts.get(student_id, 0)
+        factors = {}
+        for question_id, served in list(seen.items()):
+            age = quiz - served - 1
+            if age >= self.recency_quizzes:
+                del seen[question_id]
+                continue
+            row = self.bank.row_of(question_id)
+            if row is not None:
+                factors[row] = max(age, 0) / self.recency_quizzes
+        return factors
+
+    def draw(self, student_id: str, n: int = 5, accuracy: Optional[float] = None,
+             record: bool = True) -> List[Dict[str, Any]]:
+        """Up to n distinct question records for a student's next quiz
+
+        Questions from the student's last quiz are only served once nothing
+        else is left; older ones come back gradually. With record=False the
+        draw does not count as a quiz and the picks are not added to the
+        seen-set.
+        """
+        with self._lock:
+            tree = self._tree(self.target_difficulty(accuracy))
+            factors = self._recency(student_id)
+            # Fit weights of every row changed during this draw, restored at the end
+            changed = {row: tree.weights[row] for row in factors}
+            for row, factor in factors.items():
+                tree.set(row, changed[row] * factor)
+
+            picked = self._pick(tree, n, changed)
+            if len(picked) < n:
+                # Out of unseen questions: let seen ones back in
+                for row in factors:
+                    if row not in picked:
+                        tree.set(row, changed[row])
+                picked += self._pick(tree, n - len(picked), changed)
+
+            for row, weight in changed.items():
+                tree.set(row, weight)
+
+            if record:
+                quiz = self.quiz_counts.get(student_id, 0)
+                seen = self.seen.setdefault(student_id, {})
+                for row in picked:
+                    seen[self.bank.question_ids[row]] = quiz
+                self.quiz_counts[student_id] = quiz + 1
+
+        return [dict(self.bank.records[row]) for row in picked]
+
+    def _pick(self, tree: FenwickTree, n: int, changed: Dict[int, float]) -> List[int]:
+        """Draw up to n rows without replacement, zeroing each pick"""
+        picked = []
+        misses = 0
+        while len(picked) < n and misses < 32:
+            total = tree.total
+            if total <= 1e-12:
+                break
+            row = tree.find(self.rng.random() * total)
+            if tree.weights[row] <= 0:
+                # Rounding left a sliver of weight next to a zeroed row
+                misses += 1
+                continue
+            changed.setdefault(row, tree.weights[row])
+            tree.set(row, 0.0)
+            picked.append(row)
+        return picked
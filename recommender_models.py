@@ -0,0 +1,139 @@
+import os
+import math
+import hashlib
+import numpy as np
+import pandas as pd
+import joblib
+from typing import Dict, Any, Optional
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+from question_bank import QuestionBank
+
+PROFILE_FEATURES = ['accuracy', 'pace', 'engagement']
+
+
+def cohort_version(profiles: Dict[str, Dict[str, Any]]) -> str:
+    """Content hash identifying a cohort of learner profiles"""
+    digest = hashlib.sha1()
+    for student_id in sorted(profiles):
+        profile = profiles[student_id]
+        digest.update(student_id.encode())
+        digest.update(np.array([profile.get(f, 0.0) or 0.0 for f in PROFILE_FEATURES],
+                               dtype=np.float64).tobytes())
+    return f"{len(profiles)}-{digest.hexdigest()[:16]}"
+
+
+class RecommenderModels:
+    """Clusterer and scaler fitted once per question-bank and cohort version
+
+    The KMeans clusterer groups questions by difficulty and its clusters
+    are relabelled from easiest to hardest; the label of every question is
+    kept so request time only looks them up. The scaler is fitted on the
+    cohort's profile features so a student can be placed relative to their
+    peers. Artifacts are written with joblib, uncompressed, so load() can
+    memory-map the arrays.
+    """
+
+    def __init__(self, bank_version: str, clusterer: KMeans, question_clusters: np.ndarray,
+                 scaler: Optional[StandardScaler] = None, cohort: Optional[str] = None):
+        self.bank_version = bank_version
+        self.clusterer = clusterer
+        self.question_clusters = question_clusters
+        self.scaler = scaler
+        self.cohort_version = cohort
+
+    @property
+    def n_clusters(self) -> int:
+        return self.clusterer.n_clusters
+
+    @classmethod
+    def fit(cls, questions_df: pd.DataFrame, bank_version: str,
+            profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+            n_clusters: int = 3) -> 'RecommenderModels':
+        """Fit the clusterer on question difficulty and the scaler on the cohort"""
+        difficulty = questions_df[['difficulty']].to_numpy(dtype=np.float64)
+        n_clusters = max(1, min(n_clusters, len(np.unique(difficulty))))
+        clusterer = KMeans(n_clusters=n_clusters, random_state=42, n_init=10).fit(difficulty)
+
+        # Relabel clusters so that label 0 is the easiest
+        order = np.argsort(clusterer.cluster_centers_[:, 0])
+        relabel = np.empty(n_clusters, dtype=np.int32)
+        relabel[order] = np.arange(n_clusters, dtype=np.int32)
+        clusterer.cluster_centers_ = clusterer.cluster_centers_[order]
+        clusterer.labels_ = relabel[clusterer.labels_]
+        question_clusters = clusterer.labels_.astype(np.int32)
+
+        scaler = None
+        cohort = None
+        if profiles:
+            features = np.array([[profile.get(f, 0.0) or 0.0 for f in PROFILE_FEATURES]
+                                 for profile in profiles.values()], dtype=np.float64)
+            scaler = StandardScaler().fit(features)
+            cohort = cohort_version(profiles)
+
+        return cls(bank_version, clusterer, question_clusters, scaler, cohort)
+
+    @staticmethod
+    def path_for(model_dir: str, bank_version: str) -> str:
+        return os.path.join(model_dir, f"recommender_{bank_version}.joblib")
+
+    def save(self, model_dir: str) -> str:
+        """Write the artifacts for this bank version, replacing them atomically"""
+        os.makedirs(model_dir, exist_ok=True)
+        path = self.path_for(model_dir, self.bank_version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump({
+            'bank_version': self.bank_version,
+            'cohort_version': self.cohort_version,
+            'clusterer': self.clusterer,
+            'scaler': self.scaler,
+            'question_clusters': self.question_clusters
+        }, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, model_dir: str, bank_version: str) -> Optional['RecommenderModels']:
+        """Load the artifacts for a bank version, or None if none were trained"""
+        path = cls.path_for(model_dir, bank_version)
+        if not os.path.exists(path):
+            return None
+        try:
+            data = joblib.load(path, mmap_mode='r')
+        except Exception as e:
+            print(f"Warning: could not load recommender models from {path}: {e}")
+            return None
+        return cls(data['bank_version'], data['clusterer'], data['question_clusters'],
+                   data['scaler'], data['cohort_version'])
+
+    def student_cluster(self, profile: Dict[str, float]) -> int:
+        """Question cluster matching a student's accuracy relative to the cohort
+
+        The standardized accuracy is turned into a cohort percentile, which
+        picks the cluster at the same rank from easiest to hardest. Without
+        a cohort scaler the raw accuracy is used as the percentile.
+        """
+        accuracy = profile.get('accuracy', 0.0) or 0.0
+        if self.scaler is not None:
+            z = (accuracy - self.scaler.mean_[0]) / self.scaler.scale_[0]
+            percentile = 0.5 * (1 + math.erf(z / math.sqrt(2)))
+        else:
+            percentile = accuracy
+        return min(int(percentile * self.n_clusters), self.n_clusters - 1)
+
+    def questions_in_cluster(self, cluster: int) -> np.ndarray:
+        """Row positions of the questions in a cluster"""
+        return np.flatnonzero(np.asarray(self.question_clusters) == cluster)
+
+
+def train_recommender_models(questions_df: pd.DataFrame, model_dir: str = 'data/models',
+                             profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+                             n_clusters: int = 3) -> str:
+    """Training stage: fit the models for a question bank and save them
+
+    Returns the artifact path.
+    """
+    models = RecommenderModels.fit(questions_df, QuestionBank.version_of(questions_df),
+                                   profiles, n_clusters)
+    return models.save(model_dir)
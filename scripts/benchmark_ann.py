@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the IVF approximate nearest-neighbour index.
+Builds the index over synthetic clustered unit vectors and reports recall@k
+against an exact scan, with the median query latency, for each n_probe.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ann_index import IVFIndex
+
+
+def make_vectors(count: int, dim: int, topics: int, noise: float, seed: int) -> np.ndarray:
+    """Unit vectors scattered around a number of topic directions"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, topics, count)]
+    vectors += noise * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ vectors.T
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def time_queries(search, queries: np.ndarray) -> float:
+    """Return the median single-query latency in milliseconds"""
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query[None, :])
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=200000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--topics', type=int, default=500)
+    parser.add_argument('--noise', type=float, default=2.5,
+                        help='Spread of vectors around their topic; higher overlaps topics more')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--lists', type=int, default=None)
+    parser.add_argument('--max-probe', type=int, default=64)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.count, args.dim, args.topics, args.noise, args.seed)
+    queries = vectors[np.random.default_rng(args.seed + 1).choice(args.count, args.queries, replace=False)]
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, n_lists=args.lists, seed=args.seed)
+    print(f"Built {index.n_lists} lists over {args.count} x {args.dim} vectors "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    truth = exact_top_k(vectors, queries, args.k)
+    exact_ms = time_queries(lambda q: exact_top_k(vectors, q, args.k), queries)
+    print(f"{'n_probe':>8} {f'recall@{args.k}':>10} {'median ms':>10} {'speedup':>8}")
+    print(f"{'exact':>8} {1.0:>10.3f} {exact_ms:>10.2f} {1.0:>8.1f}")
+
+    n_probe = 1
+    while n_probe <= min(args.max_probe, index.n_lists):
+        found, _ = index.search(queries, args.k, n_probe=n_probe)
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        latency = time_queries(lambda q: index.search(q, args.k, n_probe=n_probe), queries)
+        print(f"{n_probe:>8} {recall:>10.3f} {latency:>10.2f} {exact_ms / latency:>8.1f}")
+        n_probe *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark for QuizLogger.log_attempt append latency.
+Grows a scratch log file step by step and times a quiz completion at each size,
+showing that the cost of logging does not depend on the size of the history.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import QuizLogger, LOG_COLUMNS
+
+
+def make_filler_rows(num_rows: int) -> pd.DataFrame:
+    """Build synthetic log rows used to grow the log between measurements"""
+    return pd.DataFrame({
+        'student_id': [f"s{i % 500}" for i in range(num_rows)],
+        'timestamp': datetime.now().isoformat(),
+        'question_id': [f"q{i % 25}" for i in range(num_rows)],
+        'answer': 'filler',
+        'correct': [i % 3 == 0 for i in range(num_rows)],
+        'skipped': False,
+        'response_time': 20.0,
+        'accuracy': 0.6,
+        'engagement': 1.0,
+        'avg_response_time': 20.0,
+        'session_id': [f"s{i % 500}_filler_{i // 5}" for i in range(num_rows)]
+    }, columns=LOG_COLUMNS)
+
+
+def time_log_attempt(logger: QuizLogger, repeats: int) -> float:
+    """Return the median log_attempt latency in milliseconds"""
+    answers = {
+        f"q{i}": {'answer': 'x', 'correct': i % 2 == 0, 'skipped': False,
+                  'response_time': 12.5}
+        for i in range(5)
+    }
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        logger.log_attempt('bench_student', pd.DataFrame(), answers)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='0,10000,100000,300000',
+                        help='Comma-separated log sizes (rows) to measure at')
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--fsync', action='store_true',
+                        help='Measure with fsync after every append')
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(','))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_file = os.path.join(tmp, 'data', 'logs.csv')
+        logger = QuizLogger(log_file=log_file, fsync=args.fsync)
+
+        print(f"{'log rows':>10}  {'file size':>10}  {'median ms':>10}")
+        current_rows = 0
+        for size in sizes:
+            if size > current_rows:
+                logger.store.append(make_filler_rows(size - current_rows))
+                current_rows = size
+
+            latency = time_log_attempt(logger, args.repeats)
+            current_rows += 5 * args.repeats
+            file_mb = os.path.getsize(log_file) / 1e6
+            print(f"{size:>10}  {file_mb:>8.1f}MB  {latency:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Embed the question bank for similarity search.
+Writes every question's sentence embedding to a float32 .npy matrix that the
+recommender memory-maps at startup. Later runs re-embed only questions that
+are new or whose text changed. With --ann an approximate nearest-neighbour
+index is rebuilt over the vectors, for banks too large to scan exactly; an
+existing index that no longer matches the vectors is rebuilt as well.
+"""
+
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import get_embedder, EMBEDDING_MODEL
+from question_embeddings import QuestionEmbeddings
+from ann_index import IVFIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--questions-file', default='data/sample_questions.csv')
+    parser.add_argument('--output', default='data/question_embeddings.npy')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--ann', action='store_true',
+                        help='Also build the IVF approximate nearest-neighbour index')
+    parser.add_argument('--ann-output', default='data/question_ann.npz')
+    parser.add_argument('--ann-lists', type=int, default=None,
+                        help='Number of IVF lists (default: sqrt of the bank size)')
+    args = parser.parse_args()
+
+    embedder = get_embedder()
+    if embedder is None:
+        print("sentence-transformers is not available; install it to build embeddings")
+        sys.exit(1)
+
+    questions_df = pd.read_csv(args.questions_file)
+    index = QuestionEmbeddings.load(args.output)
+    embedded = index.update(questions_df, embedder.encode, model=EMBEDDING_MODEL,
+                            batch_size=args.batch_size)
+    print(f"Embedded {embedded} of {len(index)} questions into {args.output}")
+
+    stale = len(index) > 0 and os.path.exists(args.ann_output) and \
+        IVFIndex.load(args.ann_output, index.vectors, index.fingerprint) is None
+    if args.ann or stale:
+        ann = IVFIndex.build(index.vectors, n_lists=args.ann_lists,
+                             fingerprint=index.fingerprint)
+        ann.save(args.ann_output)
+        print(f"Built ANN index with {ann.n_lists} lists into {args.ann_output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Rebuild learner profiles from the quiz log.
+The first run (or --full) regenerates the profile of every student in the log
+from their logged sessions; later runs only read sessions written since the
+previous run, using a cursor stored with the profiles. The replayed answers
+also update the per-topic mastery when the questions file is available.
+"""
+
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import QuizLogger
+from models import LearnerProfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--log-file', default='data/logs.csv')
+    parser.add_argument('--backend', default='csv',
+                        choices=['csv', 'parquet', 'sqlite'])
+    parser.add_argument('--profiles-file', default='data/learner_profiles.json')
+    parser.add_argument('--questions-file', default='data/sample_questions.csv')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the stored cursor and rebuild every logged profile')
+    args = parser.parse_args()
+
+    logger = QuizLogger(log_file=args.log_file, backend=args.backend)
+    profile_manager = LearnerProfile(profiles_file=args.profiles_file)
+    questions_df = None
+    if os.path.exists(args.questions_file):
+        questions_df = pd.read_csv(args.questions_file)
+    else:
+        print(f"{args.questions_file} not found; topic mastery is not updated")
+    applied = profile_manager.rebuild_from_logs(logger, full=args.full,
+                                                questions_df=questions_df)
+    print(f"Applied {applied} sessions; {len(profile_manager.profiles)} profiles stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Train the recommender's ML models.
+Fits the question clusterer for the current question bank and the cohort
+scaler on the stored learner profiles, and saves them under the model
+directory, where ContentRecommender loads them at request time.
+"""
+
+import os
+import sys
+import argparse
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import LearnerProfile
+from recommender_models import train_recommender_models
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--questions-file', default='data/sample_questions.csv')
+    parser.add_argument('--profiles-file', default='data/learner_profiles.json')
+    parser.add_argument('--model-dir', default='data/models')
+    parser.add_argument('--clusters', type=int, default=3)
+    args = parser.parse_args()
+
+    questions_df = pd.read_csv(args.questions_file)
+    profiles = dict(LearnerProfile(profiles_file=args.profiles_file).profiles.iter_profiles())
+    path = train_recommender_models(questions_df, args.model_dir, profiles, args.clusters)
+    print(f"Trained on {len(questions_df)} questions and {len(profiles)} profiles; saved {path}")
+
+
+if __name__ == "__main__":
+    main()
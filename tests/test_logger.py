@@ -0,0 +1,876 @@
+import pytest
+import pandas as pd
+import os
+import sys
+import tempfile
+import shutil
+import threading
+import time
+import multiprocessing
+from typing import Optional
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger import QuizLogger, LOG_COLUMNS
+from log_store import LogCache, LogSegments, BackgroundLogWriter, summarize_sessions
+
+
+def make_answers(num_questions: int = 3, correct: int = 2) -> dict:
+    """Build an answers dict in the shape the quiz page produces"""
+    return {
+        f"q{i + 1}": {
+            'answer': 'x',
+            'correct': i < correct,
+            'skipped': False,
+            'response_time': 10.0 + i
+        }
+        for i in range(num_questions)
+    }
+
+
+class TestAppendOnlyLogging:
+    """Test the append-only write path of QuizLogger"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_append_keeps_existing_bytes(self):
+        """Existing rows must not be rewritten when a session is logged"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+
+        with open(logger.log_file, 'rb') as f:
+            before = f.read()
+
+        logger.log_attempt('s2', pd.DataFrame(), make_answers())
+
+        with open(logger.log_file, 'rb') as f:
+            after = f.read()
+
+        assert after.startswith(before)
+        assert after.count(b'student_id') == 1  # header written once
+
+        logs = logger.get_all_logs()
+        assert list(logs.columns) == LOG_COLUMNS
+        assert len(logs) == 6
+
+    def test_header_written_for_missing_or_empty_file(self):
+        """A deleted or truncated log gets a fresh header on the next append"""
+        logger = QuizLogger(fsync=True)
+        os.remove(logger.log_file)
+        assert logger.log_attempt('s1', pd.DataFrame(), make_answers())
+
+        open(logger.log_file, 'w').close()
+        assert logger.log_attempt('s2', pd.DataFrame(), make_answers())
+
+        logs = logger.get_all_logs()
+        assert list(logs['student_id'].unique()) == ['s2']
+
+    def test_append_follows_existing_column_order(self):
+        """Rows are written in the column order of a pre-existing file"""
+        reordered = list(reversed(LOG_COLUMNS))
+        pd.DataFrame(columns=reordered).to_csv('data/logs.csv', index=False)
+
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+
+        logs = pd.read_csv('data/logs.csv')
+        assert list(logs.columns) == reordered
+        assert (logs['student_id'] == 's1').all()
+
+
+class TestLogCache:
+    """Test the shared, indexed log cache used by the CSV backend"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_cache_is_shared_and_counts_hits(self):
+        """Loggers on the same file share one cache; unchanged reads are hits"""
+        logger = QuizLogger()
+        other = QuizLogger()
+        assert logger.store.cache is other.store.cache
+
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+        logger.get_all_logs()
+        before = logger.cache_stats()
+        other.get_student_logs('s1')
+        other.get_all_logs()
+        after = logger.cache_stats()
+
+        assert after['hits'] == before['hits'] + 2
+        assert after['misses'] == before['misses']
+
+    def test_incremental_refresh_reads_only_new_rows(self):
+        """Appends are picked up from the file tail without a full reload"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+        assert len(logger.get_student_logs('s1')) == 3
+        reloads = logger.cache_stats()['full_reloads']
+
+        logger.log_attempt('s2', pd.DataFrame(), make_answers(2, 1))
+        s2_logs = logger.get_student_logs('s2')
+        session_id = s2_logs['session_id'].iloc[0]
+
+        stats = logger.cache_stats()
+        assert len(s2_logs) == 2
+        assert stats['full_reloads'] == reloads
+        assert stats['incremental_refreshes'] >= 1
+        assert stats['cached_rows'] == 5
+        assert logger.get_session_summary(session_id)['correct_answers'] == 1
+
+        uncached = pd.read_csv(logger.log_file)
+        assert len(logger.get_all_logs()) == len(uncached)
+
+    def test_partial_line_is_not_consumed(self):
+        """A half-written row is left for the next refresh"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+        cache = LogCache.for_file(logger.log_file)
+        cache.refresh()
+
+        line = pd.read_csv(logger.log_file).iloc[[0]].to_csv(
+            index=False, header=False)
+        with open(logger.log_file, 'a') as f:
+            f.write(line[:10])
+        assert len(cache.all_rows()) == 3
+
+        with open(logger.log_file, 'a') as f:
+            f.write(line[10:])
+        assert len(cache.all_rows()) == 4
+
+    def test_clear_invalidates_cache(self):
+        """Clearing the logs is reflected by the cache"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+        assert not logger.get_all_logs().empty
+
+        logger.clear_logs(confirm=True)
+        assert logger.get_all_logs().empty
+        assert logger.get_student_logs('s1').empty
+
+
+class TestSessionSummaries:
+    """Test the session-summary table maintained by log_attempt"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_one_summary_row_per_session(self):
+        """Each logged attempt adds exactly one summary row"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers(4, 3))
+        logger.log_attempt('s2', pd.DataFrame(), make_answers(2, 0))
+
+        sessions = pd.read_csv('data/logs_sessions.csv')
+        assert len(sessions) == 2
+
+        s1 = logger.get_student_sessions('s1').iloc[0]
+        assert s1['total_questions'] == 4
+        assert s1['correct_answers'] == 3
+        assert abs(s1['accuracy'] - 0.75) < 1e-9
+
+    def test_summaries_match_raw_rows(self):
+        """Materialized summaries agree with a group-by over the raw log"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers(3, 1))
+        logger.log_attempt('s2', pd.DataFrame(), make_answers(5, 4))
+
+        expected = summarize_sessions(logger.get_all_logs())
+        stored = logger.store.read_sessions()
+        pd.testing.assert_frame_equal(
+            expected.sort_values('session_id').reset_index(drop=True),
+            stored.sort_values('session_id').reset_index(drop=True),
+            check_dtype=False)
+
+    def test_legacy_log_is_backfilled(self):
+        """A logs.csv written before summaries existed gets them on open"""
+        QuizLogger().log_attempt('s1', pd.DataFrame(), make_answers())
+        os.remove('data/logs_sessions.csv')
+
+        logger = QuizLogger()
+        summary = logger.get_student_performance_summary('s1')
+        assert summary['total_sessions'] == 1
+        assert summary['total_questions'] == 3
+        assert summary['improvement_trend'] == 'Insufficient data'
+
+    def test_improvement_trend_from_summaries(self):
+        """The trend compares early and late session accuracy"""
+        logger = QuizLogger()
+        rows = []
+        for day, accuracy in enumerate([0.2, 0.3, 0.8, 0.9], start=1):
+            rows.append({
+                'session_id': f"s1_2024010{day}_090000",
+                'student_id': 's1',
+                'timestamp': f"2024-01-0{day}T09:00:00",
+                'total_questions': 5,
+                'correct_answers': int(accuracy * 5),
+                'questions_skipped': 0,
+                'accuracy': accuracy,
+                'engagement': 1.0,
+                'avg_response_time': 20.0
+            })
+        logger.store.append_sessions(pd.DataFrame(rows))
+
+        summary = logger.get_student_performance_summary('s1')
+        assert summary['total_sessions'] == 4
+        assert summary['total_questions'] == 20
+        assert summary['improvement_trend'] == 'Improving'
+        assert [s['accuracy'] for s in summary['sessions']] == [0.2, 0.3, 0.8, 0.9]
+
+    def test_bulk_summaries_match_per_student(self):
+        """The bulk summaries agree with the per-student summary"""
+        logger = QuizLogger()
+        rows = []
+        accuracies = {
+            's1': [0.2, 0.3, 0.8, 0.9],
+            's2': [0.9, 0.8, 0.7, 0.2, 0.1],
+            's3': [0.6, 0.62, 0.6],
+            's4': [0.4]
+        }
+        for student_id, values in accuracies.items():
+            for day, accuracy in enumerate(values, start=1):
+                rows.append({
+                    'session_id': f"{student_id}_2024010{day}_090000",
+                    'student_id': student_id,
+                    'timestamp': f"2024-01-0{day}T09:00:00",
+                    'total_questions': 5,
+                    'correct_answers': int(accuracy * 5),
+                    'questions_skipped': day % 2,
+                    'accuracy': accuracy,
+                    'engagement': 1 - (day % 2) / 5,
+                    'avg_response_time': 10.0 + day
+                })
+        # Out of order on disk; both APIs order sessions by id
+        logger.store.append_sessions(pd.DataFrame(rows[::-1]))
+
+        bulk = logger.get_performance_summaries()
+        assert list(bulk['student_id']) == ['s1', 's2', 's3', 's4']
+        for record in bulk.to_dict('records'):
+            single = logger.get_student_performance_summary(record['student_id'])
+            for key in ['total_sessions', 'total_questions', 'overall_accuracy',
+                        'average_engagement', 'average_response_time',
+                        'improvement_trend']:
+                assert record[key] == pytest.approx(single[key])
+
+        subset = logger.get_performance_summaries(student_ids=['s2', 'missing'])
+        assert list(subset['student_id']) == ['s2']
+        assert subset['improvement_trend'].iloc[0] == 'Declining'
+
+    def test_bulk_summaries_empty(self):
+        """No sessions yields an empty frame with the summary columns"""
+        summary = QuizLogger().get_performance_summaries()
+        assert summary.empty
+        assert 'improvement_trend' in summary.columns
+
+    def test_sessions_since_cursor(self):
+        """A cursor resumes after the last session read, or restarts after a rewrite"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), make_answers())
+        sessions, cursor = logger.get_sessions_since()
+        assert sessions['student_id'].tolist() == ['s1']
+
+        logger.log_attempt('s2', pd.DataFrame(), make_answers())
+        sessions, cursor = logger.get_sessions_since(cursor)
+        assert sessions['student_id'].tolist() == ['s2']
+        assert logger.get_sessions_since(cursor)[0].empty
+
+        assert logger.clear_logs(confirm=True)
+        logger.log_attempt('s3', pd.DataFrame(), make_answers())
+        logger.log_attempt('s4', pd.DataFrame(), make_answers())
+        sessions, _ = logger.get_sessions_since(cursor)
+        assert sessions['student_id'].tolist() == ['s3', 's4']
+
+
+class RecordingStore:
+    """Store double that records each append call"""
+
+    def __init__(self, fail: bool = False, gate: Optional[threading.Event] = None):
+        self.fail = fail
+        self.gate = gate
+        self.appends = []
+        self.session_appends = []
+
+    def append(self, rows):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.fail:
+            raise IOError("disk full")
+        self.appends.append(rows)
+
+    def append_sessions(self, sessions):
+        self.session_appends.append(sessions)
+
+
+class TestBackgroundLogWriter:
+    """Test the optional asynchronous, batched write mode"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_async_attempts_are_durable_after_future(self):
+        """Futures resolve True once the attempt is readable from the store"""
+        logger = QuizLogger(async_writes=True, flush_interval=0.05)
+        futures = [logger.submit_attempt(f"s{i}", pd.DataFrame(), make_answers())
+                   for i in range(10)]
+
+        assert all(f.result(timeout=5) for f in futures)
+        assert len(logger.get_all_logs()) == 30
+        assert len(logger.store.read_sessions()) == 10
+        logger.close()
+
+    def test_attempts_are_group_committed(self):
+        """Queued attempts are written in batches, not one append each"""
+        store = RecordingStore()
+        writer = BackgroundLogWriter(store, max_batch=8, flush_interval=5.0)
+        rows = pd.DataFrame({'student_id': ['s1']})
+        futures = [writer.submit(rows, rows) for _ in range(16)]
+
+        assert all(f.result(timeout=5) for f in futures)
+        assert len(store.appends) == 2
+        assert sum(len(batch) for batch in store.appends) == 16
+        writer.close()
+
+    def test_failed_write_resolves_false(self):
+        """A failed batch reports False, like the synchronous return value"""
+        writer = BackgroundLogWriter(RecordingStore(fail=True),
+                                     flush_interval=0.01)
+        rows = pd.DataFrame({'student_id': ['s1']})
+        assert writer.submit(rows, rows).result(timeout=5) is False
+        writer.close()
+
+    def test_flush_times_out_on_a_full_queue(self):
+        """flush() gives up after its timeout instead of blocking on the queue"""
+        gate = threading.Event()
+        writer = BackgroundLogWriter(RecordingStore(gate=gate), max_batch=1,
+                                     flush_interval=0.01, max_queue=1,
+                                     enqueue_timeout=0.05)
+        rows = pd.DataFrame({'student_id': ['s1']})
+        futures = [writer.submit(rows, rows) for _ in range(3)]
+
+        started = time.monotonic()
+        assert writer.flush(timeout=0.2) is False
+        assert time.monotonic() - started < 2
+
+        gate.set()
+        assert writer.flush(timeout=5) is True
+        assert sum(f.result(timeout=5) for f in futures) >= 2
+        writer.close()
+
+    def test_close_drains_queue(self):
+        """Closing the logger writes everything that was accepted"""
+        logger = QuizLogger(async_writes=True, flush_interval=10.0)
+        for i in range(5):
+            assert logger.log_attempt(f"s{i}", pd.DataFrame(), make_answers())
+        logger.close()
+
+        assert len(pd.read_csv('data/logs.csv')) == 15
+        assert logger.log_attempt('late', pd.DataFrame(), make_answers()) is False
+
+
+class TestSQLiteLogStore:
+    """Test the SQLite backend of QuizLogger"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_log_and_query(self):
+        """The SQLite backend answers the same queries as the CSV backend"""
+        logger = QuizLogger(backend='sqlite')
+        logger.log_attempt('s1', pd.DataFrame(), make_answers(3, 2))
+        logger.log_attempt('s2', pd.DataFrame(), make_answers(2, 0))
+
+        logs = logger.get_all_logs()
+        assert list(logs.columns) == LOG_COLUMNS
+        assert len(logs) == 5
+        assert logs['correct'].dtype == bool
+
+        s1_logs = logger.get_student_logs('s1')
+        assert len(s1_logs) == 3
+        summary = logger.get_session_summary(s1_logs['session_id'].iloc[0])
+        assert summary['correct_answers'] == 2
+        assert logger.get_student_performance_summary('s2')['total_questions'] == 2
+
+    def test_wal_mode_and_indexes(self):
+        """The database uses WAL and indexes the lookup columns"""
+        import sqlite3
+        QuizLogger(backend='sqlite')
+        conn = sqlite3.connect('data/logs.db')
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        indexed = {row[0] for row in conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' "
+            "AND tbl_name = 'logs'")}
+        for column in ['student_id', 'session_id', 'question_id', 'timestamp']:
+            assert any(f"({column})" in sql for sql in indexed)
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM logs WHERE student_id = 's1'"
+        ).fetchall()
+        assert 'idx_logs_student_id' in str(plan)
+        conn.close()
+
+    def test_reader_sees_committed_rows_from_other_connection(self):
+        """A second logger on the same database reads rows the first wrote"""
+        writer = QuizLogger(backend='sqlite')
+        reader = QuizLogger(backend='sqlite')
+        writer.log_attempt('s1', pd.DataFrame(), make_answers())
+        assert len(reader.get_student_logs('s1')) == 3
+
+    def test_csv_import_export(self):
+        """logs.csv remains the export format"""
+        QuizLogger().log_attempt('s1', pd.DataFrame(), make_answers())
+        logger = QuizLogger(backend='sqlite')
+        assert logger.import_logs('data/logs.csv') == 3
+        assert logger.store.export_csv('data/export.csv') == 3
+        pd.testing.assert_frame_equal(pd.read_csv('data/logs.csv'),
+                                      pd.read_csv('data/export.csv'))
+
+
+def make_log_rows(days: int = 4, students: int = 3) -> pd.DataFrame:
+    """Build log rows spread over several days and students"""
+    rows = []
+    for day in range(1, days + 1):
+        for s in range(students):
+            rows.append({
+                'student_id': f"s{s}",
+                'timestamp': f"2024-03-0{day}T10:00:00",
+                'question_id': 'q1',
+                'answer': 'x',
+                'correct': True,
+                'skipped': False,
+                'response_time': 10.0,
+                'accuracy': 1.0,
+                'engagement': 1.0,
+                'avg_response_time': 10.0,
+                'session_id': f"s{s}_2024030{day}_100000"
+            })
+    return pd.DataFrame(rows, columns=LOG_COLUMNS)
+
+
+class TestStreamingExport:
+    """Test chunked, filtered and compressed log export"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_chunks_are_bounded(self):
+        """The store streams rows in chunks no larger than chunksize"""
+        logger = QuizLogger()
+        logger.store.append(make_log_rows())
+
+        chunks = list(logger.store.iter_chunks(chunksize=5))
+        assert len(chunks) == 3
+        assert max(len(chunk) for chunk in chunks) <= 5
+
+    def test_gzip_export_with_filters(self):
+        """Date range and student filters are applied during the export"""
+        logger = QuizLogger()
+        logger.store.append(make_log_rows())
+
+        path = logger.export_logs(compression='gzip', start='2024-03-02',
+                                  end='2024-03-04', student_ids=['s0', 's2'],
+                                  student_names={'s0': 'Ada', 's2': 'Lin'},
+                                  chunksize=2)
+        assert path.endswith('.csv.gz')
+
+        exported = pd.read_csv(path, compression='gzip')
+        assert len(exported) == 4
+        assert set(exported['student_id']) == {'s0', 's2'}
+        assert exported['timestamp'].str[:10].isin(
+            ['2024-03-02', '2024-03-03']).all()
+        assert set(exported['name']) == {'Ada', 'Lin'}
+
+    def test_sqlite_filtered_export(self):
+        """SQLite exports push the filters into the query"""
+        logger = QuizLogger(backend='sqlite')
+        logger.store.append(make_log_rows())
+
+        path = logger.export_logs(student_ids=['s1'], start='2024-03-03')
+        exported = pd.read_csv(path)
+        assert len(exported) == 2
+        assert (exported['student_id'] == 's1').all()
+
+    def test_parquet_export(self):
+        """Exports can be written as Parquet row groups"""
+        pytest.importorskip('pyarrow')
+        import pyarrow.parquet as pq
+
+        logger = QuizLogger(backend='parquet')
+        logger.store.append(make_log_rows())
+
+        path = logger.export_logs(file_format='parquet', end='2024-03-02',
+                                  chunksize=2)
+        assert path.endswith('.parquet')
+        table = pq.read_table(path)
+        assert table.num_rows == 3
+        assert table.column_names == LOG_COLUMNS
+
+    def test_empty_export_has_header(self):
+        """Exporting an empty log still produces a readable file"""
+        logger = QuizLogger()
+        exported = pd.read_csv(logger.export_logs())
+        assert list(exported.columns) == LOG_COLUMNS
+        assert exported.empty
+
+
+class TestLogRotation:
+    """Test rotation, compaction and retention of the CSV log"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_size_rotation_keeps_reads_complete(self):
+        """Rotated segments are merged back in by every read"""
+        logger = QuizLogger(rotate_bytes=600)
+        for i in range(6):
+            assert logger.log_attempt(f"s{i % 2}", pd.DataFrame(), make_answers())
+
+        manifest = logger.store.segments.load()
+        assert len(manifest['segments']) >= 2
+        assert os.path.getsize('data/logs.csv') < 600 + 400
+
+        assert len(logger.get_all_logs()) == 18
+        s0_logs = logger.get_student_logs('s0')
+        assert len(s0_logs) == 9
+        session_id = s0_logs['session_id'].iloc[0]
+        expected = (s0_logs['session_id'] == session_id).sum()
+        assert len(logger.store.read(session_id=session_id)) == expected
+
+        exported = pd.read_csv(logger.export_logs())
+        assert len(exported) == 18
+
+    def test_time_range_skips_segments(self):
+        """Segments outside the requested range are not opened"""
+        logger = QuizLogger()
+        logger.store.append(make_log_rows(days=2))
+        logger.rotate_logs()
+        logger.store.append(make_log_rows(days=4).iloc[6:])
+        logger.rotate_logs()
+
+        segments = logger.store.segments
+        assert len(segments.segments()) == 2
+        assert len(segments.segments(start='2024-03-03')) == 1
+
+        recent = logger.store.read(start='2024-03-03')
+        assert len(recent) == 6
+        assert (recent['timestamp'] >= '2024-03-03').all()
+        assert len(logger.get_all_logs(end='2024-03-02')) == 3
+
+    def test_segment_caches_are_bounded(self, monkeypatch):
+        """Reading many rotated segments keeps only a few parsed in memory"""
+        monkeypatch.setattr(LogSegments, 'CACHED_SEGMENTS', 2)
+        logger = QuizLogger()
+        for day in range(1, 5):
+            logger.store.append(make_log_rows(days=4).iloc[(day - 1) * 3:day * 3])
+            logger.store.rotate()
+        segments = logger.store.segments
+
+        assert len(logger.get_all_logs()) == 12
+        paths = [os.path.abspath(segments.path_of(e)) for e in segments.segments()]
+        cached = [path for path in paths if path in LogSegments._segment_caches]
+        assert cached == paths[-2:]
+        assert not set(paths) & set(LogCache._instances)
+
+    def test_compaction_merges_old_segments(self):
+        """Old CSV segments are merged into one compressed archive"""
+        logger = QuizLogger(compact_after_days=1)
+        for day in range(1, 4):
+            logger.store.append(make_log_rows(days=4).iloc[(day - 1) * 3:day * 3])
+            logger.store.rotate()
+
+        result = logger.store.maintain()
+        archive = result['archive']
+        assert archive is not None
+        assert archive['format'] in ('parquet', 'csv.gz')
+        assert archive['rows'] == 9
+
+        segments = logger.store.segments.load()['segments']
+        assert [e['file'] for e in segments] == [archive['file']]
+        assert sorted(os.listdir(logger.store.segments.directory)) == sorted(
+            [archive['file'], 'manifest.json'])
+
+        assert len(logger.get_student_logs('s1')) == 3
+        assert len(logger.get_all_logs()) == 9
+
+    def test_retention_drops_expired_segments(self):
+        """Segments and summaries older than the retention window are deleted"""
+        logger = QuizLogger(retention_days=30)
+        logger.log_attempt('old', pd.DataFrame(), make_answers())
+        logger.store.append(make_log_rows(days=1))
+        logger.store.append_sessions(summarize_sessions(make_log_rows(days=1)))
+        logger.rotate_logs()
+
+        # The segment holding current rows is kept, so split old and new apart
+        logger.clear_logs(confirm=True)
+        logger.store.append(make_log_rows(days=1))
+        logger.store.append_sessions(summarize_sessions(make_log_rows(days=1)))
+        logger.store.rotate()
+        logger.log_attempt('new', pd.DataFrame(), make_answers())
+
+        result = logger.store.maintain()
+        assert result['expired_rows'] == 3
+        assert logger.store.segments.load()['segments'] == []
+
+        logs = logger.get_all_logs()
+        assert set(logs['student_id']) == {'new'}
+        assert set(logger.store.read_sessions()['student_id']) == {'new'}
+
+
+def write_attempts(log_file: str, worker: int, attempts: int,
+                   rotate_bytes=None):
+    """Log attempts from a separate process (top level so spawn can pickle it)"""
+    logger = QuizLogger(log_file=log_file, rotate_bytes=rotate_bytes)
+    for n in range(attempts):
+        if not logger.log_attempt(f"w{worker}_{n}", pd.DataFrame(),
+                                  make_answers(num_questions=4)):
+            raise RuntimeError(f"worker {worker} failed to log attempt {n}")
+
+
+class TestConcurrentWriters:
+    """Test many processes appending to one CSV log"""
+
+    WORKERS = 8
+    ATTEMPTS = 25
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def run_writers(self, rotate_bytes=None):
+        log_file = os.path.join(self.temp_dir, 'data', 'logs.csv')
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(target=write_attempts,
+                            args=(log_file, worker, self.ATTEMPTS, rotate_bytes))
+            for worker in range(self.WORKERS)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=120)
+            assert process.exitcode == 0
+        return QuizLogger(log_file=log_file)
+
+    def check_complete(self, logger: QuizLogger):
+        expected_sessions = self.WORKERS * self.ATTEMPTS
+        logs = logger.get_all_logs()
+        assert len(logs) == expected_sessions * 4
+        assert logs['student_id'].nunique() == expected_sessions
+        assert logs['correct'].isin([True, False]).all()
+        assert (logs.groupby('student_id').size() == 4).all()
+
+        sessions = logger.store.read_sessions()
+        assert len(sessions) == expected_sessions
+        assert sessions['session_id'].is_unique
+
+        with open(logger.log_file, 'rb') as f:
+            assert f.read().count(b'student_id') == 1
+
+    def test_parallel_appends_lose_nothing(self):
+        """Rows from concurrent processes are neither lost nor interleaved"""
+        logger = self.run_writers()
+        self.check_complete(logger)
+
+    def test_parallel_appends_with_rotation(self):
+        """Rotation triggered by several processes keeps every row exactly once"""
+        logger = self.run_writers(rotate_bytes=4000)
+        assert len(logger.store.segments.load()['segments']) >= 2
+        self.check_complete(logger)
+        for entry in logger.store.segments.load()['segments']:
+            with open(logger.store.segments.path_of(entry), 'rb') as f:
+                assert f.read().count(b'student_id') == 1
+
+
+class TestParquetLogStore:
+    """Test the partitioned Parquet backend of QuizLogger"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        pytest.importorskip('pyarrow')
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_log_and_query_by_student_and_session(self):
+        """Student and session lookups return the same data as the CSV backend"""
+        logger = QuizLogger(backend='parquet')
+        for student_id in ['s1', 's2', 's3']:
+            assert logger.log_attempt(student_id, pd.DataFrame(), make_answers())
+
+        assert len(logger.get_all_logs()) == 9
+
+        s2_logs = logger.get_student_logs('s2')
+        assert len(s2_logs) == 3
+        assert (s2_logs['student_id'] == 's2').all()
+
+        session_id = s2_logs['session_id'].iloc[0]
+        summary = logger.get_session_summary(session_id)
+        assert summary['student_id'] == 's2'
+        assert summary['total_questions'] == 3
+        assert summary['correct_answers'] == 2
+        assert logger.get_student_performance_summary('s2')['total_sessions'] == 1
+
+    def test_student_lookup_prunes_partitions(self):
+        """A student lookup only opens files from that student's bucket"""
+        logger = QuizLogger(backend='parquet')
+        for i in range(20):
+            logger.log_attempt(f"s{i}", pd.DataFrame(), make_answers(1, 1))
+
+        store = logger.store.rows
+        all_files = store._partition_files()
+        bucket_files = store._partition_files(bucket=store.bucket_for('s7'))
+        assert len(bucket_files) < len(all_files)
+        assert all(f"bucket={store.bucket_for('s7'):02d}" in path
+                   for path in bucket_files)
+
+    def test_csv_import_export_roundtrip(self):
+        """logs.csv stays usable as an import and export format"""
+        csv_logger = QuizLogger()
+        csv_logger.log_attempt('s1', pd.DataFrame(), make_answers())
+        csv_logger.log_attempt('s2', pd.DataFrame(), make_answers(2, 0))
+
+        parquet_logger = QuizLogger(backend='parquet')
+        assert parquet_logger.import_logs('data/logs.csv') == 5
+        assert len(parquet_logger.store.read_sessions()) == 2
+
+        exported = 'data/roundtrip.csv'
+        assert parquet_logger.store.export_csv(exported) == 5
+        original = pd.read_csv('data/logs.csv').sort_values(
+            ['session_id', 'question_id']).reset_index(drop=True)
+        roundtrip = pd.read_csv(exported).sort_values(
+            ['session_id', 'question_id']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(original, roundtrip)
+
+    def test_small_files_are_compacted(self):
+        """Per-attempt files are merged once a partition collects enough of them"""
+        logger = QuizLogger(backend='parquet')
+        logger.store.rows.compact_files = 4
+        logger.store.sessions.compact_files = 4
+        for _ in range(9):
+            logger.log_attempt('s1', pd.DataFrame(), make_answers())
+
+        store = logger.store.rows
+        files = store._partition_files(bucket=store.bucket_for('s1'))
+        assert 1 < len(files) < 4
+        assert len(logger.get_student_logs('s1')) == 27
+        assert len(logger.store.read_sessions('s1')) == 9
+
+        # A read opened before a compaction still sees every row once
+        chunks = store.iter_batches(chunksize=5)
+        first = next(chunks)
+        assert logger.store.compact() > 0
+        assert len(store._partition_files(bucket=store.bucket_for('s1'))) == 1
+        assert len(first) + sum(len(chunk) for chunk in chunks) == 27
+        assert len(logger.get_student_logs('s1')) == 27
+
+    def test_reads_more_files_than_descriptor_limit(self):
+        """Full reads and exports do not keep a descriptor open per file"""
+        resource = pytest.importorskip('resource')
+        logger = QuizLogger(backend='parquet')
+        days = pd.date_range('2024-01-01', periods=200).strftime('%Y-%m-%d')
+        for hour in ['09', '10']:
+            rows = pd.DataFrame([{
+                'student_id': 's1',
+                'timestamp': f"{day}T{hour}:00:00",
+                'question_id': 'q1',
+                'answer': 'x',
+                'correct': True,
+                'skipped': False,
+                'response_time': 10.0,
+                'accuracy': 1.0,
+                'engagement': 1.0,
+                'avg_response_time': 10.0,
+                'session_id': f"s1_{day.replace('-', '')}_{hour}0000"
+            } for day in days], columns=LOG_COLUMNS)
+            logger.store.append(rows)
+            logger.store.append_sessions(summarize_sessions(rows))
+        assert len(logger.store.rows._partition_files()) == 400
+
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        limit = len(os.listdir('/proc/self/fd')) + 64
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+        try:
+            assert len(logger.get_all_logs()) == 400
+            assert len(logger.get_all_logs(start='2024-01-01',
+                                           end='2024-12-31')) == 400
+            assert len(logger.store.read_sessions()) == 400
+        finally:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
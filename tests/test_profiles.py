@@ -0,0 +1,647 @@
+import pytest
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import shutil
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models
+from models import (LearnerProfile, get_embedder, warm_up_embedder,
+                    create_sample_profiles)
+from profile_store import ProfileStore, ProfileTable
+from logger import QuizLogger
+from topic_mastery import TopicMastery
+
+
+def make_quiz(correct: int = 2, total: int = 3) -> dict:
+    """Build quiz answers with the given number of correct responses"""
+    return {
+        f"q{i + 1}": {
+            'answer': 'x',
+            'correct': i < correct,
+            'skipped': False,
+            'response_time': 20.0
+        }
+        for i in range(total)
+    }
+
+
+class TestLazyEmbedder:
+    """Test the lazily loaded, process-wide sentence embedder"""
+
+    def setup_method(self):
+        """Reset the shared embedder and count model loads"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+        self.saved = (models._embedder, models._embedder_loaded,
+                      models._load_embedder, models.EMBEDDINGS_AVAILABLE)
+        self.loads = 0
+
+        def fake_load():
+            self.loads += 1
+            return object()
+
+        models._embedder = None
+        models._embedder_loaded = False
+        models._load_embedder = fake_load
+        models.EMBEDDINGS_AVAILABLE = True
+
+    def teardown_method(self):
+        """Restore the shared embedder state"""
+        (models._embedder, models._embedder_loaded,
+         models._load_embedder, models.EMBEDDINGS_AVAILABLE) = self.saved
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_profile_creation_does_not_load_model(self):
+        """Creating profile managers must not load the model"""
+        LearnerProfile()
+        LearnerProfile()
+        assert self.loads == 0
+
+    def test_model_loaded_once_and_shared(self):
+        """Concurrent first uses load a single shared instance"""
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_embedder()))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self.loads == 1
+        assert all(result is results[0] for result in results)
+        assert LearnerProfile().embedder is results[0]
+
+    def test_background_warm_up(self):
+        """The warm-up hook loads the model ahead of first use"""
+        warm_up_embedder(background=True).join(timeout=5)
+        assert self.loads == 1
+        assert LearnerProfile().embedder is not None
+        assert self.loads == 1
+
+    def test_unavailable_or_failing_model_falls_back(self):
+        """A missing package or failing load yields None, tried only once"""
+        models.EMBEDDINGS_AVAILABLE = False
+        assert LearnerProfile().embedder is None
+        assert self.loads == 0
+
+        models._embedder_loaded = False
+        models.EMBEDDINGS_AVAILABLE = True
+
+        def failing_load():
+            self.loads += 1
+            raise OSError("model download failed")
+
+        models._load_embedder = failing_load
+        assert get_embedder() is None
+        assert get_embedder() is None
+        assert self.loads == 1
+
+
+class TestProfileStore:
+    """Test the per-student key-value profile storage"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_updates_persist_per_student(self):
+        """An update is visible to a new manager and touches no JSON file"""
+        manager = LearnerProfile()
+        manager.update_profile('s1', make_quiz(3, 3))
+        manager.update_profile('s2', make_quiz(0, 3))
+        assert not os.path.exists('data/learner_profiles.json')
+
+        reopened = LearnerProfile()
+        assert reopened.get_profile('s1')['accuracy'] == 1.0
+        assert reopened.get_profile('s2')['quiz_count'] == 1
+        assert reopened.get_profile('missing') is None
+        assert len(reopened.profiles) == 2
+
+    def test_profiles_load_lazily(self):
+        """Opening the store reads no profile records"""
+        create_sample_profiles()
+        manager = LearnerProfile()
+        assert len(manager.profiles._cache) == 0
+
+        assert manager.get_profile('s2')['accuracy'] == 0.45
+        assert list(manager.profiles._cache) == ['s2']
+        assert 's3' in manager.profiles
+        assert sorted(manager.profiles) == ['s1', 's2', 's3']
+
+    def test_json_file_imported_once(self):
+        """The seed JSON is imported again only after it changes"""
+        create_sample_profiles()
+        LearnerProfile().update_profile('s1', make_quiz(0, 3))
+
+        # Unchanged seed file must not overwrite the newer profile
+        assert LearnerProfile().get_profile('s1')['quiz_count'] == 4
+
+        with open('data/learner_profiles.json', 'w') as f:
+            json.dump({'s9': {'accuracy': 0.5, 'pace': 10.0,
+                              'engagement': 1.0, 'quiz_count': 1}}, f)
+        manager = LearnerProfile()
+        assert manager.get_profile('s9')['accuracy'] == 0.5
+        assert manager.get_profile('s1')['quiz_count'] == 4
+
+    def test_store_mapping_interface(self):
+        """The store behaves like a dict backed by SQLite"""
+        store = ProfileStore(os.path.join('data', 'profiles.db'))
+        store.put_many({'a': {'accuracy': 0.1}, 'b': {'accuracy': 0.2}})
+        store['c'] = {'accuracy': 0.3}
+        del store['a']
+        with pytest.raises(KeyError):
+            store['a']
+
+        reopened = ProfileStore(os.path.join('data', 'profiles.db'))
+        assert dict(reopened.iter_profiles()) == {'b': {'accuracy': 0.2},
+                                                  'c': {'accuracy': 0.3}}
+        reopened.clear()
+        assert len(reopened) == 0
+
+    def count_db_rows(self, db_path: str) -> int:
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute('SELECT COUNT(*) FROM profiles').fetchone()[0]
+
+    def test_write_behind_journals_then_checkpoints(self):
+        """Updates reach the journal first and the database at checkpoints"""
+        store = ProfileStore('data/profiles.db', write_behind=True,
+                             checkpoint_every=3)
+        store['a'] = {'accuracy': 0.1}
+        store['b'] = {'accuracy': 0.2}
+        assert self.count_db_rows('data/profiles.db') == 0
+        assert store.get('a') == {'accuracy': 0.1}
+        with open(store.journal_path) as f:
+            assert len(f.readlines()) == 2
+
+        store['a'] = {'accuracy': 0.5}  # third update triggers a checkpoint
+        assert self.count_db_rows('data/profiles.db') == 2
+        assert os.path.getsize(store.journal_path) == 0
+
+    def test_journal_replayed_after_crash(self):
+        """A store that never checkpointed is recovered on the next start"""
+        manager = LearnerProfile(write_behind=True)
+        manager.update_profile('s1', make_quiz(1, 2))
+        manager.update_profile('s2', make_quiz(2, 2))
+        # Simulate a crash mid-append: a torn final line
+        with open(manager.profiles.journal_path, 'a') as f:
+            f.write('{"student_id": "s3", "prof')
+        del manager
+
+        recovered = LearnerProfile(write_behind=True)
+        assert recovered.get_profile('s1')['accuracy'] == 0.5
+        assert recovered.get_profile('s2')['accuracy'] == 1.0
+        assert recovered.get_profile('s3') is None
+        assert self.count_db_rows('data/learner_profiles.db') == 2
+        assert os.path.getsize(recovered.profiles.journal_path) == 0
+
+    def test_corrupt_seed_file_keeps_profiles(self):
+        """A damaged JSON file does not reset stored profiles"""
+        LearnerProfile().update_profile('s1', make_quiz(2, 2))
+        with open('data/learner_profiles.json', 'w') as f:
+            f.write('{"s1": {"accur')
+
+        assert LearnerProfile().get_profile('s1')['accuracy'] == 1.0
+
+
+class TestProfileTable:
+    """Test the compact in-memory profile representation"""
+
+    def make_profile(self, i: int) -> dict:
+        return {'accuracy': round((i % 1000) / 1000, 3),
+                'pace': round(10 + (i % 5000) / 100, 2),
+                'engagement': round(1 - (i % 7) / 10, 3),
+                'quiz_count': i % 40,
+                'last_updated': f"2024-05-{1 + i % 28:02d}T10:{i % 60:02d}:00.{i % 999999 + 1:06d}"}
+
+    def test_round_trip_matches_dict(self):
+        """Inserts, overwrites and deletes behave like a dict"""
+        table, reference = ProfileTable(capacity=4), {}
+        rng = np.random.default_rng(7)
+        for step in range(3000):
+            student_id = f"student-{rng.integers(400)}"
+            if rng.random() < 0.2:
+                assert table.pop(student_id, None) == reference.pop(student_id, None)
+            else:
+                profile = self.make_profile(step)
+                table[student_id] = profile
+                reference[student_id] = profile
+
+        assert len(table) == len(reference)
+        assert sorted(table) == sorted(reference)
+        for student_id, profile in reference.items():
+            assert table.get(student_id) == profile
+        assert table.get('absent') is None
+
+    def test_fallback_for_non_standard_profiles(self):
+        """Profiles that don't fit the row layout are returned unchanged"""
+        table = ProfileTable()
+        odd = [
+            {'accuracy': 0.5, 'pace': 1.0, 'engagement': 1.0, 'quiz_count': 1,
+             'last_updated': '2024-01-01T00:00:00+00:00'},
+            {'accuracy': 0.123456, 'pace': 1.0, 'engagement': 1.0,
+             'quiz_count': 1, 'last_updated': None},
+            {'accuracy': 0.5, 'topics': ['algebra']}
+        ]
+        for i, profile in enumerate(odd):
+            table[f"s{i}"] = profile
+        table['s3'] = {'accuracy': 0.5, 'pace': 1.0, 'engagement': 1.0,
+                       'quiz_count': 0, 'last_updated': None}
+        assert [table.get(f"s{i}") for i in range(3)] == odd
+        assert table.get('s3')['last_updated'] is None
+        assert table.size == 1
+
+    def test_fallback_profiles_are_copied_and_evicted(self):
+        """Dict-fallback profiles can't be changed in place and obey the LRU"""
+        table = ProfileTable()
+        table['odd'] = {'accuracy': 0.5, 'topics': ['algebra']}
+        table.get('odd')['topics'].append('geometry')
+        assert table.get('odd') == {'accuracy': 0.5, 'topics': ['algebra']}
+        assert table.nbytes > ProfileTable().nbytes
+
+        for i in range(5):
+            table[f"s{i}"] = self.make_profile(i)
+        table.get('s0')
+        assert table.evict(3) == 3
+        assert 'odd' not in table
+        assert sorted(table) == ['s0', 's3', 's4']
+
+    def test_memory_per_student(self):
+        """Standard profiles take well under 100 bytes each"""
+        table = ProfileTable()
+        for i in range(20000):
+            table[f"s{i}"] = self.make_profile(i)
+        assert table.nbytes / len(table) < 100
+
+
+class TestProfileCache:
+    """Test the bounded LRU/TTL cache in front of the profile store"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_lru_eviction_keeps_active_students(self):
+        """Frequently read students stay cached while others are evicted"""
+        manager = LearnerProfile(cache_size=10)
+        for i in range(30):
+            manager.update_profile(f"s{i}", make_quiz(i % 3, 3))
+            manager.get_profile('s0')  # the active student
+
+        stats = manager.cache_stats()
+        assert stats['cached_profiles'] <= 10
+        assert stats['evictions'] >= 20
+        assert 's0' in list(manager.profiles._cache)
+
+        before = manager.cache_stats()['misses']
+        assert manager.get_profile('s5')['quiz_count'] == 1  # reloaded from disk
+        assert manager.cache_stats()['misses'] == before + 1
+        assert manager.get_profile('s0') is not None
+        assert manager.cache_stats()['hit_rate'] > 0
+
+    def test_ttl_rereads_other_writers(self):
+        """Expired entries pick up updates made by another process"""
+        reader = LearnerProfile(cache_ttl=0.05)
+        writer = LearnerProfile()
+        writer.update_profile('s1', make_quiz(0, 2))
+        assert reader.get_profile('s1')['accuracy'] == 0.0
+
+        writer.update_profile('s1', make_quiz(2, 2))
+        assert reader.get_profile('s1')['accuracy'] == 0.0  # still cached
+        time.sleep(0.1)
+        assert reader.get_profile('s1')['accuracy'] == 0.7
+        assert reader.cache_stats()['expirations'] == 1
+
+    def test_write_back_eviction_loses_nothing(self):
+        """Evicting a profile with a journaled update still reads it back"""
+        manager = LearnerProfile(write_behind=True, cache_size=3)
+        for i in range(10):
+            manager.update_profile(f"s{i}", make_quiz(1, 1))
+        assert os.path.getsize(manager.profiles.journal_path) > 0
+
+        for i in range(10):
+            assert manager.get_profile(f"s{i}")['quiz_count'] == 1
+        assert manager.cache_stats()['cached_profiles'] <= 3
+
+
+class TestBulkProfileUpdates:
+    """Test the vectorized batch profile update"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def make_sessions(self, seed: int = 0):
+        """Random quizzes as (student_id, answers) plus matching log rows"""
+        rng = np.random.default_rng(seed)
+        quizzes, rows = [], []
+        for n in range(40):
+            student_id = f"s{rng.integers(6)}"
+            session_id = f"{student_id}_20240101_{n:06d}"
+            answers = {}
+            for q in range(int(rng.integers(1, 6))):
+                answers[f"q{q}"] = {
+                    'answer': 'x',
+                    'correct': bool(rng.random() < 0.6),
+                    'skipped': bool(rng.random() < 0.2),
+                    'response_time': float(rng.uniform(5, 60))
+                }
+                rows.append({'student_id': student_id, 'session_id': session_id,
+                             'timestamp': f"2024-01-01T00:{n // 60:02d}:{n % 60:02d}",
+                             'question_id': f"q{q}", **answers[f"q{q}"]})
+            quizzes.append((student_id, answers))
+        return quizzes, pd.DataFrame(rows)
+
+    def test_bulk_matches_sequential_updates(self):
+        """The closed-form blend agrees with calling update_profile per quiz"""
+        quizzes, rows = self.make_sessions()
+        create_sample_profiles()  # s1..s3 start with history
+        bulk = LearnerProfile()
+
+        # Reference: the same starting profiles updated one quiz at a time
+        sequential = LearnerProfile(profiles_file='data/sequential.json')
+        sequential.profiles.put_many({sid: dict(bulk.get_profile(sid))
+                                      for sid in ['s1', 's2', 's3']})
+        for student_id, answers in quizzes:
+            sequential.update_profile(student_id, answers)
+
+        results = bulk.update_profiles_bulk(rows.sample(frac=1, random_state=1))
+        assert sorted(results) == sorted({sid for sid, _ in quizzes})
+        for student_id in results:
+            expected = sequential.get_profile(student_id)
+            actual = LearnerProfile().get_profile(student_id)
+            assert actual['quiz_count'] == expected['quiz_count']
+            for metric in ['accuracy', 'engagement']:
+                assert actual[metric] == pytest.approx(expected[metric], abs=0.005)
+            assert actual['pace'] == pytest.approx(expected['pace'], abs=0.05)
+
+    def test_bulk_accepts_session_summaries(self):
+        """Session summary rows are blended without per-question data"""
+        manager = LearnerProfile()
+        summaries = pd.DataFrame({
+            'session_id': ['a_1', 'a_2', 'b_1'],
+            'student_id': ['a', 'a', 'b'],
+            'timestamp': ['2024-01-01', '2024-01-02', '2024-01-01'],
+            'accuracy': [1.0, 0.0, 0.5],
+            'engagement': [1.0, 1.0, 0.5],
+            'avg_response_time': [10.0, 20.0, 30.0]
+        })
+        results = manager.update_profiles_bulk(summaries)
+
+        assert results['a']['accuracy'] == pytest.approx(0.3)
+        assert results['a']['pace'] == pytest.approx(17.0)
+        assert results['b'] == {'accuracy': 0.5, 'pace': 30.0, 'engagement': 0.5}
+        assert manager.get_profile('a')['quiz_count'] == 2
+        assert manager.update_profiles_bulk(summaries.iloc[0:0]) == {}
+
+
+class TestProfileReplay:
+    """Test rebuilding profiles from the quiz log"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def test_full_rebuild_matches_live_updates(self):
+        """Replaying the log reproduces profiles maintained live"""
+        logger = QuizLogger()
+        live = LearnerProfile(profiles_file='data/live.json')
+        for student_id, correct in [('s1', 1), ('s2', 3), ('s1', 3), ('s1', 0)]:
+            logger.log_attempt(student_id, pd.DataFrame(), make_quiz(correct, 3))
+            live.update_profile(student_id, make_quiz(correct, 3))
+
+        rebuilt = LearnerProfile()
+        rebuilt.profiles['seeded'] = {'accuracy': 0.1, 'quiz_count': 9}
+        assert rebuilt.rebuild_from_logs(logger) == 4
+
+        # Students without logged sessions keep their profiles
+        assert sorted(rebuilt.profiles) == ['s1', 's2', 'seeded']
+        assert rebuilt.get_profile('seeded')['quiz_count'] == 9
+        for student_id in ['s1', 's2']:
+            expected, actual = live.get_profile(student_id), rebuilt.get_profile(student_id)
+            assert actual['quiz_count'] == expected['quiz_count']
+            assert actual['accuracy'] == pytest.approx(expected['accuracy'], abs=0.005)
+
+    def test_incremental_rebuild_reads_only_new_sessions(self):
+        """Later runs apply new sessions once and skip live-applied ones"""
+        logger = QuizLogger()
+        manager = LearnerProfile()
+        logger.log_attempt('s1', pd.DataFrame(), make_quiz(3, 3))
+        assert manager.rebuild_from_logs(logger) == 1
+        assert manager.rebuild_from_logs(logger) == 0
+
+        # Applied live right after logging, as the quiz page does
+        logger.log_attempt('s1', pd.DataFrame(), make_quiz(0, 3))
+        manager.update_profile('s1', make_quiz(0, 3))
+        # Only in the log, e.g. written by another server process
+        logger.log_attempt('s2', pd.DataFrame(), make_quiz(3, 3))
+
+        assert LearnerProfile().rebuild_from_logs(logger) == 1
+        reopened = LearnerProfile()
+        assert reopened.get_profile('s1')['quiz_count'] == 2
+        assert reopened.get_profile('s1')['accuracy'] == pytest.approx(0.3)
+        assert reopened.get_profile('s2')['quiz_count'] == 1
+        assert reopened.profiles.get_meta('replay_cursor') is not None
+
+    @pytest.mark.parametrize('backend', ['csv', 'parquet', 'sqlite'])
+    def test_late_sessions_are_replayed_once(self, backend):
+        """A session written after a run is applied even if its timestamp is older"""
+        if backend == 'parquet':
+            pytest.importorskip('pyarrow')
+        logger = QuizLogger(backend=backend)
+        manager = LearnerProfile()
+        logger.log_attempt('s1', pd.DataFrame(), make_quiz(3, 3))
+        logger.log_attempt('s2', pd.DataFrame(), make_quiz(0, 3))
+        assert manager.rebuild_from_logs(logger) == 2
+
+        # e.g. queued by a slow server process and flushed after the run
+        late = logger.get_all_sessions().iloc[[0]].copy()
+        late['session_id'] = 's3_20200101_000000'
+        late['student_id'] = 's3'
+        late['timestamp'] = '2020-01-01T00:00:00'
+        logger.store.append_sessions(late)
+
+        assert manager.rebuild_from_logs(logger) == 1
+        assert manager.rebuild_from_logs(logger) == 0
+        assert manager.get_profile('s3')['quiz_count'] == 1
+        assert manager.get_profile('s1')['quiz_count'] == 1
+
+
+class TestTopicMastery:
+    """Test the per-topic mastery matrix behind get_weak_topics"""
+
+    def setup_method(self):
+        """Set up test environment before each test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+        os.makedirs('data', exist_ok=True)
+        self.questions = pd.DataFrame({
+            'question_id': ['q1', 'q2', 'q3', 'q4'],
+            'topic': ['fractions', 'algebra', 'geometry', 'algebra']
+        })
+
+    def teardown_method(self):
+        """Clean up after each test"""
+        os.chdir(self.original_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def answers(self, results: dict) -> dict:
+        return {qid: {'answer': 'x', 'correct': ok, 'skipped': False,
+                      'response_time': 10.0}
+                for qid, ok in results.items()}
+
+    def test_weak_topics_from_answers(self):
+        """Topics answered wrongly are reported, weakest first"""
+        manager = LearnerProfile()
+        manager.update_profile('s1', self.answers({'q1': True, 'q2': False,
+                                                   'q3': False, 'q4': False}),
+                               self.questions)
+        assert manager.get_weak_topics('s1') == ['algebra', 'geometry']
+        assert manager.mastery.get_mastery('s1')['fractions'] == pytest.approx(0.667)
+
+        # Untracked students keep the accuracy-based guess
+        assert manager.get_weak_topics('new') == ['fractions', 'algebra']
+
+        # Saves are batched
+        assert not LearnerProfile().mastery.has_student('s1')
+        manager.save_mastery()
+        reopened = LearnerProfile()
+        assert reopened.get_weak_topics('s1') == ['algebra', 'geometry']
+
+    def test_saves_merge_updates_from_other_processes(self):
+        """Two managers sharing the file both keep their updates"""
+        first, second = LearnerProfile(), LearnerProfile()
+        first.update_profile('s1', self.answers({'q1': True}), self.questions)
+        second.update_profile('s1', self.answers({'q1': False, 'q2': True}), self.questions)
+        second.update_profile('s2', self.answers({'q3': False}), self.questions)
+        first.save_mastery()
+        second.save_mastery()
+
+        merged = LearnerProfile().mastery
+        assert merged.attempts[merged.student_index['s1'],
+                               merged.topic_index['fractions']] == 2
+        assert merged.get_mastery('s1')['algebra'] == pytest.approx(0.667)
+        assert merged.has_student('s2')
+
+        # The earlier saver picks up the other's updates on its next save
+        first.update_profile('s3', self.answers({'q1': True}), self.questions)
+        first.save_mastery()
+        assert first.mastery.get_mastery('s1') == merged.get_mastery('s1')
+        assert LearnerProfile().mastery.has_student('s2')
+
+    def test_rebuild_updates_mastery_from_logs(self):
+        """Replaying the log fills the topic mastery of replayed sessions"""
+        logger = QuizLogger()
+        logger.log_attempt('s1', pd.DataFrame(), self.answers({'q2': False, 'q4': False}))
+        manager = LearnerProfile()
+        assert manager.rebuild_from_logs(logger, questions_df=self.questions) == 1
+        assert LearnerProfile().get_weak_topics('s1') == ['algebra']
+
+        # A full rebuild replaces rather than adds to the replayed students
+        manager.rebuild_from_logs(logger, full=True, questions_df=self.questions)
+        mastery = LearnerProfile().mastery
+        assert mastery.attempts[mastery.student_index['s1'],
+                                mastery.topic_index['algebra']] == 2
+
+    def test_class_query_matches_single_queries(self):
+        """The vectorized class query agrees with per-student queries"""
+        rng = np.random.default_rng(3)
+        mastery = TopicMastery()
+        students = [f"s{i}" for i in range(50)]
+        topics = [f"t{j}" for j in range(7)]
+        for _ in range(5):
+            mastery.update(rng.choice(students, 400), rng.choice(topics, 400),
+                           rng.random(400) < 0.55)
+
+        bulk = mastery.weak_topics(students + ['unknown'])
+        assert bulk['unknown'] == []
+        for student_id in students:
+            scores = mastery.get_mastery(student_id)
+            expected = sorted(m for m in scores.values() if m < 0.6)[:3]
+            assert [scores[t] for t in bulk[student_id]] == expected
+
+    def test_update_from_logs_and_save(self):
+        """Log rows join to question topics and survive a save/load"""
+        logs = pd.DataFrame({
+            'student_id': ['a', 'a', 'b', 'b'],
+            'question_id': ['q2', 'q4', 'q1', 'missing'],
+            'correct': [False, False, True, False]
+        })
+        mastery = TopicMastery('data/mastery.npz')
+        mastery.update_from_logs(logs, self.questions)
+        mastery.save()
+
+        loaded = TopicMastery.load('data/mastery.npz')
+        assert loaded.get_mastery('a') == {'algebra': 0.25}
+        assert loaded.get_mastery('b') == {'fractions': pytest.approx(0.667)}
+        assert loaded.weak_topics() == {'a': ['algebra'], 'b': []}
+
+    def test_concurrent_updates_and_saves_lose_nothing(self):
+        """Updates racing saves in other threads all reach the file"""
+        mastery = TopicMastery('data/mastery.npz')
+
+        def add(worker: int):
+            for i in range(200):
+                mastery.update([f"w{worker}_{i % 40}"], [f"t{i % 9}"], [True])
+
+        def save():
+            for _ in range(20):
+                mastery.save()
+
+        threads = [threading.Thread(target=add, args=(w,)) for w in range(4)]
+        threads.append(threading.Thread(target=save))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        mastery.save()
+
+        loaded = TopicMastery.load('data/mastery.npz')
+        assert len(loaded.students) == 160
+        assert loaded.attempts.sum() == 800
+        assert loaded.correct.sum() == 800
@@ -0,0 +1,533 @@
+import pytest
+import pandas as pd
+import numpy as np
+import os
+import sys
+import shutil
+import tempfile
+
+# Add the parent directory to the path so we can import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import ContentRecommender
+from question_bank import QuestionBank
+from question_embeddings import QuestionEmbeddings
+from ann_index import IVFIndex
+from question_sampler import FenwickTree, QuestionSampler
+from recommender_models import RecommenderModels, train_recommender_models, cohort_version
+
+
+def make_questions(num_questions: int = 30) -> pd.DataFrame:
+    """Build a question bank with every difficulty level represented"""
+    topics = ['algebra', 'geometry', 'fractions']
+    return pd.DataFrame({
+        'question_id': [f"q{i}" for i in range(num_questions)],
+        'topic': [topics[i % 3] for i in range(num_questions)],
+        'difficulty': [1 + i % 5 for i in range(num_questions)],
+        'text': [f"Question {i}" for i in range(num_questions)],
+        'hint': [f"Hint {i}" for i in range(num_questions)]
+    })
+
+
+class WordCountEncoder:
+    """Stand-in for a sentence transformer: hashed bag of words, counting texts"""
+
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.encoded = 0
+
+    def encode(self, texts):
+        self.encoded += len(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().replace(':', ' ').split():
+                vectors[i, sum(map(ord, word)) % self.dim] += 1
+        return vectors
+
+
+class TestQuestionBank:
+    """Test the precomputed question-bank index"""
+
+    def test_index_matches_dataframe(self):
+        """Positions, topics and records agree with the source frame"""
+        questions = make_questions()
+        bank = QuestionBank(questions)
+
+        for level, rows in bank.by_difficulty.items():
+            assert (questions['difficulty'].iloc[rows] == level).all()
+        remedial = bank.positions(max_difficulty=2)
+        assert list(remedial) == list(np.flatnonzero(questions['difficulty'] <= 2))
+        assert bank.positions(max_difficulty=2) is remedial  # cached
+        assert len(bank.positions(min_difficulty=9)) == 0
+
+        assert bank.topics == ['algebra', 'geometry', 'fractions']
+        row = bank.row_of('q7')
+        assert bank.records[row] == {'question_id': 'q7', 'topic': 'geometry',
+                                     'difficulty': 3, 'text': 'Question 7',
+                                     'hint': 'Hint 7'}
+        assert bank.row_of('missing') is None
+
+    def test_sample_is_distinct_and_honours_exclusions(self):
+        """Samples never repeat a position or return excluded ones"""
+        bank = QuestionBank(make_questions())
+        rng = np.random.default_rng(0)
+        all_rows = np.arange(bank.size)
+        picked = bank.sample(all_rows, 10, rng, exclude=np.arange(20))
+        assert len(set(picked)) == 10
+        assert (picked >= 20).all()
+        assert len(bank.sample(bank.positions(1, 1), 100, rng)) == 6
+
+    def test_sample_batch_per_student_exclusions(self):
+        """Batch samples are distinct per row, skip excluded rows and pad with -1"""
+        bank = QuestionBank(make_questions())
+        rng = np.random.default_rng(0)
+        excluded = np.zeros((50, bank.size), dtype=bool)
+        excluded[::2, :25] = True
+        picked = bank.sample_batch(np.arange(bank.size), 4, rng, excluded)
+        assert picked.shape == (50, 4)
+        for row, positions in enumerate(picked):
+            assert len(set(positions)) == 4
+            assert not excluded[row, positions].any()
+
+        small = bank.sample_batch(bank.positions(1, 1), 8, rng, excluded)
+        assert ((small[1::2] >= 0).sum(axis=1) == 6).all()
+        assert (small[::2] >= 0).sum(axis=1).tolist() == [1] * 25
+        assert (small[:, 6:] == -1).all()
+
+    def test_bank_built_once_per_version(self):
+        """Equal content reuses the index; changed content rebuilds it"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        bank = recommender.get_question_bank(questions)
+        assert recommender.get_question_bank(questions) is bank
+        assert recommender.get_question_bank(questions.copy()) is bank
+
+        changed = questions.copy()
+        changed.loc[0, 'difficulty'] = 5
+        assert recommender.get_question_bank(changed) is not bank
+        assert recommender.get_question_bank(changed).version != bank.version
+
+        reordered = questions.iloc[::-1].reset_index(drop=True)
+        assert QuestionBank.version_of(reordered) != bank.version
+
+
+class TestRecommendations:
+    """Test recommendations drawn from the question-bank index"""
+
+    @pytest.mark.parametrize('accuracy, expected_types', [
+        (0.3, {'remedial', 'practice'}),
+        (0.7, {'practice', 'challenge'}),
+        (0.95, {'challenge'})
+    ])
+    def test_bands_pick_matching_difficulties(self, accuracy, expected_types):
+        """Each accuracy band recommends questions at the right difficulty"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        profile = {'accuracy': accuracy, 'pace': 20.0, 'engagement': 0.9}
+
+        for _ in range(20):
+            recs = recommender.get_recommendations('s1', profile, questions)
+            assert len(recs) == 3
+            assert {rec['type'] for rec in recs} <= expected_types
+            for rec in recs:
+                if rec['type'] == 'remedial':
+                    assert rec['difficulty'] <= 2
+                elif rec['type'] == 'practice':
+                    assert rec['difficulty'] == (1 if accuracy < 0.6 else 2)
+                else:
+                    assert rec['difficulty'] >= 3
+                assert list(rec) == ['type', 'question_id', 'topic', 'difficulty',
+                                     'text', 'hint', 'explanation']
+
+    def test_small_bank_is_filled_without_duplicates(self):
+        """Missing difficulty levels are topped up with other questions"""
+        recommender = ContentRecommender()
+        questions = make_questions(5).assign(difficulty=[1, 1, 1, 1, 1])
+        profile = {'accuracy': 0.95, 'pace': 20.0, 'engagement': 0.9}
+
+        recs = recommender.get_recommendations('s1', profile, questions)
+        assert [rec['type'] for rec in recs] == ['additional'] * 3
+        assert len({rec['question_id'] for rec in recs}) == 3
+
+    def test_records_are_not_shared(self):
+        """Mutating a recommendation does not alter the cached index"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        recs = recommender.get_recommendations(
+            's1', {'accuracy': 0.95}, questions)
+        recs[0]['topic'] = 'changed'
+        bank = recommender.get_question_bank(questions)
+        assert 'changed' not in [record['topic'] for record in bank.records]
+
+
+class TestBatchRecommendations:
+    """Test recommendations for a whole class in one call"""
+
+    def test_batch_follows_bands(self):
+        """Every student gets their band's question types without repeats"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        accuracies = np.random.default_rng(0).random(3000)
+        profiles = {f"s{i}": {'accuracy': acc, 'engagement': 0.5}
+                    for i, acc in enumerate(accuracies)}
+
+        results = recommender.get_recommendations_batch(profiles, questions)
+        assert list(results) == list(profiles)
+        for student_id, recs in results.items():
+            accuracy = profiles[student_id]['accuracy']
+            assert len(recs) == 3
+            assert len({rec['question_id'] for rec in recs}) == 3
+            if accuracy < 0.6:
+                assert [rec['type'] for rec in recs] == ['remedial', 'practice', 'practice']
+                assert recs[0]['difficulty'] <= 2
+                assert all(rec['difficulty'] == 1 for rec in recs[1:])
+            elif accuracy <= 0.85:
+                assert [rec['type'] for rec in recs] == ['practice', 'practice', 'challenge']
+            else:
+                assert all(rec['type'] == 'challenge' and rec['difficulty'] >= 3
+                           for rec in recs)
+            assert f"{accuracy:.1%}" in recs[-1]['explanation']
+
+    def test_batch_excludes_used_questions(self):
+        """Excluded question IDs are skipped and short pools are topped up"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        challenge_ids = questions.loc[questions['difficulty'] >= 3, 'question_id']
+        profiles = {'s1': {'accuracy': 0.95}, 's2': {'accuracy': 0.95}}
+        exclude = {'s1': list(challenge_ids[1:])}
+
+        results = recommender.get_recommendations_batch(profiles, questions, exclude=exclude)
+        s1 = results['s1']
+        assert [rec['type'] for rec in s1] == ['challenge', 'additional', 'additional']
+        assert s1[0]['question_id'] == challenge_ids.iloc[0]
+        assert not set(exclude['s1']) & {rec['question_id'] for rec in s1}
+        assert [rec['type'] for rec in results['s2']] == ['challenge'] * 3
+
+    def test_batch_handles_empty_input(self):
+        """Empty banks or classes produce empty results"""
+        recommender = ContentRecommender()
+        assert recommender.get_recommendations_batch({}, make_questions()) == {}
+        assert recommender.get_recommendations_batch(
+            {'s1': {'accuracy': 0.5}}, make_questions().iloc[0:0]) == {'s1': []}
+
+
+class TestRecommendationPlans:
+    """Test the cache of per-band candidate pools and templates"""
+
+    def test_plans_are_reused_per_band(self):
+        """Students in the same bands share one cached plan"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        for accuracy in [0.3, 0.4, 0.5]:
+            recommender.get_recommendations('s1', {'accuracy': accuracy, 'engagement': 0.9}, questions)
+        recommender.get_recommendations('s1', {'accuracy': 0.5, 'engagement': 0.2}, questions)
+        assert recommender.plan_cache_stats()['misses'] == 2
+        assert recommender.plan_cache_stats()['hits'] == 2
+
+        plan = recommender.get_plan(0, 1, recommender.get_question_bank(questions), 3)
+        assert [(rec_type, count) for rec_type, _, count, _ in plan] == [('remedial', 1), ('practice', 2)]
+        assert [(rec_type, count) for rec_type, _, count, _ in recommender.get_plan(
+            0, 1, recommender.get_question_bank(questions), 2)] == [('remedial', 1), ('practice', 1)]
+
+    def test_lru_eviction_and_bank_invalidation(self):
+        """The least recently used plan is evicted; a new bank clears the cache"""
+        recommender = ContentRecommender(plan_cache_size=2)
+        questions = make_questions()
+        bank = recommender.get_question_bank(questions)
+        first = recommender.get_plan(0, 0, bank, 3)
+        recommender.get_plan(1, 0, bank, 3)
+        assert recommender.get_plan(0, 0, bank, 3) is first
+        recommender.get_plan(2, 0, bank, 3)
+        assert recommender.plan_cache_stats()['cached_plans'] == 2
+        assert recommender.get_plan(0, 0, bank, 3) is first
+        assert recommender.get_plan(1, 0, bank, 3) is not None
+        assert recommender.plan_cache_stats()['misses'] == 4
+
+        changed = questions.assign(difficulty=3)
+        recs = recommender.get_recommendations('s1', {'accuracy': 0.95}, changed)
+        assert recommender.plan_cache_stats()['cached_plans'] == 1
+        assert len(recs) == 3 and all(rec['type'] == 'challenge' for rec in recs)
+
+    def test_explanations_are_formatted(self):
+        """Templates are filled with the student's own accuracy"""
+        recommender = ContentRecommender()
+        recs = recommender.get_recommendations('s1', {'accuracy': 0.7, 'engagement': 0.9},
+                                               make_questions())
+        for rec in recs:
+            assert '70.0%' in rec['explanation']
+            assert '{' not in rec['explanation']
+
+
+class TestRecommenderModels:
+    """Test the offline-trained ML models"""
+
+    def setup_method(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.model_dir = os.path.join(self.test_dir, 'models')
+
+    def teardown_method(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_train_save_and_load(self):
+        """Artifacts round-trip and clusters run from easiest to hardest"""
+        questions = make_questions()
+        profiles = {f"s{i}": {'accuracy': i / 10, 'pace': 20.0, 'engagement': 0.8}
+                    for i in range(11)}
+        path = train_recommender_models(questions, self.model_dir, profiles)
+        assert os.path.exists(path)
+
+        models = RecommenderModels.load(self.model_dir, QuestionBank.version_of(questions))
+        assert isinstance(models.question_clusters, np.memmap)
+        assert models.cohort_version == cohort_version(profiles)
+        mean_difficulty = [questions['difficulty'].to_numpy()[models.questions_in_cluster(c)].mean()
+                           for c in range(models.n_clusters)]
+        assert mean_difficulty == sorted(mean_difficulty)
+
+        assert models.student_cluster({'accuracy': 0.0}) == 0
+        assert models.student_cluster({'accuracy': 1.0}) == models.n_clusters - 1
+        assert RecommenderModels.load(self.model_dir, 'unknown') is None
+
+    def test_recommender_only_loads_models(self):
+        """Requests use the saved models and never refit them"""
+        questions = make_questions()
+        recommender = ContentRecommender(model_dir=self.model_dir)
+        assert recommender._get_ml_recommendations({'accuracy': 0.9}, questions) == []
+
+        train_recommender_models(questions, self.model_dir)
+        recommender = ContentRecommender(model_dir=self.model_dir)
+        hard = recommender._get_ml_recommendations({'accuracy': 0.95}, questions)
+        easy = recommender._get_ml_recommendations({'accuracy': 0.1}, questions)
+        assert hard and easy
+        assert min(rec['difficulty'] for rec in hard) > max(rec['difficulty'] for rec in easy)
+        models = recommender.get_models(recommender.get_question_bank(questions))
+        assert recommender.get_models(recommender.get_question_bank(questions)) is models
+
+
+class TestQuestionEmbeddings:
+    """Test the memory-mapped question embedding index"""
+
+    def setup_method(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, 'question_embeddings.npy')
+        self.questions = pd.DataFrame({
+            'question_id': ['q1', 'q2', 'q3', 'q4'],
+            'topic': ['fractions', 'fractions', 'geometry', 'geometry'],
+            'difficulty': [1, 2, 3, 4],
+            'text': ['add two fractions', 'subtract two fractions',
+                     'area of a circle', 'perimeter of a circle'],
+            'hint': ['', '', '', '']
+        })
+
+    def teardown_method(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_only_changed_questions_are_reembedded(self):
+        """A rebuild reuses rows whose text is unchanged"""
+        encoder = WordCountEncoder()
+        index = QuestionEmbeddings.load(self.path)
+        assert index.update(self.questions, encoder.encode, model='test') == 4
+
+        loaded = QuestionEmbeddings.load(self.path)
+        assert isinstance(loaded.vectors, np.memmap)
+        assert loaded.vectors.dtype == np.float32 and loaded.vectors.shape == (4, 64)
+        assert np.allclose(np.linalg.norm(loaded.vectors, axis=1), 1.0)
+
+        changed = self.questions.copy()
+        changed.loc[1, 'text'] = 'multiply two fractions'
+        changed = pd.concat([changed, changed.iloc[[0]].assign(question_id='q5')])
+        assert loaded.update(changed, encoder.encode, model='test') == 2
+        assert encoder.encoded == 6
+        assert QuestionEmbeddings.load(self.path).question_ids == ['q1', 'q2', 'q3', 'q4', 'q5']
+        assert loaded.update(changed, encoder.encode, model='other') == 5
+
+    def test_similar_questions(self):
+        """Nearest questions come from one matrix product, skipping the queries"""
+        index = QuestionEmbeddings(self.path)
+        index.update(self.questions, WordCountEncoder().encode)
+
+        similar = index.similar_to(['q3'], k=2)
+        assert len(similar) == 2 and similar[0][0] == 'q4'
+        assert similar[0][1] >= similar[1][1]
+        assert {q for q, _ in index.similar_to(['q1', 'q3'], k=5)} == {'q2', 'q4'}
+        assert index.similar_to(['missing']) == []
+
+        rows, scores = index.top_k(np.asarray(index.vectors[[0, 2]]), k=1)
+        assert rows[:, 0].tolist() == [0, 2]
+        rows, _ = index.top_k(np.asarray(index.vectors[[0]]), k=6, exclude_rows=np.array([0]))
+        assert rows[0, 3:].tolist() == [-1, -1, -1]
+
+    def test_recommender_similar_questions(self):
+        """The recommender returns bank records for the nearest questions"""
+        recommender = ContentRecommender(embeddings_file=self.path)
+        assert recommender.get_similar_questions(['q1'], self.questions) == []
+
+        QuestionEmbeddings(self.path).update(self.questions, WordCountEncoder().encode)
+        recommender = ContentRecommender(embeddings_file=self.path)
+        similar = recommender.get_similar_questions(['q1'], self.questions, k=1)
+        assert [rec['question_id'] for rec in similar] == ['q2']
+        assert 0 < similar[0]['similarity'] <= 1
+
+
+class TestIVFIndex:
+    """Test the approximate nearest-neighbour index"""
+
+    def setup_method(self):
+        self.test_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        centers = rng.standard_normal((20, 16)).astype(np.float32)
+        vectors = centers[rng.integers(0, 20, 2000)] + 0.3 * rng.standard_normal((2000, 16)).astype(np.float32)
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def teardown_method(self):
+        shutil.rmtree(self.test_dir)
+
+    def exact(self, queries, k):
+        return np.argsort(-(queries @ self.vectors.T), axis=1)[:, :k]
+
+    def test_lists_partition_all_rows(self):
+        """Every row lands in exactly one list"""
+        index = IVFIndex.build(self.vectors, n_lists=25)
+        assert index.n_lists == 25
+        assert sorted(index.rows.tolist()) == list(range(2000))
+        assert index.offsets[0] == 0 and index.offsets[-1] == 2000
+
+    def test_search_recall(self):
+        """Probing every list is exact; a few lists already find most neighbours"""
+        index = IVFIndex.build(self.vectors, n_lists=25)
+        queries = self.vectors[:50]
+        truth = self.exact(queries, 10)
+
+        rows, scores = index.search(queries, k=10, n_probe=25)
+        assert (rows == truth).all()
+        assert (np.diff(scores, axis=1) <= 1e-6).all()
+
+        rows, _ = index.search(queries, k=10, n_probe=3)
+        recall = np.mean([len(set(r) & set(t)) / 10 for r, t in zip(rows, truth)])
+        assert recall >= 0.9
+
+        rows, _ = index.search(queries[:1], k=5, n_probe=25, exclude_rows=np.array([0]))
+        assert 0 not in rows[0]
+
+    def test_save_and_load(self):
+        """The saved lists are reused only for matching vectors"""
+        path = os.path.join(self.test_dir, 'ann.npz')
+        index = IVFIndex.build(self.vectors, n_lists=25)
+        index.save(path)
+
+        loaded = IVFIndex.load(path, self.vectors)
+        assert (loaded.rows == index.rows).all()
+        assert (loaded.search(self.vectors[:5], 3)[0] == index.search(self.vectors[:5], 3)[0]).all()
+        assert IVFIndex.load(path, self.vectors[:100]) is None
+        assert IVFIndex.load(os.path.join(self.test_dir, 'missing.npz'), self.vectors) is None
+
+    def test_recommender_uses_ann_candidates(self):
+        """Similar questions come from the ANN index once it is loaded"""
+        embeddings_file = os.path.join(self.test_dir, 'question_embeddings.npy')
+        ann_file = os.path.join(self.test_dir, 'question_ann.npz')
+        questions = make_questions(2000)
+        embeddings = QuestionEmbeddings(embeddings_file)
+        embeddings.update(questions, lambda texts: self.vectors[:len(texts)],
+                          batch_size=len(questions))
+        IVFIndex.build(self.vectors, n_lists=25, fingerprint=embeddings.fingerprint).save(ann_file)
+
+        recommender = ContentRecommender(embeddings_file=embeddings_file, ann_file=ann_file,
+                                         ann_min_questions=1000)
+        assert recommender.ann is not None
+        similar = recommender.get_similar_questions(['q0'], questions, k=5)
+        exact = ContentRecommender(embeddings_file=embeddings_file, ann_file=ann_file)
+        assert exact.ann is None
+        assert [rec['question_id'] for rec in similar] == \
+            [rec['question_id'] for rec in exact.get_similar_questions(['q0'], questions, k=5)]
+
+    def test_stale_index_is_rejected_after_reembedding(self):
+        """An index saved for other embeddings of the same size is not loaded"""
+        embeddings_file = os.path.join(self.test_dir, 'question_embeddings.npy')
+        ann_file = os.path.join(self.test_dir, 'question_ann.npz')
+        questions = make_questions(2000)
+        embeddings = QuestionEmbeddings(embeddings_file)
+        embeddings.update(questions, lambda texts: self.vectors[:len(texts)],
+                          batch_size=len(questions))
+        IVFIndex.build(self.vectors, n_lists=25, fingerprint=embeddings.fingerprint).save(ann_file)
+        assert IVFIndex.load(ann_file, embeddings.vectors, embeddings.fingerprint) is not None
+
+        changed = questions.copy()
+        changed.loc[0, 'text'] = 'A rewritten question'
+        embeddings.update(changed, lambda texts: self.vectors[-len(texts):])
+        assert IVFIndex.load(ann_file, embeddings.vectors, embeddings.fingerprint) is None
+        recommender = ContentRecommender(embeddings_file=embeddings_file, ann_file=ann_file,
+                                         ann_min_questions=1000)
+        assert recommender.ann is None
+
+
+class TestQuestionSampler:
+    """Test weighted quiz sampling without replacement"""
+
+    def test_fenwick_tree(self):
+        """Prefix search follows the weights as they change"""
+        weights = np.array([1.0, 0.0, 2.0, 3.0, 0.5])
+        tree = FenwickTree(weights)
+        assert tree.total == pytest.approx(6.5)
+        assert [tree.find(v) for v in [0.0, 0.99, 1.0, 2.99, 3.0, 5.99, 6.0]] == [0, 0, 2, 2, 3, 3, 4]
+        tree.set(2, 0.0)
+        assert tree.total == pytest.approx(4.5)
+        assert tree.find(1.5) == 3
+
+        rng = np.random.default_rng(0)
+        counts = np.bincount([FenwickTree(weights).find(rng.random() * 6.5) for _ in range(20000)],
+                             minlength=5)
+        assert np.allclose(counts / 20000, weights / 6.5, atol=0.02)
+
+    def test_draws_are_distinct_and_reproducible(self):
+        """A seed fixes the draw; one quiz never repeats a question"""
+        bank = QuestionBank(make_questions())
+        first = QuestionSampler(bank, seed=7).draw('s1', n=10)
+        again = QuestionSampler(bank, seed=7).draw('s1', n=10)
+        assert [rec['question_id'] for rec in first] == [rec['question_id'] for rec in again]
+        assert len({rec['question_id'] for rec in first}) == 10
+        assert len(QuestionSampler(bank, seed=7).draw('s1', n=100)) == 30
+
+    def test_difficulty_fit(self):
+        """Strong students mostly get hard questions, weak ones easy questions"""
+        bank = QuestionBank(make_questions(500))
+        sampler = QuestionSampler(bank, seed=1)
+        hard = [rec['difficulty'] for rec in sampler.draw('s1', n=50, accuracy=0.95, record=False)]
+        easy = [rec['difficulty'] for rec in sampler.draw('s2', n=50, accuracy=0.05, record=False)]
+        assert np.mean(hard) > 4 and np.mean(easy) < 2
+
+    def test_recent_questions_are_not_reserved(self):
+        """Last quiz's questions return only when nothing else is left"""
+        bank = QuestionBank(make_questions(12))
+        sampler = QuestionSampler(bank, seed=3, recency_quizzes=2)
+        first = {rec['question_id'] for rec in sampler.draw('s1', n=5)}
+        second = {rec['question_id'] for rec in sampler.draw('s1', n=5)}
+        assert not first & second
+        third = {rec['question_id'] for rec in sampler.draw('s1', n=5)}
+        assert not second & third
+        assert sampler.draw('s2', n=5)  # other students are unaffected
+
+        tree = sampler._tree(None)
+        assert (tree.weights == 1.0).all() and tree.total == pytest.approx(12)
+
+    def test_recommender_keeps_seen_sets_across_bank_versions(self):
+        """A new bank version gets a new sampler with the same seen-sets and quiz counts"""
+        recommender = ContentRecommender()
+        questions = make_questions()
+        sampler = recommender.get_sampler(questions)
+        assert recommender.get_sampler(questions) is sampler
+        sampler.draw('s1', n=5)
+
+        changed = questions.assign(difficulty=3)
+        new_sampler = recommender.get_sampler(changed)
+        assert new_sampler is not sampler
+        assert new_sampler.seen['s1'] == sampler.seen['s1']
+        assert new_sampler.quiz_counts['s1'] == 1
+
+        # Questions from the last quiz still have weight 0 after the reload
+        factors = new_sampler._recency('s1')
+        assert len(factors) == 5
+        assert set(factors.values()) == {0.0}
+        first_quiz = list(sampler.seen['s1'])
+        second_quiz = [q['question_id'] for q in new_sampler.draw('s1', n=5)]
+        assert not set(first_quiz) & set(second_quiz)
+        factors = new_sampler._recency('s1')
+        assert [factors[new_sampler.bank.row_of(q)] for q in first_quiz] == [1 / 3] * 5
@@ -0,0 +1,239 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Iterable
+
+from log_store import FileLock
+
+
+class TopicMastery:
+    """Per-student, per-topic mastery kept as dense NumPy arrays
+
+    Two float32 matrices of shape (students, topics) count answered and
+    correct questions; mastery is the smoothed ratio (correct + 1) /
+    (attempts + 2), so an unseen topic sits at 0.5. Students and topics are
+    mapped to row and column indices as they first appear, and the arrays
+    grow by doubling. Skipped questions count as attempts that were missed.
+
+    Several processes may share one file. Each keeps the counts it added
+    since its last save in matching delta matrices, and save() adds them to
+    whatever the file holds at that moment, under the file's lock, instead
+    of overwriting it with this process's copy. Within a process, updates,
+    reads and saves are serialized by a lock.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.student_index: Dict[str, int] = {}
+        self.topic_index: Dict[str, int] = {}
+        self.students: List[str] = []
+        self.topics: List[str] = []
+        self.attempts = np.zeros((0, 0), dtype=np.float32)
+        self.correct = np.zeros((0, 0), dtype=np.float32)
+        # Counts added since the last save, and students whose saved rows
+        # are to be replaced rather than added to
+        self.new_attempts = np.zeros((0, 0), dtype=np.float32)
+        self.new_correct = np.zeros((0, 0), dtype=np.float32)
+        self._reset_students = set()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str) -> 'TopicMastery':
+        """Load a saved matrix, or start an empty one if none exists"""
+        mastery = cls(path)
+        if os.path.exists(path):
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    mastery._restore(data['students'].tolist(), data['topics'].tolist(),
+                                     data['attempts'], data['correct'])
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Warning: could not load topic mastery from {path}: {e}")
+        return mastery
+
+    def _restore(self, students: List[str], topics: List[str],
+                 attempts: np.ndarray, correct: np.ndarray):
+        self.students = [str(s) for s in students]
+        self.topics = [str(t) for t in topics]
+        self.student_index = {s: i for i, s in enumerate(self.students)}
+        self.topic_index = {t: i for i, t in enumerate(self.topics)}
+        self.attempts = attempts.astype(np.float32)
+        self.correct = correct.astype(np.float32)
+        self.new_attempts = np.zeros_like(self.attempts)
+        self.new_correct = np.zeros_like(self.correct)
+        self._reset_students = set()
+
+    @property
+    def unsaved(self) -> bool:
+        with self._lock:
+            return bool(self._reset_students) or bool(self.new_attempts.any())
+
+    def save(self, path: Optional[str] = None):
+        """Merge the counts added since the last save into the .npz file
+
+        The file is re-read under its lock, this process's new counts are
+        added to it and it is replaced atomically; the merged matrices, with
+        other processes' updates, become this object's state.
+        """
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Held throughout, so counts added during the merge are not lost
+        with self._lock:
+            with FileLock.for_path(path).hold():
+                merged = TopicMastery.load(path)
+                # Reset rows hold only counts added since, all of them new
+                reset = [merged.student_index[s] for s in self._reset_students
+                         if s in merged.student_index]
+                merged.attempts[reset] = 0.0
+                merged.correct[reset] = 0.0
+
+                rows, cols = np.nonzero(self.new_attempts)
+                merged.update_counts(np.array(self.students, dtype=object)[rows],
+                                     np.array(self.topics, dtype=object)[cols],
+                                     self.new_attempts[rows, cols],
+                                     self.new_correct[rows, cols])
+
+                count, width = len(merged.students), len(merged.topics)
+                tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+                np.savez(tmp_path,
+                         students=np.array(merged.students, dtype=str),
+                         topics=np.array(merged.topics, dtype=str),
+                         attempts=merged.attempts[:count, :width],
+                         correct=merged.correct[:count, :width])
+                os.replace(tmp_path, path)
+            self._restore(merged.students, merged.topics,
+                          merged.attempts[:count, :width], merged.correct[:count, :width])
+
+    def _indices(self, names: np.ndarray, index: Dict[str, int],
+                 labels: List[str]) -> np.ndarray:
+        """Map names to indices, registering unseen ones"""
+        uniques, inverse = np.unique(names.astype(str), return_inverse=True)
+        codes = np.empty(len(uniques), dtype=np.int64)
+        for i, name in enumerate(uniques.tolist()):
+            code = index.get(name)
+            if code is None:
+                code = index[name] = len(labels)
+                labels.append(name)
+            codes[i] = code
+        return codes[inverse]
+
+    def _grow(self):
+        """Make room for every registered student and topic"""
+        rows, cols = self.attempts.shape
+        need_rows, need_cols = len(self.students), len(self.topics)
+        if need_rows <= rows and need_cols <= cols:
+            return
+        new_shape = (max(need_rows, rows * 2 if need_rows > rows else rows),
+                     max(need_cols, cols * 2 if need_cols > cols else cols))
+        for name in ['attempts', 'correct', 'new_attempts', 'new_correct']:
+            grown = np.zeros(new_shape, dtype=np.float32)
+            grown[:rows, :cols] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def update(self, student_ids: Iterable[str], topics: Iterable[str],
+               correct: Iterable[bool]):
+        """Add answered questions given as parallel student/topic/correct arrays"""
+        student_ids = np.asarray(list(student_ids), dtype=object)
+        topics = np.asarray(list(topics), dtype=object)
+        correct = np.asarray(list(correct), dtype=np.float32)
+        known = pd.notna(topics)
+        if not known.any():
+            return
+        with self._lock:
+            rows = self._indices(student_ids[known], self.student_index, self.students)
+            cols = self._indices(topics[known], self.topic_index, self.topics)
+            self._grow()
+            for attempts, correct_counts in [(self.attempts, self.correct),
+                                             (self.new_attempts, self.new_correct)]:
+                np.add.at(attempts, (rows, cols), 1.0)
+                np.add.at(correct_counts, (rows, cols), correct[known])
+
+    def update_counts(self, student_ids: np.ndarray, topics: np.ndarray,
+                      attempts: np.ndarray, correct: np.ndarray):
+        """Add attempt and correct counts per (student, topic) pair"""
+        if not len(student_ids):
+            return
+        with self._lock:
+            rows = self._indices(student_ids, self.student_index, self.students)
+            cols = self._indices(topics, self.topic_index, self.topics)
+            self._grow()
+            for target, delta in [(self.attempts, attempts), (self.correct, correct),
+                                  (self.new_attempts, attempts), (self.new_correct, correct)]:
+                np.add.at(target, (rows, cols), delta)
+
+    def reset_students(self, student_ids: Iterable[str]):
+        """Forget the counts of these students, here and at the next save"""
+        with self._lock:
+            for student_id in student_ids:
+                row = self.student_index.get(student_id)
+                if row is not None:
+                    for matrix in [self.attempts, self.correct,
+                                   self.new_attempts, self.new_correct]:
+                        matrix[row] = 0.0
+                self._reset_students.add(student_id)
+
+    def update_from_answers(self, student_id: str, answers: Dict[str, Dict],
+                            questions_df: pd.DataFrame):
+        """Add one quiz's answers, looking up each question's topic"""
+        topic_of = questions_df.set_index('question_id')['topic']
+        question_ids = list(answers.keys())
+        self.update([student_id] * len(question_ids),
+                    topic_of.reindex(question_ids).to_numpy(),
+                    [answers[q].get('correct', False) for q in question_ids])
+
+    def update_from_logs(self, logs_df: pd.DataFrame, questions_df: pd.DataFrame):
+        """Add per-question log rows joined to the question topics"""
+        if logs_df.empty:
+            return
+        topics = logs_df['question_id'].map(
+            questions_df.set_index('question_id')['topic'])
+        self.update(logs_df['student_id'].to_numpy(), topics.to_numpy(),
+                    logs_df['correct'].astype(bool).to_numpy())
+
+    def has_student(self, student_id: str) -> bool:
+        with self._lock:
+            return student_id in self.student_index
+
+    def get_mastery(self, student_id: str) -> Dict[str, float]:
+        """Mastery per practised topic for one student"""
+        with self._lock:
+            row = self.student_index.get(student_id)
+            if row is None:
+                return {}
+            cols = len(self.topics)
+            attempts = self.attempts[row, :cols]
+            mastery = (self.correct[row, :cols] + 1) / (attempts + 2)
+            return {self.topics[c]: round(float(mastery[c]), 3)
+                    for c in np.flatnonzero(attempts > 0)}
+
+    def weak_topics(self, student_ids: Optional[Iterable[str]] = None,
+                    threshold: float = 0.6, max_topics: int = 3,
+                    min_attempts: int = 1) -> Dict[str, List[str]]:
+        """Weakest practised topics below threshold for many students at once
+
+        Topics are ordered from lowest mastery. Students without any
+        practised topic below the threshold map to an empty list.
+        """
+        if student_ids is None:
+            student_ids = self.students
+        student_ids = list(student_ids)
+        result = {student_id: [] for student_id in student_ids}
+        with self._lock:
+            known = [s for s in student_ids if s in self.student_index]
+            if not known or not self.topics:
+                return result
+
+            rows = np.array([self.student_index[s] for s in known])
+            cols = len(self.topics)
+            attempts = self.attempts[rows, :cols]
+            mastery = (self.correct[rows, :cols] + 1) / (attempts + 2)
+            topics = np.array(self.topics, dtype=object)
+        weak = (attempts >= min_attempts) & (mastery < threshold)
+        ranked = np.where(weak, mastery, np.inf)
+
+        k = min(max_topics, cols)
+        top = np.argsort(ranked, axis=1, kind='stable')[:, :k]
+        top_weak = np.take_along_axis(weak, top, axis=1)
+        for i, student_id in enumerate(known):
+            result[student_id] = topics[top[i][top_weak[i]]].tolist()
+        return result